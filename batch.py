@@ -0,0 +1,456 @@
+import argparse
+import multiprocessing
+import ntpath
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from iso639 import Lang  # type: ignore
+from pdf2image import convert_from_path  # type: ignore
+from PySide6 import QtCore, QtGui
+
+from box_editor.box_data import BOX_DATA_TYPE, BoxData
+from ocr_engine.concurrency import (Concurrency, apply_thread_limit, autotune,
+                                    load_concurrency, save_concurrency)
+from ocr_engine.model_tiers import (OEM_DEFAULT, OEM_TESSERACT_LSTM_COMBINED,
+                                    ModelTier, TierPolicy, load_tier_policy)
+from ocr_engine.ocr_process_worker import (OrientationJob, PageJob, PageResult,
+                                           detect_orientation, init_worker,
+                                           process_page)
+from ocr_engine.ocr_result_cache import default_cache_directory
+from ocr_engine.ocr_results import OCR_RESULT_BLOCK_TYPE, OCRResultBlock, blocks_from_bytes
+from ocr_engine.preprocessing import PreprocessOptions, load_preprocess_options
+from ocr_engine.word_refinement import RefineOptions, load_refine_options
+from project import Page, Project
+
+
+def import_pages(filenames: list[str], data_folder: str, paper_size: str) -> list[Page]:
+    '''Create pages for images and PDFs, PDF pages are saved as images into the project's data folder'''
+    pages: list[Page] = []
+
+    for filename in filenames:
+        image_filenames: list[str] = []
+
+        if os.path.splitext(filename)[1] == '.pdf':
+            os.makedirs(data_folder, exist_ok=True)
+
+            for i, image in enumerate(convert_from_path(filename)):
+                image_png_filename = os.path.join(data_folder, f'{Path(filename).stem}_{i}.png')
+                image.save(image_png_filename, 'PNG')
+                image_filenames.append(image_png_filename)
+        else:
+            image_filenames.append(os.path.abspath(filename))
+
+        for image_filename in image_filenames:
+            pages.append(Page(image_path=image_filename, name=ntpath.basename(filename), paper_size=paper_size))
+
+    return pages
+
+
+def new_box_data(block: OCRResultBlock, language: Lang) -> BoxData:
+    box_data = BoxData(rect=QtCore.QRect(block.bbox_rect), text=QtGui.QTextDocument(), language=language)
+    box_data.ocr_result_block = block
+
+    return box_data
+
+
+def page_box_datas(result: PageResult, language: Lang, remove_hyphens: bool) -> list[BoxData]:
+    '''Turn layout and recognition results into boxes, following the same rules as the box editor'''
+    box_datas: list[BoxData] = []
+
+    for layout_block, recognized in zip(blocks_from_bytes(result.layout), result.recognized):
+        box_data = new_box_data(layout_block, language)
+        box_data.tag = layout_block.tag
+        box_data.class_ = layout_block.class_
+
+        if layout_block.type is OCR_RESULT_BLOCK_TYPE.IMAGE:
+            box_data.type = BOX_DATA_TYPE.IMAGE
+
+        if recognized is None:
+            box_data_list = [box_data]
+        else:
+            box_data_list = box_data.apply_ocr_result_blocks(blocks_from_bytes(recognized), remove_hyphens)
+
+        box_datas += box_data_list
+
+    for order, box_data in enumerate(box_datas):
+        box_data.order = order
+
+    return box_datas
+
+
+def write_project(project: Project, filename: str) -> None:
+    file = QtCore.QFile(filename)
+    file.open(QtCore.QIODevice.OpenModeFlag.WriteOnly)
+    project.write(QtCore.QDataStream(file))
+    file.close()
+
+
+def export_text(project: Project, filename: str) -> None:
+    '''Write text of all recognized and enabled text boxes (the other exporters need dialogs)'''
+    texts: list[str] = []
+
+    for page in project.pages:
+        for box_data in sorted(page.box_datas, key=lambda x: x.order):
+            if box_data.type is BOX_DATA_TYPE.TEXT and box_data.recognized and box_data.export_enabled:
+                texts.append(box_data.text.toPlainText())
+
+    with open(filename, 'w', encoding='utf-8') as file:
+        file.write('\n\n'.join(texts))
+
+
+def create_project(args: argparse.Namespace) -> tuple[Project, str]:
+    '''Project with the imported pages and the project filename to save it to'''
+    filename = args.out
+
+    if os.path.splitext(filename)[1] != '.orp':
+        filename += '.orp'
+
+    data_folder = os.path.join(os.path.dirname(os.path.abspath(filename)), Path(ntpath.basename(filename)).stem)
+
+    project = Project(name=Path(filename).stem, default_language=Lang(args.language), default_paper_size=args.paper_size, header_y=args.header, footer_y=args.footer)
+    project.remove_hyphens = args.remove_hyphens
+    project.layout_ppi = args.layout_ppi
+    project.ocr_ppi = args.ocr_ppi
+
+    for page in import_pages(args.inputs, data_folder, args.paper_size):
+        project.add_page(page)
+
+    print(f'Imported {len(project.pages)} pages', flush=True)
+
+    return project, filename
+
+
+def refine_options(args: argparse.Namespace) -> RefineOptions:
+    '''Second pass over weak words as set in the preferences unless given'''
+    if args.refine_confidence is None:
+        return load_refine_options(QtCore.QSettings())
+
+    return RefineOptions(confidence=args.refine_confidence)
+
+
+def tier_policy(args: argparse.Namespace) -> TierPolicy:
+    '''Model tiers as set in the preferences unless fast models are given'''
+    if not args.fast_tessdata:
+        return load_tier_policy(QtCore.QSettings())
+
+    best_oem = OEM_TESSERACT_LSTM_COMBINED if args.best_legacy else OEM_DEFAULT
+
+    return TierPolicy((ModelTier('fast', args.fast_tessdata), ModelTier('best', args.best_tessdata, best_oem)), args.escalate_confidence, args.escalate_dictionary_rate)
+
+
+def page_job(project: Project, page: Page, args: argparse.Namespace, cache_dir: str, preprocess_options: PreprocessOptions, refine: RefineOptions, tiers: TierPolicy) -> PageJob:
+    return PageJob(page.image_path, page.ppi, project.default_language.name, args.recognize, args.header, args.footer, cache_dir=cache_dir, layout_ppi=project.layout_ppi, ocr_ppi=project.ocr_ppi, preprocess=preprocess_options, rotation=page.rotation, skew=page.skew, refine=refine, tiers=tiers)
+
+
+def print_tier_counts(results: list[PageResult]) -> None:
+    '''Summary of how many boxes each model tier recognized'''
+    counts: dict[str, int] = {}
+
+    for result in results:
+        for tier, count in result.tiers.items():
+            counts[tier] = counts.get(tier, 0) + count
+
+    if counts:
+        print('Boxes per model tier: ' + ', '.join(f'{tier} {count}' for tier, count in counts.items()), flush=True)
+
+
+def straighten_pages(project: Project, executor: ProcessPoolExecutor) -> None:
+    '''Detect orientation and skew of all pages, page jobs straighten the pages accordingly'''
+    orientations = executor.map(detect_orientation, [OrientationJob(page.image_path, page.ppi) for page in project.pages])
+
+    for page, (rotation, skew) in zip(project.pages, orientations):
+        page.set_straightening(rotation, skew)
+
+        if rotation or skew:
+            print(f'{page.image_path}: rotated by {page.rotation}, skew {page.skew:.2f} degrees', flush=True)
+
+
+def save_project(project: Project, filename: str, args: argparse.Namespace) -> None:
+    write_project(project, filename)
+    print(f'Project saved: {filename}', flush=True)
+
+    if args.export_text:
+        export_text(project, args.export_text)
+        print(f'Text exported: {args.export_text}', flush=True)
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    project, filename = create_project(args)
+
+    # Unless given, use the combination saved in the preferences or by autotune
+    concurrency = load_concurrency(QtCore.QSettings())
+    concurrency.workers = args.workers or concurrency.workers
+    concurrency.threads_per_worker = args.threads or concurrency.threads_per_worker
+
+    # Every worker runs its own Tesseract, has to be set before the workers load libgomp
+    apply_thread_limit(concurrency.thread_count())
+
+    cache_dir = ''
+
+    if not args.no_cache:
+        cache_dir = args.cache_dir or default_cache_directory()
+
+    # Same page preprocessing as in the editor
+    preprocess_options = load_preprocess_options(QtCore.QSettings())
+    refine = refine_options(args)
+    tiers = tier_policy(args)
+
+    failed = 0
+    results: list[PageResult] = []
+
+    # Every worker keeps one API per model tier
+    with ProcessPoolExecutor(concurrency.worker_count(), mp_context=multiprocessing.get_context('spawn'), initializer=init_worker, initargs=(len(tiers.get_tiers()),)) as executor:
+        if args.straighten:
+            straighten_pages(project, executor)
+
+        futures = {}
+
+        for page in project.pages:
+            futures[executor.submit(process_page, page_job(project, page, args, cache_dir, preprocess_options, refine, tiers))] = page
+
+        for done, future in enumerate(as_completed(futures), 1):
+            page = futures[future]
+
+            try:
+                result = future.result()
+                page.box_datas = page_box_datas(result, project.default_language, project.remove_hyphens)
+            except Exception as e:
+                failed += 1
+                print(f'[{done}/{len(futures)}] {page.image_path}: {e}', file=sys.stderr, flush=True)
+            else:
+                results.append(result)
+                print(f'[{done}/{len(futures)}] {page.image_path}: {len(page.box_datas)} boxes', flush=True)
+
+    print_tier_counts(results)
+    save_project(project, filename, args)
+
+    return 1 if failed else 0
+
+
+def run_autotune(args: argparse.Namespace) -> int:
+    def progress(concurrency: Concurrency, seconds: float) -> None:
+        print(f'{concurrency.worker_count():3} workers {concurrency.thread_count():3} threads {seconds:8.2f} s/page', flush=True)
+
+    results = autotune(args.sample, args.ppi, args.language, args.pages, progress=progress)
+
+    settings = QtCore.QSettings()
+
+    # Keep whether the GUI runs its workers as threads or processes
+    concurrency = results[0][0]
+    concurrency.processes = load_concurrency(settings).processes
+    save_concurrency(settings, concurrency)
+    print(f'Saved {concurrency.worker_count()} workers with {concurrency.thread_count()} threads each', flush=True)
+
+    return 0
+
+
+def run_serve(args: argparse.Namespace) -> int:
+    from ocr_engine.ocr_service import OCRService, create_server
+
+    concurrency = load_concurrency(QtCore.QSettings())
+    concurrency.workers = args.workers or concurrency.workers
+    concurrency.threads_per_worker = args.threads or concurrency.threads_per_worker
+
+    # Every worker runs its own Tesseract, has to be set before the workers load libgomp
+    apply_thread_limit(concurrency.thread_count())
+
+    if args.socket and os.path.exists(args.socket):
+        # Left behind by a service that didn't shut down cleanly
+        os.unlink(args.socket)
+
+    service = OCRService(concurrency.worker_count(), args.batch_size, args.batch_delay / 1000, args.image_root)
+    server = create_server(service, args.host, args.port, args.socket)
+
+    print(f'Serving on {args.socket or f"http://{args.host}:{args.port}"} with {concurrency.worker_count()} workers', flush=True)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+        if args.socket:
+            os.unlink(args.socket)
+
+    return 0
+
+
+def authkey(args: argparse.Namespace) -> bytes:
+    '''Shared secret of coordinator and workers, from --authkey or OCRREADER_AUTHKEY'''
+    key = args.authkey or os.environ.get('OCRREADER_AUTHKEY', '')
+
+    if not key:
+        raise SystemExit('Coordinator and workers need a shared --authkey or OCRREADER_AUTHKEY')
+
+    return key.encode('utf-8')
+
+
+def run_coordinate(args: argparse.Namespace) -> int:
+    from ocr_engine.work_queue import Coordinator, WorkQueue
+
+    key = authkey(args)
+    project, filename = create_project(args)
+
+    if args.straighten:
+        # Detected here, so the workers get jobs with the final page geometry
+        with ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn'), initializer=init_worker, initargs=(1,)) as executor:
+            straighten_pages(project, executor)
+
+    # Workers use their own cache directories
+    preprocess_options = load_preprocess_options(QtCore.QSettings())
+    refine = refine_options(args)
+    # Tessdata directories have to exist on the workers
+    tiers = tier_policy(args)
+    work_queue = WorkQueue([page_job(project, page, args, '', preprocess_options, refine, tiers) for page in project.pages], args.attempts, args.lease_timeout)
+
+    def progress(job_id: int, result: PageResult | None, error: str) -> None:
+        done = len(work_queue.results) + len(work_queue.errors)
+        page = project.pages[job_id]
+
+        if result is None:
+            print(f'[{done}/{len(project.pages)}] {page.image_path}: {error}', file=sys.stderr, flush=True)
+        else:
+            print(f'[{done}/{len(project.pages)}] {page.image_path}: done', flush=True)
+
+    coordinator = Coordinator(work_queue, (args.host, args.port), key, progress)
+    print(f'Waiting for workers on {args.host}:{args.port}', flush=True)
+    coordinator.run()
+
+    failed = len(work_queue.errors)
+
+    # Merged after all results arrived, every page gets exactly the boxes of its single accepted result
+    for job_id, result in sorted(work_queue.results.items()):
+        page = project.pages[job_id]
+
+        try:
+            page.box_datas = page_box_datas(result, project.default_language, project.remove_hyphens)
+        except Exception as e:
+            failed += 1
+            print(f'{page.image_path}: {e}', file=sys.stderr, flush=True)
+
+    print_tier_counts(list(work_queue.results.values()))
+    save_project(project, filename, args)
+
+    return 1 if failed else 0
+
+
+def run_work(args: argparse.Namespace) -> int:
+    from ocr_engine.work_queue import run_worker
+
+    key = authkey(args)
+    host, _, port = args.coordinator.rpartition(':')
+
+    # Every worker runs its own Tesseract, has to be set before the workers load libgomp
+    apply_thread_limit(args.threads or max((os.cpu_count() or 1) // args.processes, 1))
+
+    cache_dir = ''
+
+    if not args.no_cache:
+        cache_dir = args.cache_dir or default_cache_directory()
+
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=run_worker, args=((host, int(port)), key, cache_dir)) for i in range(args.processes)]
+
+    for process in processes:
+        process.start()
+
+    for process in processes:
+        process.join()
+
+    return 1 if any(process.exitcode for process in processes) else 0
+
+
+def add_project_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('inputs', nargs='+', help='Image or PDF files')
+    parser.add_argument('--out', required=True, help='Project file to write')
+    parser.add_argument('--recognize', action='store_true', help='Recognize text boxes after layout analysis')
+    parser.add_argument('--language', default='English', help='Document language (default: %(default)s)')
+    parser.add_argument('--paper-size', default='a4', help='Paper size used to estimate ppi (default: %(default)s)')
+    parser.add_argument('--remove-hyphens', action='store_true', help='Remove hyphens in recognized text')
+    parser.add_argument('--header', type=int, default=0, help='Exclude everything above this y position')
+    parser.add_argument('--footer', type=int, default=0, help='Exclude everything below this y position')
+    parser.add_argument('--layout-ppi', type=float, default=0.0, help='Analyse layout at this lower resolution (default: full resolution)')
+    parser.add_argument('--ocr-ppi', type=float, default=0.0, help='Downsample pages above this resolution for recognition (default: full resolution)')
+    parser.add_argument('--refine-confidence', type=float, default=None, help='Recognize words below this confidence again from enlarged crops, 0 disables (default: from preferences)')
+    parser.add_argument('--fast-tessdata', metavar='DIR', default='', help='Recognize with the fast models in DIR first, like tessdata_fast (default: from preferences)')
+    parser.add_argument('--best-tessdata', metavar='DIR', default='', help='Models to recognize weak results again with, like tessdata_best (default: Tesseract\'s default models)')
+    parser.add_argument('--best-legacy', action='store_true', help='Combine legacy and LSTM engines for weak results, needs models with legacy data')
+    parser.add_argument('--escalate-confidence', type=float, default=80.0, help='Recognize boxes again below this mean word confidence (default: %(default)s)')
+    parser.add_argument('--escalate-dictionary-rate', type=float, default=0.0, help='... or below this percentage of words in the dictionary, 0 disables (default: %(default)s)')
+    parser.add_argument('--export-text', metavar='FILE', help='Also export recognized text as plain text')
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog='ocrreader')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    batch_parser = subparsers.add_parser('batch', help='Analyse layout and recognize images or PDFs without GUI')
+    add_project_arguments(batch_parser)
+    batch_parser.add_argument('--straighten', action='store_true', help='Detect page orientation and skew and straighten pages first')
+    batch_parser.add_argument('--workers', type=int, default=0, help='Number of worker processes (default: from preferences)')
+    batch_parser.add_argument('--threads', type=int, default=0, help='Tesseract threads per worker (default: from preferences)')
+    batch_parser.add_argument('--cache-dir', default='', help='Directory of the OCR result cache (default: shared with the GUI)')
+    batch_parser.add_argument('--no-cache', action='store_true', help='Always run recognition, ignoring cached results')
+
+    autotune_parser = subparsers.add_parser('autotune', help='Find the fastest number of workers and Tesseract threads for a sample page and save it')
+    autotune_parser.add_argument('sample', help='Representative page image')
+    autotune_parser.add_argument('--language', default='English', help='Document language (default: %(default)s)')
+    autotune_parser.add_argument('--ppi', type=float, default=300.0, help='Resolution of the sample page (default: %(default)s)')
+    autotune_parser.add_argument('--pages', type=int, default=0, help='Pages to recognize per combination (default: twice the number of workers)')
+
+    serve_parser = subparsers.add_parser('serve', help='Recognize images sent to a local HTTP JSON API, keeping Tesseract loaded between requests')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: %(default)s)')
+    serve_parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: %(default)s)')
+    serve_parser.add_argument('--socket', default='', help='Listen on this Unix socket instead of a port')
+    serve_parser.add_argument('--workers', type=int, default=0, help='Number of worker processes (default: from preferences)')
+    serve_parser.add_argument('--threads', type=int, default=0, help='Tesseract threads per worker (default: from preferences)')
+    serve_parser.add_argument('--batch-size', type=int, default=32, help='Most boxes recognized together (default: %(default)s)')
+    serve_parser.add_argument('--batch-delay', type=float, default=10.0, help='Milliseconds to wait for more boxes to batch (default: %(default)s)')
+    serve_parser.add_argument('--image-root', default='', help='Directory requests may read images from by path (default: only base64 encoded images)')
+
+    coordinate_parser = subparsers.add_parser('coordinate', help='Like batch, but hand the pages to workers on other machines')
+    add_project_arguments(coordinate_parser)
+    coordinate_parser.add_argument('--straighten', action='store_true', help='Detect page orientation and skew and straighten pages first, on this machine before handing out the pages')
+    coordinate_parser.add_argument('--host', default='0.0.0.0', help='Address to listen on for workers (default: %(default)s)')
+    coordinate_parser.add_argument('--port', type=int, default=8766, help='Port to listen on for workers (default: %(default)s)')
+    coordinate_parser.add_argument('--authkey', default='', help='Secret shared with the workers (default: OCRREADER_AUTHKEY)')
+    coordinate_parser.add_argument('--attempts', type=int, default=3, help='Give up on a page after this many failed workers (default: %(default)s)')
+    coordinate_parser.add_argument('--lease-timeout', type=float, default=600.0, help='Seconds after which a page is handed to another worker (default: %(default)s)')
+
+    work_parser = subparsers.add_parser('work', help='Recognize pages handed out by a coordinator')
+    work_parser.add_argument('coordinator', help='HOST:PORT of the coordinator')
+    work_parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help='Number of worker processes (default: %(default)s)')
+    work_parser.add_argument('--threads', type=int, default=0, help='Tesseract threads per worker (default: CPUs divided by processes)')
+    work_parser.add_argument('--authkey', default='', help='Secret shared with the coordinator (default: OCRREADER_AUTHKEY)')
+    work_parser.add_argument('--cache-dir', default='', help='Directory of the OCR result cache (default: shared with the GUI)')
+    work_parser.add_argument('--no-cache', action='store_true', help='Always run recognition, ignoring cached results')
+
+    args = parser.parse_args(argv)
+
+    # Documents and images still need a GUI application, but no display
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    app = QtGui.QGuiApplication(sys.argv[:1])
+
+    app_name = 'OCR Reader'
+
+    QtCore.QCoreApplication.setOrganizationName(app_name)
+    QtCore.QCoreApplication.setOrganizationDomain(app_name)
+    QtCore.QCoreApplication.setApplicationName(app_name)
+
+    match args.command:
+        case 'batch':
+            return run_batch(args)
+        case 'autotune':
+            return run_autotune(args)
+        case 'serve':
+            return run_serve(args)
+        case 'coordinate':
+            return run_coordinate(args)
+        case 'work':
+            return run_work(args)
+
+    return 1
@@ -0,0 +1,50 @@
+'''Compare the old BMP round trip with the raw buffer handoff used for Tesseract
+
+Usage: python -m benchmarks.image_handoff [width height repeats]
+'''
+import io
+import sys
+import timeit
+
+from PIL import Image
+from PySide6 import QtCore, QtGui
+
+from ocr_engine.image_buffer import qimage_to_tesseract_bytes
+
+
+def pixmap_to_pil_bmp(pixmap: QtGui.QPixmap) -> Image.Image:
+    '''Previous conversion path: encode to BMP via QBuffer, then decode with PIL'''
+    byte_array = QtCore.QByteArray()
+    buffer = QtCore.QBuffer(byte_array)
+    buffer.open(QtCore.QIODevice.ReadWrite)
+    pixmap.save(buffer, 'BMP')
+    pil_image = Image.open(io.BytesIO(buffer.data()))
+    pil_image.load()
+    buffer.close()
+
+    return pil_image
+
+
+def pixmap_to_raw(pixmap: QtGui.QPixmap) -> tuple[bytes, int, int, int, int]:
+    return qimage_to_tesseract_bytes(pixmap.toImage())
+
+
+def main(argv: list[str]) -> None:
+    # A4 page at 600 dpi by default
+    width, height, repeats = (int(arg) for arg in argv) if len(argv) == 3 else (4960, 7016, 5)
+
+    app = QtGui.QGuiApplication(['benchmark', '-platform', 'offscreen'])
+
+    image = QtGui.QImage(width, height, QtGui.QImage.Format.Format_RGB32)
+    image.fill(QtGui.QColor('white'))
+    pixmap = QtGui.QPixmap.fromImage(image)
+
+    for name, function in (('BMP round trip', pixmap_to_pil_bmp), ('Raw buffer', pixmap_to_raw)):
+        seconds = min(timeit.repeat(lambda: function(pixmap), number=1, repeat=repeats))
+        print(f'{name:<16}{seconds * 1000:10.1f} ms')
+
+    app.quit()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
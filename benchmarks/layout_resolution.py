@@ -0,0 +1,69 @@
+'''Compare layout analysis at full and reduced resolutions by speed and agreement of the found blocks
+
+Usage: python -m benchmarks.layout_resolution image ppi [repeats]
+'''
+import sys
+import timeit
+
+from PySide6 import QtCore, QtGui
+
+from ocr_engine.ocr_engine_tesserocr import OCREngineTesserocr
+from ocr_engine.ocr_results import OCR_RESULT_BLOCK_TYPE, OCRResultBlock
+
+
+def intersection_over_union(a: QtCore.QRect, b: QtCore.QRect) -> float:
+    intersection = a.intersected(b)
+
+    if intersection.isEmpty():
+        return 0.0
+
+    intersection_area = intersection.width() * intersection.height()
+
+    return intersection_area / (a.width() * a.height() + b.width() * b.height() - intersection_area)
+
+
+def agreement(reference: list[OCRResultBlock], blocks: list[OCRResultBlock]) -> float:
+    '''Mean over all reference blocks of the best overlap with a block of the same type'''
+    if not reference:
+        return 1.0
+
+    overlaps = [max((intersection_over_union(r.bbox_rect, b.bbox_rect) for b in blocks if b.type is r.type), default=0.0) for r in reference]
+
+    return sum(overlaps) / len(overlaps)
+
+
+def relevant_blocks(blocks: list[OCRResultBlock] | None) -> list[OCRResultBlock]:
+    return [block for block in blocks or [] if block.type in (OCR_RESULT_BLOCK_TYPE.TEXT, OCR_RESULT_BLOCK_TYPE.IMAGE)]
+
+
+def main(argv: list[str]) -> None:
+    if len(argv) < 2:
+        print(__doc__)
+        return
+
+    image_path, ppi = argv[0], float(argv[1])
+    repeats = int(argv[2]) if len(argv) > 2 else 3
+
+    app = QtGui.QGuiApplication(['benchmark', '-platform', 'offscreen'])
+
+    engine = OCREngineTesserocr(use_result_cache=False)
+    pixmap = QtGui.QPixmap(image_path)
+
+    reference = relevant_blocks(engine.analyse_layout(pixmap, ppi=ppi))
+
+    for layout_ppi in (0.0, 300.0, 200.0, 150.0, 100.0, 75.0):
+        if layout_ppi >= ppi:
+            continue
+
+        blocks = relevant_blocks(engine.analyse_layout(pixmap, ppi=ppi, layout_ppi=layout_ppi))
+        seconds = min(timeit.repeat(lambda: engine.analyse_layout(pixmap, ppi=ppi, layout_ppi=layout_ppi), number=1, repeat=repeats))
+
+        name = f'{layout_ppi:.0f} ppi' if layout_ppi else 'Full'
+        print(f'{name:<10}{seconds * 1000:10.1f} ms{len(blocks):6} blocks  agreement {agreement(reference, blocks):.2f}')
+
+    engine.shutdown()
+    app.quit()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,233 @@
+'''Recognize synthetic pages with each OCR engine and report throughput, per-box latency, peak memory and character error rate
+
+Every engine runs in a freshly spawned process, so peak memory and loaded traineddata don't carry over between engines.
+Latency of a box is measured from submitting all boxes of its page (as the editor does) to receiving its result.
+
+Usage: python -m benchmarks.ocr_throughput [--engines tesserocr,pytesseract] [--pages 4] [--columns 2] [--out results.json]
+'''
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+
+from PySide6 import QtCore, QtGui
+
+from benchmarks.synthetic_pages import SyntheticPage, render_page
+from ocr_engine import engine_registry
+from ocr_engine.ocr_job_scheduler import OCRJob
+from ocr_engine.ocr_results import OCRResultBlock
+
+
+def create_engine(name: str):
+    '''Engines are imported on creation, so a missing optional dependency only affects its own engine'''
+    if name == 'tesserocr-lines':
+        return engine_registry.create_engine('tesserocr', use_result_cache=False, stream_lines=True)
+    elif name == 'pytesseract':
+        return engine_registry.create_engine(name)
+
+    return engine_registry.create_engine(name, use_result_cache=False)
+
+
+ENGINES = ['tesserocr', 'tesserocr-lines', 'tesserocr-processes', 'pytesseract']
+
+
+@dataclass
+class PageOptions():
+    pages: int = 4
+    ppi: float = 300.0
+    columns: int = 1
+    font: str = ''
+    font_size: float = 11.0
+    seed: int = 0
+    language: str = 'English'
+
+
+@dataclass
+class EngineResult():
+    engine: str
+    pages: int
+    boxes: int
+    seconds: float
+    pages_per_second: float
+    latency_p50: float
+    latency_p95: float
+    # Peak resident set size of the benchmark process and of its largest child (worker processes) in MiB
+    peak_rss: float
+    peak_rss_children: float
+    character_error_rate: float
+
+
+def edit_distance(a: str, b: str) -> int:
+    '''Levenshtein distance between two strings'''
+    if len(a) < len(b):
+        a, b = b, a
+
+    previous = list(range(len(b) + 1))
+
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+
+        previous = current
+
+    return previous[-1]
+
+
+def normalize(text: str) -> str:
+    '''Line breaks and repeated blanks don't count as errors'''
+    return ' '.join(text.split())
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    '''Nearest rank percentile'''
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+class ResultCollector(QtCore.QObject):
+    '''Receives engine results in the main thread and stops the event loop once all boxes of a page are done'''
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        self.loop = QtCore.QEventLoop()
+        self.start = 0.0
+        self.outstanding = 0
+        self.latencies: list[float] = []
+        self.texts: dict[int, str] = {}
+
+    @QtCore.Slot(object)
+    def result(self, result: tuple[list[OCRResultBlock], OCRJob]) -> None:
+        blocks, job = result[0], result[1]
+
+        self.latencies.append(time.perf_counter() - self.start)
+        # Failed jobs count as empty
+        self.texts[job.box_uid] = ' '.join(word.text for block in blocks or [] for word in block.get_words())
+        self.outstanding -= 1
+
+        if self.outstanding <= 0:
+            self.loop.quit()
+
+
+def recognize_page(engine, collector: ResultCollector, page: SyntheticPage, page_uid: int, language: str) -> None:
+    pixmap = QtGui.QPixmap.fromImage(page.image)
+
+    collector.outstanding = len(page.boxes)
+    collector.start = time.perf_counter()
+
+    for box_uid, box in enumerate(page.boxes, 1):
+        rect = (box.rect.left(), box.rect.top(), box.rect.width(), box.rect.height())
+        engine.start_recognize_thread(collector.result, OCRJob(page_uid, box_uid, rect, language), pixmap, page.ppi)
+
+    # Engines may have delivered everything right away
+    if collector.outstanding > 0:
+        collector.loop.exec()
+
+
+def run_engine(name: str, options: PageOptions) -> EngineResult:
+    '''Runs in a spawned process'''
+    app = QtGui.QGuiApplication(['benchmark', '-platform', 'offscreen'])
+
+    pages = [render_page(options.seed + i, options.ppi, options.columns, options.font, options.font_size) for i in range(options.pages)]
+    engine = create_engine(name)
+    collector = ResultCollector()
+
+    # Load traineddata and start workers outside of the measurement
+    recognize_page(engine, collector, pages[0], 0, options.language)
+
+    collector.latencies.clear()
+    collector.texts.clear()
+
+    errors = 0
+    length = 0
+    start = time.perf_counter()
+
+    for page_uid, page in enumerate(pages, 1):
+        recognize_page(engine, collector, page, page_uid, options.language)
+
+        for box_uid, box in enumerate(page.boxes, 1):
+            reference = normalize(box.text)
+            errors += edit_distance(reference, normalize(collector.texts.get(box_uid, '')))
+            length += len(reference)
+
+    seconds = time.perf_counter() - start
+
+    engine.shutdown()
+    app.quit()
+
+    # ru_maxrss is in KiB on Linux
+    return EngineResult(
+        engine=name,
+        pages=len(pages),
+        boxes=sum(len(page.boxes) for page in pages),
+        seconds=seconds,
+        pages_per_second=len(pages) / seconds,
+        latency_p50=percentile(collector.latencies, 0.5),
+        latency_p95=percentile(collector.latencies, 0.95),
+        peak_rss=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        peak_rss_children=resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+        character_error_rate=errors / length if length else 0.0,
+    )
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog='benchmarks.ocr_throughput', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engines', default=','.join(ENGINES), help='comma separated engines out of ' + ', '.join(ENGINES))
+    parser.add_argument('--pages', type=int, default=4)
+    parser.add_argument('--ppi', type=float, default=300.0)
+    parser.add_argument('--columns', type=int, default=1)
+    parser.add_argument('--font', default='', help='font family, random per page if not given')
+    parser.add_argument('--font-size', type=float, default=11.0, help='in points')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--language', default='English')
+    parser.add_argument('--out', default='', help='write results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    options = PageOptions(args.pages, args.ppi, args.columns, args.font, args.font_size, args.seed, args.language)
+    results: list[EngineResult] = []
+
+    print(f'{"Engine":<22}{"pages/s":>9}{"p50 ms":>10}{"p95 ms":>10}{"RSS MiB":>10}{"workers":>10}{"CER":>8}')
+
+    for name in args.engines.split(','):
+        # A fresh process per engine, forking a process that has loaded Qt isn't safe
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            try:
+                result = executor.submit(run_engine, name, options).result()
+            except Exception as e:
+                print(f'{name:<22}failed: {e}')
+                continue
+
+        results.append(result)
+        print(f'{name:<22}{result.pages_per_second:9.2f}{result.latency_p50 * 1000:10.0f}{result.latency_p95 * 1000:10.0f}'
+              f'{result.peak_rss:10.0f}{result.peak_rss_children:10.0f}{result.character_error_rate:8.3f}')
+
+    if args.out:
+        report = {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'options': asdict(options),
+            'results': [asdict(result) for result in results],
+        }
+
+        with open(args.out, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,61 @@
+'''Compare building the result tree at the different detail levels on a dense page
+
+Usage: python -m benchmarks.result_extraction [lines repeats]
+'''
+import sys
+import timeit
+
+import tesserocr
+from iso639 import Lang  # type: ignore
+from PySide6 import QtCore, QtGui
+
+from ocr_engine.image_buffer import qimage_to_tesseract_bytes
+from ocr_engine.tesserocr_results import RESULT_DETAIL, get_result_blocks
+
+TEXT = 'The quick brown fox jumps over the lazy dog while the five boxing wizards jump quickly.'
+
+
+def dense_page(lines: int) -> QtGui.QImage:
+    '''Render a page filled with lines of 12 pt text at 300 ppi'''
+    image = QtGui.QImage(2480, 3508, QtGui.QImage.Format.Format_RGB888)
+    image.fill(QtGui.QColor('white'))
+
+    painter = QtGui.QPainter(image)
+    font = QtGui.QFont('Serif')
+    font.setPixelSize(50)
+    painter.setFont(font)
+
+    line_height = (image.height() - 200) // lines
+
+    for line in range(lines):
+        painter.drawText(QtCore.QPoint(100, 150 + line * line_height), TEXT)
+
+    painter.end()
+
+    return image
+
+
+def main(argv: list[str]) -> None:
+    lines, repeats = (int(arg) for arg in argv) if len(argv) == 2 else (50, 5)
+
+    app = QtGui.QGuiApplication(['benchmark', '-platform', 'offscreen'])
+
+    language = Lang('English')
+
+    with tesserocr.PyTessBaseAPI(lang=language.pt2t) as api:
+        api.SetImageBytes(*qimage_to_tesseract_bytes(dense_page(lines)))
+        api.SetSourceResolution(300)
+        api.Recognize()
+
+        words = sum(len(block.get_words()) for block in get_result_blocks(api, language, 300))
+        print(f'{words} words')
+
+        for detail in RESULT_DETAIL:
+            seconds = min(timeit.repeat(lambda: get_result_blocks(api, language, 300, detail), number=1, repeat=repeats))
+            print(f'{detail.name:<12}{seconds * 1000:10.1f} ms')
+
+    app.quit()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -4,6 +4,7 @@ from enum import Enum, auto
 from iso639 import Lang
 from PySide6 import QtCore, QtGui
 
+from ocr_engine.ocr_job_scheduler import new_uid
 from ocr_engine.ocr_results import OCRResultBlock, OCRResultWord
 
 
@@ -27,6 +28,9 @@ class BoxData():
 
     words: list[OCRResultWord] = field(default_factory=list)
 
+    # Identifies the box while the project is open, not saved
+    uid: int = field(default_factory=new_uid, compare=False)
+
     def write(self, file: QtCore.QDataStream) -> None:
         file.writeInt16(self.order)
         file.writeQVariant(self.rect)
@@ -40,11 +44,15 @@ class BoxData():
 
         self.ocr_result_block.write(file)
 
+        # 0 if the colour is unknown, opaque colours are never 0
+        color = self.ocr_result_block.foreground_color
+        file.writeUInt32(color.rgba() if color.isValid() else 0)
+
         # file.writeInt16(len(self.words))
         # for word in self.words:
         #     word.write(file)
 
-    def read(self, file: QtCore.QDataStream):
+    def read(self, file: QtCore.QDataStream, format_revision: int = 11):
         self.order = file.readInt16()
         self.rect = file.readQVariant()
         self.type = BOX_DATA_TYPE(file.readInt16())
@@ -63,6 +71,49 @@ class BoxData():
         self.ocr_result_block = OCRResultBlock()
         self.ocr_result_block.read(file)
 
+        if format_revision >= 9:
+            rgba = file.readUInt32()
+
+            if rgba:
+                self.ocr_result_block.foreground_color = QtGui.QColor.fromRgba(rgba)
+
+    def apply_ocr_result_blocks(self, blocks: list[OCRResultBlock], remove_hyphens=False, raw=False, confidence_threshold=30) -> list['BoxData']:
+        '''Take over recognized blocks and return the boxes replacing this one, only differs if multiple text blocks have been recognized'''
+        if blocks and raw:
+            self.ocr_result_block = blocks[0]
+            self.text = blocks[0].get_document(False)
+            self.recognized = True
+            return [self]
+
+        if len(blocks) == 1 and blocks[0].confidence > confidence_threshold:
+            box_datas = [self]
+            self.ocr_result_block = blocks[0]
+        else:
+            box_datas = []
+
+            if len(blocks) > 1:
+                for block in blocks:
+                    # Skip blocks with bad confidence (might be an image)
+                    if block.confidence > confidence_threshold:
+                        # Add safety margin for correct recognition
+                        block.add_margin(5)
+
+                        box_data = BoxData(rect=QtCore.QRect(block.bbox_rect), text=QtGui.QTextDocument(), language=self.language)
+                        box_data.ocr_result_block = block
+                        box_datas.append(box_data)
+
+            if not box_datas:
+                # The box is probably an image
+                self.type = BOX_DATA_TYPE.IMAGE
+                return [self]
+
+        for box_data in box_datas:
+            box_data.words = box_data.ocr_result_block.get_words()
+            box_data.text = box_data.ocr_result_block.get_document(True, remove_hyphens)
+            box_data.recognized = True
+
+        return box_datas
+
     def get_paragraphs(self) -> list:
         paragraphs: list[list[QtGui.QTextFragment]] = []
 
@@ -3,6 +3,7 @@ from typing import Union
 
 from iso639 import Lang
 from ocr_engine.ocr_engine import OCREngineManager
+from ocr_engine.ocr_job_scheduler import PAGE_BOX_UID, OCRJob
 from ocr_engine.ocr_results import (
     OCR_RESULT_BLOCK_TYPE,
     OCRResultBlock,
@@ -10,6 +11,7 @@ from ocr_engine.ocr_results import (
     OCRResultParagraph,
     OCRResultWord,
 )
+from ocr_engine.result_distribution import distribute_blocks
 from project import Page, Project
 from PySide6 import QtCore, QtGui, QtWidgets
 
@@ -134,6 +136,8 @@ class BoxEditorScene(QtWidgets.QGraphicsScene):
         self.image: QtGui.QPixmap | None = QtGui.QPixmap()
         # self.set_page_as_background(0)
         self.engine_manager = engine_manager
+        self.engine_manager.scheduler.result.connect(self.new_ocr_results)
+        self.engine_manager.scheduler.partial.connect(self.partial_ocr_results)
         self.box_counter = 0
 
         self.property_editor = property_editor
@@ -215,6 +219,7 @@ class BoxEditorScene(QtWidgets.QGraphicsScene):
 
     def clear_boxes(self):
         if self.current_page:
+            self.engine_manager.scheduler.cancel_page(self.current_page.uid)
             self.current_page.clear()
         for item in self.items():
             if isinstance(item, Box):
@@ -389,6 +394,7 @@ class BoxEditorScene(QtWidgets.QGraphicsScene):
         self.removeItem(box)
 
         if self.current_page:
+            self.engine_manager.scheduler.cancel_box(self.current_page.uid, box.properties.uid)
             self.current_page.box_datas.remove(box.properties)
 
         # Renumber items
@@ -409,21 +415,112 @@ class BoxEditorScene(QtWidgets.QGraphicsScene):
 
     def recognize_box(self, box: Box, raw=False):
         """Run OCR for box and update properties with recognized text in selection, create new boxes if suggested by tesseract"""
-        engine = self.engine_manager.get_current_engine()
+        if self.image and self.current_page:
+            rect = box.rect().toAlignedRect()
+            job = OCRJob(self.current_page.uid, box.properties.uid, (rect.left(), rect.top(), rect.width(), rect.height()), box.properties.language.name, raw)
+
+            self.engine_manager.scheduler.submit(job, self.image, self.current_page.ppi, self.project.ocr_ppi)
 
+    def recognize_page(self) -> None:
+        """Recognize the page between header and footer at once, its words are distributed into the boxes afterwards"""
         if self.image and self.current_page:
-            engine.start_recognize_thread(
-                self.new_ocr_results,
-                box,
-                self.image,
-                self.current_page.ppi,
-                box.properties.language,
-                raw,
-            )
+            rect = self.image.rect()
+
+            if self.header_item:
+                rect.setTop(int(self.header_item.rect().bottom()))
+            if self.footer_item:
+                rect.setBottom(int(self.footer_item.rect().top()))
+
+            job = OCRJob(self.current_page.uid, PAGE_BOX_UID, (rect.left(), rect.top(), rect.width(), rect.height()), self.project.default_language.name)
+
+            self.engine_manager.scheduler.submit(job, self.image, self.current_page.ppi, self.project.ocr_ppi)
+
+    def new_page_ocr_results(self, blocks: list[OCRResultBlock], job: OCRJob) -> None:
+        """Fill the text boxes of a page with the words of a page wide recognition lying within them"""
+        for page in self.project.pages:
+            if page.uid == job.page_uid:
+                box_datas = list(page.box_datas)
+                distributed_blocks = distribute_blocks(blocks, [box_data.rect for box_data in box_datas])
 
-    def new_ocr_results(self, result: tuple[list[OCRResultBlock], bool, Box]):
-        blocks, raw, original_box = result
+                for box_data, block in zip(box_datas, distributed_blocks):
+                    if box_data.type is not BOX_DATA_TYPE.TEXT:
+                        continue
+
+                    box_blocks = [block] if block else []
+
+                    if page is self.current_page:
+                        # Through the box, so retyped boxes and the recognized mark are redrawn
+                        box = self.find_box(box_data.uid)
+
+                        if box:
+                            self.apply_ocr_results(box, box_blocks)
+                    else:
+                        # Box data compares by value, find this very one
+                        i = next(i for i, other in enumerate(page.box_datas) if other is box_data)
+                        page.box_datas[i:i + 1] = box_data.apply_ocr_result_blocks(box_blocks, self.project.remove_hyphens)
+
+                if page is self.current_page:
+                    self.update_property_editor()
+                return
+
+    def find_box(self, box_uid: int) -> Box | None:
+        for item in self.items():
+            if isinstance(item, Box) and item.properties.uid == box_uid:
+                return item
 
+        return None
+
+    def new_background_ocr_results(self, blocks: list[OCRResultBlock], job: OCRJob) -> None:
+        """Apply results of a job for a page that isn't shown"""
+        for page in self.project.pages:
+            if page.uid == job.page_uid:
+                for i, box_data in enumerate(page.box_datas):
+                    if box_data.uid == job.box_uid:
+                        page.box_datas[i:i + 1] = box_data.apply_ocr_result_blocks(blocks, self.project.remove_hyphens, job.raw)
+
+                        for order, box_data in enumerate(sorted(page.box_datas, key=lambda x: x.order)):
+                            box_data.order = order
+                        return
+
+    def partial_ocr_results(self, partial: tuple[str, OCRJob]) -> None:
+        """Show text of a box while it is still being recognized, the complete result replaces it"""
+        text, job = partial
+
+        if not self.current_page or job.page_uid != self.current_page.uid:
+            return
+
+        box = self.find_box(job.box_uid)
+
+        if box:
+            box.properties.text = QtGui.QTextDocument(text)
+            box.update()
+
+            if box.isSelected():
+                self.update_property_editor()
+
+    def new_ocr_results(self, result: tuple[list[OCRResultBlock], OCRJob]):
+        blocks, job = result
+        raw = job.raw
+
+        if job.box_uid == PAGE_BOX_UID:
+            self.new_page_ocr_results(blocks, job)
+            return
+
+        if not self.current_page or job.page_uid != self.current_page.uid:
+            self.new_background_ocr_results(blocks, job)
+            return
+
+        original_box = self.find_box(job.box_uid)
+
+        if not original_box:
+            # Box has been removed while it was recognized
+            return
+
+        self.apply_ocr_results(original_box, blocks, raw)
+        self.update_property_editor()
+
+    def apply_ocr_results(self, original_box: Box, blocks: list[OCRResultBlock], raw: bool = False) -> None:
+        """Take over recognized blocks into a box of the current page, replacing it by several boxes or turning it into an image if needed"""
         is_image = False
         remove_hyphens = self.project.remove_hyphens
 
@@ -508,7 +605,6 @@ class BoxEditorScene(QtWidgets.QGraphicsScene):
             original_box.set_type_to_image()
 
         original_box.update()
-        self.update_property_editor()
 
     def get_mouse_position(self) -> QtCore.QPointF:
         mouse_origin = self.views()[0].mapFromGlobal(QtGui.QCursor.pos())
@@ -816,7 +912,7 @@ class BoxEditorScene(QtWidgets.QGraphicsScene):
         super().keyReleaseEvent(event)
 
     def set_page_as_background(self, page: Page):
-        self.image = QtGui.QPixmap(page.image_path)
+        self.image = page.load_image()
         self.setSceneRect(self.image.rect())
         # self.project.current_page_idx = page_number
 
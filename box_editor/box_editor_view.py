@@ -56,6 +56,7 @@ class BoxEditorView(QtWidgets.QGraphicsView):
         self.setEnabled(True)
         self.current_page = page
         self.scene().current_page = self.current_page
+        self.scene().engine_manager.scheduler.set_visible_page(page.uid)
 
         for box_data in page.box_datas:
             # Restore existing boxes for this page
@@ -145,6 +146,11 @@ class BoxEditorView(QtWidgets.QGraphicsView):
         self.scene().analyse_layout()
 
         if recognize:
+            if QtCore.QSettings().value("page_recognition", False, type=bool):
+                # One recognition for the whole page instead of one per box
+                self.scene().recognize_page()
+                return
+
             for box in self.scene().items():
                 box.recognize_text()
                 # TODO: Move to thread
@@ -73,8 +73,19 @@ class AnalyseLayoutCommand(QtGui.QUndoCommand):
             to_footer = self.box_editor_scene.footer_item.rect().top()
 
         if self.box_editor_scene.image:
-            block = self.box_editor_scene.engine_manager.get_current_engine().analyse_layout(
-                self.box_editor_scene.image, int(from_header), int(to_footer)
+            ppi = 0.0
+
+            if self.box_editor_scene.current_page:
+                ppi = self.box_editor_scene.current_page.ppi
+
+            engine_manager = self.box_editor_scene.engine_manager
+
+            block = engine_manager.get_current_engine().analyse_layout(
+                engine_manager.prepare_image(self.box_editor_scene.image),
+                int(from_header),
+                int(to_footer),
+                ppi,
+                self.box_editor_scene.project.layout_ppi,
             )
 
             if block:
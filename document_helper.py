@@ -1,8 +1,20 @@
 from string import punctuation
 
-import enchant
 from PySide6 import QtGui
 
+# Spell checking dictionaries by language tag, loaded on first use
+dictionaries: dict = {}
+
+
+def get_dictionary(tag: str):
+    '''Importing enchant and loading a dictionary is slow, so it's done once and only when hyphens are removed'''
+    if tag not in dictionaries:
+        import enchant
+
+        dictionaries[tag] = enchant.Dict(tag)
+
+    return dictionaries[tag]
+
 
 class DocumentHelper():
     def __init__(self, document: QtGui.QTextDocument, lang_code: str) -> None:
@@ -65,7 +77,7 @@ class DocumentHelper():
         return paragraphs
 
     def remove_hyphens(self) -> QtGui.QTextDocument:
-        dictionary = enchant.Dict(self.lang_code + '_' + self.lang_code.upper())
+        dictionary = get_dictionary(self.lang_code + '_' + self.lang_code.upper())
 
         paragraphs = self.break_document_into_fragments()
 
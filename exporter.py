@@ -25,6 +25,7 @@ from PySide6 import QtGui, QtWidgets, QtCore
 
 from box_editor.box_data import BOX_DATA_TYPE, BoxData
 from document_helper import DocumentHelper
+from ocr_engine.ocr_results import colors_differ
 from project import Page, Project
 
 
@@ -65,7 +66,26 @@ class Exporter:
     def new_page(self, page: Page, page_nr: int):
         self.current_page = page
         self.current_page_nr = page_nr
-        self.current_image = QtGui.QPixmap(self.current_page.image_path)
+        self.current_image = self.current_page.load_image()
+
+    def export_color(self, color: QtGui.QColor) -> str:
+        """Get colour as #rrggbb, empty if unknown or black (the exported documents' default)"""
+        if colors_differ(color, QtGui.QColor(QtCore.Qt.GlobalColor.black)):
+            return color.name()
+
+        return ""
+
+    def fragment_color(self, fragment: QtGui.QTextFragment, box_color: QtGui.QColor) -> str:
+        """Get colour of a text fragment if it stands out from its box, else empty"""
+        format = fragment.charFormat()
+
+        if format.hasProperty(QtGui.QTextFormat.Property.ForegroundBrush):
+            color = format.foreground().color()
+
+            if colors_differ(color, box_color):
+                return color.name()
+
+        return ""
 
     def prepare_filename(self, filename, extension) -> str:
         if os.path.splitext(filename)[1] != "." + extension:
@@ -99,8 +119,20 @@ class ExporterODT(Exporter):
         self.main_p = P()
         self.odf_text.text.addElement(self.main_p)
 
+        # Text styles by colour, shared by all spans of the same colour
+        self.color_styles: dict[str, Style] = {}
+
         return True
 
+    def color_style(self, color: str) -> Style:
+        if color not in self.color_styles:
+            color_style = Style(name="color" + color[1:], family="text")
+            color_style.addElement(TextProperties(color=color))
+            self.odf_text.automaticstyles.addElement(color_style)
+            self.color_styles[color] = color_style
+
+        return self.color_styles[color]
+
     def write_box(self, box_data: BoxData):
         box_id = "box" + str(self.current_page_nr) + "_" + str(box_data.order)
 
@@ -125,17 +157,17 @@ class ExporterODT(Exporter):
                 case BOX_DATA_TYPE.TEXT:
                     text_box = TextBox()
 
+                    box_color = box_data.ocr_result_block.foreground_color
+                    text_attributes = {
+                        "fontsize": str(box_data.ocr_result_block.get_font_size())
+                        + "pt"
+                    }
+
+                    if self.export_color(box_color):
+                        text_attributes["color"] = self.export_color(box_color)
+
                     box_style = Style(name=box_id, family="paragraph")
-                    box_style.addElement(
-                        TextProperties(
-                            attributes={
-                                "fontsize": str(
-                                    box_data.ocr_result_block.get_font_size()
-                                )
-                                + "pt"
-                            }
-                        )
-                    )
+                    box_style.addElement(TextProperties(attributes=text_attributes))
                     self.odf_text.automaticstyles.addElement(box_style)
 
                     # document_helper = DocumentHelper(box_data.text.clone(), box_data.language.pt1)
@@ -151,16 +183,24 @@ class ExporterODT(Exporter):
                         for f, fragment in enumerate(paragraph):
                             # format: QtGui.QTextCharFormat = fragment.charFormat()
 
+                            # Words in a colour of their own go into a span
+                            fragment_color = self.fragment_color(fragment, box_color)
+                            target = p
+
+                            if fragment_color:
+                                target = Span(stylename=self.color_style(fragment_color))
+                                p.addElement(target)
+
                             if "\u2028" in fragment.text():
                                 # Split at line break character
                                 fragment_lines = fragment.text().split("\u2028")
                                 for fl, fragment_line in enumerate(fragment_lines):
-                                    p.addText(fragment_line)
+                                    target.addText(fragment_line)
 
                                     if fl < len(fragment_lines) - 1:
-                                        p.addElement(LineBreak())
+                                        target.addElement(LineBreak())
                             else:
-                                p.addText(fragment.text())
+                                target.addText(fragment.text())
 
                     frame.addElement(text_box)
 
@@ -394,13 +434,22 @@ class ExporterEPUB(Exporter):
             if box_data.class_:
                 classes = f' class="{box_data.class_}"'
 
+            box_color = box_data.ocr_result_block.foreground_color
+
+            if self.export_color(box_color):
+                classes += f' style="color: {self.export_color(box_color)}"'
+
             text += f"<{box_data.tag + classes}>"
 
             for p, paragraph in enumerate(paragraphs):
                 for l, line in enumerate(paragraph):
                     for f, fragment in enumerate(line):
-                        format: QtGui.QTextCharFormat = fragment.charFormat()
-                        text += fragment.text()
+                        fragment_color = self.fragment_color(fragment, box_color)
+
+                        if fragment_color:
+                            text += f'<span style="color: {fragment_color}">{fragment.text()}</span>'
+                        else:
+                            text += fragment.text()
 
             if box_data.tag:
                 text += f"</{box_data.tag}>"
@@ -412,7 +461,7 @@ class ExporterEPUB(Exporter):
             image_format = "JPEG"
             image_uid = f"page_{page_nr}_{box_data.order}.{image_format}"
             image_path = self.temp_dir.name + "/" + image_uid
-            QtGui.QPixmap(page.image_path).copy(box_data.rect).save(
+            self.current_image.copy(box_data.rect).save(
                 image_path, image_format
             )
 
@@ -1,13 +1,44 @@
 import sys
 
+# Has to be installed before anything else gets imported
+profiler = None
+
+if '--profile-startup' in sys.argv:
+    sys.argv.remove('--profile-startup')
+
+    from startup_profile import ImportProfiler
+
+    profiler = ImportProfiler()
+    profiler.install()
+
 from PySide6 import QtCore
 
-from main_window.main_window import MainWindow
+from ocr_engine.concurrency import apply_thread_limit, load_concurrency
 from ocrreader import ocrreader
 
 if __name__ == '__main__':
     app = ocrreader(sys.argv)
 
+    app_name = 'OCR Reader'
+
+    QtCore.QCoreApplication.setOrganizationName(app_name)
+    QtCore.QCoreApplication.setOrganizationDomain(app_name)
+    QtCore.QCoreApplication.setApplicationName(app_name)
+
+    # OpenMP reads the thread limit when Tesseract gets loaded, so this has to happen before importing the main window
+    concurrency = load_concurrency(QtCore.QSettings())
+
+    if not concurrency.processes:
+        apply_thread_limit(concurrency.thread_count())
+
+    if profiler:
+        profiler.mark('Application')
+
+    from main_window.main_window import MainWindow
+
+    if profiler:
+        profiler.mark('Import main window')
+
     translator = QtCore.QTranslator()
 
     if translator.load(QtCore.QLocale().system(), 'ocrreader', '_', '.'):
@@ -15,4 +46,9 @@ if __name__ == '__main__':
 
     window = MainWindow()
 
+    if profiler:
+        profiler.mark('Create main window')
+        profiler.uninstall()
+        print(profiler.report())
+
     app.exec()
@@ -0,0 +1,106 @@
+from PySide6 import QtCore, QtWidgets
+
+from ocr_engine.job_metrics import STAGES, JobMetrics, JobMetricsRecorder
+
+
+class JobMetricsDock(QtWidgets.QDockWidget):
+    """Live table of OCR job timings, recording only runs while the dock is visible"""
+
+    COLUMNS = ["Page", "Box", "Language", "Engine", "Pixels", "Words", "Cached", "Tier", "Tiers ms"]
+
+    def __init__(self, parent, recorder: JobMetricsRecorder) -> None:
+        super().__init__(
+            QtCore.QCoreApplication.translate("job_metrics", "OCR Job Timings"),
+            parent,
+        )
+        self.setObjectName("job_metrics_dock")
+
+        self.recorder = recorder
+        self.recorder.recorded.connect(self.add_row)
+
+        widget = QtWidgets.QWidget(self)
+        layout = QtWidgets.QVBoxLayout(widget)
+
+        self.table = QtWidgets.QTableWidget(0, len(self.COLUMNS) + len(STAGES) + 1)
+        self.table.setHorizontalHeaderLabels(
+            self.COLUMNS + [f"{stage} ms" for stage in STAGES] + ["total ms"]
+        )
+        self.table.setEditTriggers(
+            QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers
+        )
+        self.table.verticalHeader().setVisible(False)
+        layout.addWidget(self.table)
+
+        buttons = QtWidgets.QHBoxLayout()
+
+        clear_button = QtWidgets.QPushButton(
+            QtCore.QCoreApplication.translate("job_metrics_clear", "Clear")
+        )
+        clear_button.clicked.connect(self.clear)
+        buttons.addWidget(clear_button)
+
+        save_button = QtWidgets.QPushButton(
+            QtCore.QCoreApplication.translate("job_metrics_save", "Save as JSON Lines")
+        )
+        save_button.clicked.connect(self.save)
+        buttons.addWidget(save_button)
+
+        buttons.addStretch()
+        layout.addLayout(buttons)
+
+        self.setWidget(widget)
+        self.visibilityChanged.connect(self.visibility_changed)
+
+    def visibility_changed(self, visible: bool) -> None:
+        self.recorder.enabled = visible
+
+    def add_row(self, metrics: JobMetrics) -> None:
+        values = [
+            metrics.page_uid,
+            metrics.box_uid,
+            metrics.language,
+            metrics.engine,
+            metrics.pixels,
+            metrics.words,
+            "yes" if metrics.cached else "",
+            metrics.tier,
+            ", ".join(
+                f"{tier} {seconds * 1000:.1f}" for tier, seconds in metrics.tiers.items()
+            ),
+        ]
+        values += [
+            f"{metrics.stages[stage] * 1000:.1f}" if stage in metrics.stages else ""
+            for stage in STAGES
+        ]
+        values.append(f"{metrics.total * 1000:.1f}")
+
+        row = self.table.rowCount()
+        self.table.insertRow(row)
+
+        for column, value in enumerate(values):
+            self.table.setItem(row, column, QtWidgets.QTableWidgetItem(str(value)))
+
+        # Drop rows the recorder no longer holds
+        while self.table.rowCount() > len(self.recorder.records):
+            self.table.removeRow(0)
+
+        self.table.scrollToBottom()
+
+    def clear(self) -> None:
+        self.recorder.clear()
+        self.table.setRowCount(0)
+
+    def save(self) -> None:
+        filename = QtWidgets.QFileDialog.getSaveFileName(
+            self,
+            QtCore.QCoreApplication.translate(
+                "dialog_save_job_metrics", "Save OCR Job Timings"
+            ),
+            "ocr_jobs.jsonl",
+            QtCore.QCoreApplication.translate(
+                "dialog_job_metrics_filter", "JSON Lines (*.jsonl)"
+            ),
+        )[0]
+
+        if filename:
+            self.recorder.dump(filename)
@@ -1,28 +1,35 @@
+import multiprocessing
 import ntpath
 import os
 import shutil
 import tempfile
+from concurrent.futures import Future, ProcessPoolExecutor
 from pathlib import Path
 
 import darkdetect
 from iso639 import Lang  # type: ignore
 from papersize import SIZES  # type: ignore
-from pdf2image import convert_from_path  # type: ignore
-from PIL import Image
 from PySide6 import QtCore, QtGui, QtWidgets
 
 from box_editor.box_data import BOX_DATA_TYPE
 from box_editor.box_editor_view import BoxEditorView
-from exporter import ExporterEPUB, ExporterManager, ExporterODT, ExporterPlainText
-from ocr_engine.ocr_engine import OCREngineManager
-from ocr_engine.ocr_engine_tesserocr import OCREngineTesserocr
+from main_window.job_metrics_dock import JobMetricsDock
 from main_window.pages_icon_view import PagesIconView
 from main_window.preferences import Preferences
+from ocr_engine.concurrency import load_concurrency
+from ocr_engine.engine_registry import create_engine, load_languages, save_languages
+from ocr_engine.model_tiers import load_tier_policy
+from ocr_engine.ocr_engine import OCREngineManager
+from ocr_engine.preprocessing import load_preprocess_options
+from ocr_engine.word_refinement import load_refine_options
 from project import Page, Project
 from property_editor import PropertyEditor
 
 
 class MainWindow(QtWidgets.QMainWindow):
+    # [page, future of detect_orientation], emitted by the executor's thread
+    page_straightened = QtCore.Signal(object)
+
     def __init__(self) -> None:
         super().__init__()
 
@@ -67,6 +74,9 @@ class MainWindow(QtWidgets.QMainWindow):
         self.edit_menu: QtWidgets.QMenu = menu.addMenu(
             QtCore.QCoreApplication.translate("menu_edit", "&Edit")
         )
+        self.view_menu: QtWidgets.QMenu = menu.addMenu(
+            QtCore.QCoreApplication.translate("menu_view", "&View")
+        )
 
         self.page_icon_view_context_menu = QtWidgets.QMenu(self)
 
@@ -76,6 +86,21 @@ class MainWindow(QtWidgets.QMainWindow):
 
         self.load_settings()
 
+        self.engine_manager = self.create_engine_manager()
+        self.engine_manager.scheduler.queue_changed.connect(self.ocr_queue_changed)
+        self.engine_manager.scheduler.failed.connect(self.ocr_job_failed)
+        self.page_straightened.connect(self.apply_straightening)
+
+        # Jobs are only timed while the dock is shown
+        self.job_metrics_dock = JobMetricsDock(
+            self, self.engine_manager.scheduler.metrics
+        )
+        self.addDockWidget(
+            QtCore.Qt.DockWidgetArea.BottomDockWidgetArea, self.job_metrics_dock
+        )
+        self.job_metrics_dock.hide()
+        self.view_menu.addAction(self.job_metrics_dock.toggleViewAction())
+
         self.setup_project()
 
         self.statusBar().showMessage(
@@ -84,10 +109,8 @@ class MainWindow(QtWidgets.QMainWindow):
 
         self.temp_dir = tempfile.TemporaryDirectory()
 
-        self.exporter_manager = ExporterManager()
-        self.exporter_manager.add_exporter("EPUB", ExporterEPUB(self))
-        self.exporter_manager.add_exporter("PlainText", ExporterPlainText(self))
-        self.exporter_manager.add_exporter("ODT", ExporterODT(self))
+        # Created on the first export, exporters pull in ebooklib and odfpy
+        self.exporter_manager = None
 
         from main_window.recent_files_manager import RecentFilesManager
 
@@ -96,10 +119,43 @@ class MainWindow(QtWidgets.QMainWindow):
     def __del__(self):
         self.temp_dir.cleanup()
 
-    def setup_project(self, project=None) -> None:
+    def create_engine_manager(self) -> OCREngineManager:
         # self.engine_manager = OCREngineManager([OCREngineTesseract()])
-        self.engine_manager = OCREngineManager([OCREngineTesserocr()])
+        concurrency = load_concurrency(self.settings)
+
+        if concurrency.processes:
+            engine_name = "tesserocr-processes"
+            engine_options = {
+                "processes": concurrency.worker_count(),
+                "threads_per_worker": concurrency.thread_count(),
+            }
+        else:
+            # The thread limit for this process has been set on startup
+            engine_name = "tesserocr"
+            engine_options = {"workers": concurrency.worker_count()}
+
+        def engine_factory():
+            engine = create_engine(
+                engine_name,
+                refine_options=load_refine_options(self.settings),
+                tier_policy=load_tier_policy(self.settings),
+                **engine_options,
+            )
+            save_languages(self.settings, engine_name, engine.languages)
+
+            return engine
 
+        # Tesseract is loaded on first use, until then languages come from the last session
+        engine_manager = OCREngineManager(
+            engine_factory=engine_factory,
+            languages=load_languages(self.settings, engine_name),
+        )
+
+        engine_manager.preprocess_options = load_preprocess_options(self.settings)
+
+        return engine_manager
+
+    def setup_project(self, project=None) -> None:
         if project:
             self.project = project
         else:
@@ -330,6 +386,22 @@ class MainWindow(QtWidgets.QMainWindow):
             self.analyze_layout_and_recognize_selected
         )
 
+        self.straighten_pages_action_selected = QtGui.QAction(
+            QtCore.QCoreApplication.translate(
+                "action_straighten_pages", "&Straighten Selected Pages"
+            ),
+            self,
+        )
+        self.straighten_pages_action_selected.setStatusTip(
+            QtCore.QCoreApplication.translate(
+                "status_straighten_pages",
+                "Detect orientation and skew of pages without boxes and straighten them",
+            )
+        )
+        self.straighten_pages_action_selected.triggered.connect(
+            self.straighten_selected_pages
+        )
+
         self.close_project_action = QtGui.QAction(
             QtGui.QIcon(f"resources/icons/{self.theme_folder}/close-line.png"),
             QtCore.QCoreApplication.translate("action_close_project", "&Close project"),
@@ -443,6 +515,9 @@ class MainWindow(QtWidgets.QMainWindow):
             self.page_icon_view_context_menu.addAction(
                 self.analyze_layout_and_recognize_action_selected
             )
+            self.page_icon_view_context_menu.addAction(
+                self.straighten_pages_action_selected
+            )
 
         action = self.page_icon_view_context_menu.exec_(
             self.page_icon_view.mapToGlobal(point)
@@ -504,6 +579,113 @@ class MainWindow(QtWidgets.QMainWindow):
     def analyze_layout_and_recognize_selected(self) -> None:
         self.analyze_pages(recognize=True)
 
+    def straighten_selected_pages(self) -> None:
+        """Detect orientation and skew of the selected pages in parallel worker processes"""
+        from ocr_engine.ocr_process_worker import (
+            OrientationJob,
+            detect_orientation,
+            init_worker,
+        )
+
+        pages = [
+            index.data(QtCore.Qt.ItemDataRole.UserRole)
+            for index in self.page_icon_view.selectedIndexes()
+        ]
+
+        # Existing boxes refer to the current raster and would no longer match
+        pages = [page for page in pages if page and not page.box_datas]
+
+        if not pages:
+            self.statusBar().showMessage(
+                QtCore.QCoreApplication.translate(
+                    "status_straighten_none", "Only pages without boxes can be straightened"
+                )
+            )
+            return
+
+        self.straighten_progress = QtWidgets.QProgressDialog(
+            QtCore.QCoreApplication.translate(
+                "straighten_progress", "Straightening pages"
+            ),
+            QtCore.QCoreApplication.translate("cancel", "Cancel"),
+            0,
+            len(pages),
+            self,
+        )
+        self.straighten_progress.setWindowModality(QtCore.Qt.WindowModality.WindowModal)
+        self.straighten_progress.setValue(0)
+
+        # Pages whose results haven't arrived yet and errors of the failed ones, reported once all are done
+        self.straighten_pending = len(pages)
+        self.straighten_errors: list[str] = []
+
+        workers = min(load_concurrency(self.settings).worker_count(), len(pages))
+
+        # Results arrive through page_straightened, the GUI thread doesn't wait for the workers
+        executor = ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(1,),
+        )
+        self.straighten_progress.canceled.connect(
+            lambda: executor.shutdown(wait=False, cancel_futures=True)
+        )
+
+        for page in pages:
+            future = executor.submit(
+                detect_orientation, OrientationJob(page.image_path, page.ppi)
+            )
+            future.add_done_callback(
+                lambda future, page=page: self.page_straightened.emit([page, future])
+            )
+
+        # Workers exit once the submitted pages are done
+        executor.shutdown(wait=False)
+
+    def apply_straightening(self, straightened: tuple[Page, Future]) -> None:
+        page, future = straightened
+        self.straighten_pending -= 1
+
+        if not future.cancelled() and future.exception():
+            # Unreadable images or failed orientation detection, the page stays as it is
+            exception = future.exception()
+            self.straighten_errors.append(
+                f"{page.name}: {type(exception).__name__}: {exception}"
+            )
+        elif not future.cancelled() and not page.box_datas:
+            # Boxes may have been added while the page was analysed
+            page.set_straightening(*future.result())
+            self.page_icon_view.update_page_image(page)
+
+            if page is self.box_editor.current_page:
+                self.box_editor.load_page(page)
+
+        if not self.straighten_progress.wasCanceled():
+            self.straighten_progress.setValue(self.straighten_progress.value() + 1)
+
+        if self.straighten_pending == 0 and self.straighten_errors:
+            self.statusBar().showMessage(
+                QtCore.QCoreApplication.translate(
+                    "status_straighten_failed", "Straightening failed"
+                )
+                + ": "
+                + self.straighten_errors[0]
+            )
+            QtWidgets.QMessageBox.warning(
+                self,
+                QtCore.QCoreApplication.translate(
+                    "straighten_failed", "Straightening Failed"
+                ),
+                QtCore.QCoreApplication.translate(
+                    "straighten_failed_message",
+                    "These pages could not be straightened and were left as they are:",
+                )
+                + "\n\n"
+                + "\n".join(self.straighten_errors),
+                QtWidgets.QMessageBox.StandardButton.Ok,
+            )
+
     def page_selected(self, index: QtCore.QModelIndex):
         page = index.data(QtCore.Qt.ItemDataRole.UserRole)
 
@@ -686,7 +868,39 @@ class MainWindow(QtWidgets.QMainWindow):
         # Add file path to recent projects menu
         self.recent_files_manager.add_recent_project(filename)
 
+    def ocr_queue_changed(self, depth: int) -> None:
+        if depth:
+            self.statusBar().showMessage(
+                QtCore.QCoreApplication.translate(
+                    "status_ocr_queue", "Boxes waiting for recognition"
+                )
+                + ": "
+                + str(depth)
+            )
+        else:
+            self.statusBar().clearMessage()
+
+    def ocr_job_failed(self, failure: tuple) -> None:
+        error, job = failure
+
+        self.statusBar().showMessage(
+            QtCore.QCoreApplication.translate(
+                "status_ocr_failed", "Recognition failed"
+            )
+            + ": "
+            + error
+        )
+
     def close_project(self) -> None:
+        # Drop jobs of the closed project and keep its scene from receiving later results
+        self.engine_manager.scheduler.cancel_all()
+        self.engine_manager.scheduler.result.disconnect(
+            self.box_editor.scene().new_ocr_results
+        )
+        self.engine_manager.scheduler.partial.disconnect(
+            self.box_editor.scene().partial_ocr_results
+        )
+
         self.page_icon_view.close()
         self.box_editor.close()
         self.property_editor.close()
@@ -699,8 +913,24 @@ class MainWindow(QtWidgets.QMainWindow):
     def export_project(self) -> None:
         self.run_exporter("PlainText")
 
+    def get_exporter(self, id):
+        if not self.exporter_manager:
+            from exporter import (
+                ExporterEPUB,
+                ExporterManager,
+                ExporterODT,
+                ExporterPlainText,
+            )
+
+            self.exporter_manager = ExporterManager()
+            self.exporter_manager.add_exporter("EPUB", ExporterEPUB(self))
+            self.exporter_manager.add_exporter("PlainText", ExporterPlainText(self))
+            self.exporter_manager.add_exporter("ODT", ExporterODT(self))
+
+        return self.exporter_manager.get_exporter(id)
+
     def run_exporter(self, id):
-        exporter = self.exporter_manager.get_exporter(id)
+        exporter = self.get_exporter(id)
 
         # Exclude boxes in header or footer area
         self.box_editor.scene().disable_boxes_in_header_footer()
@@ -766,6 +996,15 @@ class MainWindow(QtWidgets.QMainWindow):
         options = Preferences(self, self.settings)
 
         if options.exec():
+            # Takes effect for the next layout analysis or recognition
+            self.engine_manager.preprocess_options = load_preprocess_options(
+                self.settings
+            )
+
+            for engine in self.engine_manager.engines:
+                engine.refine_options = load_refine_options(self.settings)
+                engine.set_tier_policy(load_tier_policy(self.settings))
+
             return True
         else:
             return False
@@ -785,6 +1024,7 @@ class MainWindow(QtWidgets.QMainWindow):
 
     def closeEvent(self, event: QtGui.QCloseEvent) -> None:
         self.save_settings()
+        self.engine_manager.shutdown()
         return super().closeEvent(event)
 
     def save_settings(self) -> None:
@@ -1,5 +1,6 @@
 from PySide6 import QtCore, QtGui, QtWidgets
 
+from ocr_engine.deskew import straighten_image
 from project import Page, Project
 
 
@@ -17,9 +18,18 @@ class ItemImage(QtGui.QStandardItem):
         self.setEditable(False)
         self.setText(page.name)
 
+        self.update_image(page)
+        self.setData(page, QtCore.Qt.ItemDataRole.UserRole)
+
+    def update_image(self, page: Page) -> None:
+        # Straightening the thumbnail is much cheaper than the full page
         image = QtGui.QImage(page.image_path).scaledToWidth(100, QtCore.Qt.TransformationMode.SmoothTransformation)
+        image = straighten_image(image, page.rotation, page.skew)
+
+        if page.rotation % 180:
+            image = image.scaledToWidth(100, QtCore.Qt.TransformationMode.SmoothTransformation)
+
         self.setData(image, QtCore.Qt.ItemDataRole.DecorationRole)
-        self.setData(page, QtCore.Qt.ItemDataRole.UserRole)
 
 
 class PagesListStore(QtGui.QStandardItemModel):
@@ -81,6 +91,14 @@ class PagesIconView(QtWidgets.QListView):
     def load_page(self, page: Page):
         self.model().add_page(page)
 
+    def update_page_image(self, page: Page) -> None:
+        for row in range(self.model().rowCount()):
+            item = self.model().item(row)
+
+            if item.data(QtCore.Qt.ItemDataRole.UserRole) == page:
+                item.update_image(page)
+                break
+
     def cleanup(self) -> None:
         self.model().removeRows(0, self.model().rowCount())
 
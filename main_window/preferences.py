@@ -1,5 +1,18 @@
 from PySide6 import QtCore, QtGui, QtWidgets
 
+from ocr_engine.concurrency import Concurrency, load_concurrency, save_concurrency
+from ocr_engine.model_tiers import save_tier_policy
+from ocr_engine.preprocessing import (
+    PreprocessOptions,
+    load_preprocess_options,
+    save_preprocess_options,
+)
+from ocr_engine.word_refinement import (
+    RefineOptions,
+    load_refine_options,
+    save_refine_options,
+)
+
 
 class Preferences_General(QtWidgets.QWidget):
     def __init__(self, parent, settings: QtCore.QSettings) -> None:
@@ -28,6 +41,224 @@ class Preferences_General(QtWidgets.QWidget):
         )
         layout.addWidget(self.diagnostic_threshold_edit, 0, 1)
 
+        concurrency = load_concurrency(settings)
+
+        self.ocr_workers_edit = QtWidgets.QLineEdit(str(concurrency.workers))
+        self.ocr_workers_edit.setValidator(QtGui.QIntValidator(0, 256, self))
+
+        layout.addWidget(
+            QtWidgets.QLabel(
+                QtCore.QCoreApplication.translate(
+                    "ocr_workers",
+                    "OCR workers (0 uses one per CPU, needs restart)",
+                )
+            ),
+            1,
+            0,
+        )
+        layout.addWidget(self.ocr_workers_edit, 1, 1)
+
+        self.ocr_threads_per_worker_edit = QtWidgets.QLineEdit(
+            str(concurrency.threads_per_worker)
+        )
+        self.ocr_threads_per_worker_edit.setValidator(
+            QtGui.QIntValidator(0, 256, self)
+        )
+
+        layout.addWidget(
+            QtWidgets.QLabel(
+                QtCore.QCoreApplication.translate(
+                    "ocr_threads_per_worker",
+                    "Tesseract threads per worker (0 divides CPUs among workers, needs restart)",
+                )
+            ),
+            2,
+            0,
+        )
+        layout.addWidget(self.ocr_threads_per_worker_edit, 2, 1)
+
+        self.ocr_use_processes_checkbox = QtWidgets.QCheckBox(
+            QtCore.QCoreApplication.translate(
+                "ocr_use_processes", "Run OCR workers as processes (needs restart)"
+            )
+        )
+        self.ocr_use_processes_checkbox.setChecked(concurrency.processes)
+
+        layout.addWidget(self.ocr_use_processes_checkbox, 3, 0, 1, 2)
+
+        layout.addWidget(
+            QtWidgets.QLabel(
+                QtCore.QCoreApplication.translate(
+                    "ocr_autotune",
+                    "Run 'python -m ocrreader autotune PAGE' to find the fastest combination",
+                )
+            ),
+            4,
+            0,
+            1,
+            2,
+        )
+
+        self.page_recognition_checkbox = QtWidgets.QCheckBox(
+            QtCore.QCoreApplication.translate(
+                "page_recognition",
+                "Recognize analyzed pages at once and distribute words into boxes",
+            )
+        )
+        self.page_recognition_checkbox.setChecked(
+            settings.value("page_recognition", False, type=bool)
+        )
+
+        layout.addWidget(self.page_recognition_checkbox, 5, 0, 1, 2)
+
+        preprocess_options = load_preprocess_options(settings)
+
+        self.preprocess_combo = QtWidgets.QComboBox()
+        self.preprocess_combo.addItem(
+            QtCore.QCoreApplication.translate("preprocess_none", "None")
+        )
+        self.preprocess_combo.addItem(
+            QtCore.QCoreApplication.translate("preprocess_grayscale", "Grayscale")
+        )
+        self.preprocess_combo.addItem(
+            QtCore.QCoreApplication.translate(
+                "preprocess_binarize", "Black and white (adaptive threshold)"
+            )
+        )
+
+        if preprocess_options.binarize:
+            self.preprocess_combo.setCurrentIndex(2)
+        elif preprocess_options.grayscale:
+            self.preprocess_combo.setCurrentIndex(1)
+
+        layout.addWidget(
+            QtWidgets.QLabel(
+                QtCore.QCoreApplication.translate(
+                    "preprocess", "Page preprocessing before OCR"
+                )
+            ),
+            6,
+            0,
+        )
+        layout.addWidget(self.preprocess_combo, 6, 1)
+
+        self.preprocess_denoise_checkbox = QtWidgets.QCheckBox(
+            QtCore.QCoreApplication.translate(
+                "preprocess_denoise", "Remove noise before OCR"
+            )
+        )
+        self.preprocess_denoise_checkbox.setChecked(preprocess_options.denoise)
+
+        layout.addWidget(self.preprocess_denoise_checkbox, 7, 0, 1, 2)
+
+        self.preprocess_remove_border_checkbox = QtWidgets.QCheckBox(
+            QtCore.QCoreApplication.translate(
+                "preprocess_remove_border", "Remove dark scan borders before OCR"
+            )
+        )
+        self.preprocess_remove_border_checkbox.setChecked(
+            preprocess_options.remove_border
+        )
+
+        layout.addWidget(self.preprocess_remove_border_checkbox, 8, 0, 1, 2)
+
+        self.refine_confidence_edit = QtWidgets.QLineEdit(
+            f"{load_refine_options(settings).confidence:g}"
+        )
+        self.refine_confidence_edit.setValidator(QtGui.QIntValidator(0, 100, self))
+
+        layout.addWidget(
+            QtWidgets.QLabel(
+                QtCore.QCoreApplication.translate(
+                    "refine_confidence",
+                    "Recognize words below this confidence again (0 disables)",
+                )
+            ),
+            9,
+            0,
+        )
+        layout.addWidget(self.refine_confidence_edit, 9, 1)
+
+        self.tier_fast_path_edit = QtWidgets.QLineEdit(
+            settings.value("tier_fast_path", "")
+        )
+
+        layout.addWidget(
+            QtWidgets.QLabel(
+                QtCore.QCoreApplication.translate(
+                    "tier_fast_path",
+                    "Fast models (tessdata_fast directory, empty always uses the default models)",
+                )
+            ),
+            10,
+            0,
+        )
+        layout.addWidget(self.tier_fast_path_edit, 10, 1)
+
+        self.tier_best_path_edit = QtWidgets.QLineEdit(
+            settings.value("tier_best_path", "")
+        )
+
+        layout.addWidget(
+            QtWidgets.QLabel(
+                QtCore.QCoreApplication.translate(
+                    "tier_best_path",
+                    "Models for weak results (tessdata_best directory, empty uses the default models)",
+                )
+            ),
+            11,
+            0,
+        )
+        layout.addWidget(self.tier_best_path_edit, 11, 1)
+
+        self.tier_best_legacy_checkbox = QtWidgets.QCheckBox(
+            QtCore.QCoreApplication.translate(
+                "tier_best_legacy",
+                "Combine legacy and LSTM engines for weak results (needs models with legacy data)",
+            )
+        )
+        self.tier_best_legacy_checkbox.setChecked(
+            settings.value("tier_best_legacy", False, type=bool)
+        )
+
+        layout.addWidget(self.tier_best_legacy_checkbox, 12, 0, 1, 2)
+
+        self.tier_min_confidence_edit = QtWidgets.QLineEdit(
+            str(settings.value("tier_min_confidence", 80))
+        )
+        self.tier_min_confidence_edit.setValidator(QtGui.QIntValidator(0, 100, self))
+
+        layout.addWidget(
+            QtWidgets.QLabel(
+                QtCore.QCoreApplication.translate(
+                    "tier_min_confidence",
+                    "Recognize boxes again below this mean word confidence",
+                )
+            ),
+            13,
+            0,
+        )
+        layout.addWidget(self.tier_min_confidence_edit, 13, 1)
+
+        self.tier_min_dictionary_rate_edit = QtWidgets.QLineEdit(
+            str(settings.value("tier_min_dictionary_rate", 0))
+        )
+        self.tier_min_dictionary_rate_edit.setValidator(
+            QtGui.QIntValidator(0, 100, self)
+        )
+
+        layout.addWidget(
+            QtWidgets.QLabel(
+                QtCore.QCoreApplication.translate(
+                    "tier_min_dictionary_rate",
+                    "... or below this percentage of words found in the dictionary (0 disables)",
+                )
+            ),
+            14,
+            0,
+        )
+        layout.addWidget(self.tier_min_dictionary_rate_edit, 14, 1)
+
 
 class Preferences(QtWidgets.QDialog):
     def __init__(self, parent, settings: QtCore.QSettings) -> None:
@@ -77,5 +308,42 @@ class Preferences(QtWidgets.QDialog):
             "diagnostics_threshold",
             self.preferences_general.diagnostic_threshold_edit.text(),
         )
+        save_concurrency(
+            self.settings,
+            Concurrency(
+                int(self.preferences_general.ocr_workers_edit.text() or 0),
+                int(self.preferences_general.ocr_threads_per_worker_edit.text() or 0),
+                self.preferences_general.ocr_use_processes_checkbox.isChecked(),
+            ),
+        )
+        self.settings.setValue(
+            "page_recognition",
+            self.preferences_general.page_recognition_checkbox.isChecked(),
+        )
+        save_preprocess_options(
+            self.settings,
+            PreprocessOptions(
+                grayscale=self.preferences_general.preprocess_combo.currentIndex() == 1,
+                binarize=self.preferences_general.preprocess_combo.currentIndex() == 2,
+                denoise=self.preferences_general.preprocess_denoise_checkbox.isChecked(),
+                remove_border=self.preferences_general.preprocess_remove_border_checkbox.isChecked(),
+            ),
+        )
+        save_refine_options(
+            self.settings,
+            RefineOptions(
+                confidence=float(
+                    self.preferences_general.refine_confidence_edit.text() or 0
+                )
+            ),
+        )
+        save_tier_policy(
+            self.settings,
+            self.preferences_general.tier_fast_path_edit.text(),
+            self.preferences_general.tier_best_path_edit.text(),
+            self.preferences_general.tier_best_legacy_checkbox.isChecked(),
+            float(self.preferences_general.tier_min_confidence_edit.text() or 0),
+            float(self.preferences_general.tier_min_dictionary_rate_edit.text() or 0),
+        )
 
         return super().accept()
@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from PySide6 import QtCore
+
+# Kept free of Tesseract imports: the thread limit has to be in the environment before libgomp is loaded along with Tesseract
+
+
+@dataclass
+class Concurrency():
+    '''Number of OCR workers (threads or processes) and of Tesseract's OpenMP threads within each worker'''
+    # 0 uses one per CPU
+    workers: int = 0
+    # 0 divides the CPUs among the workers
+    threads_per_worker: int = 0
+    # Run workers as processes instead of threads
+    processes: bool = False
+
+    def worker_count(self) -> int:
+        return self.workers or os.cpu_count() or 1
+
+    def thread_count(self) -> int:
+        return self.threads_per_worker or max((os.cpu_count() or 1) // self.worker_count(), 1)
+
+
+def load_concurrency(settings: QtCore.QSettings) -> Concurrency:
+    concurrency = Concurrency(
+        int(settings.value('ocr_workers', 0) or 0),
+        int(settings.value('ocr_threads_per_worker', 0) or 0),
+        settings.value('ocr_use_processes', False, type=bool),
+    )
+
+    # Earlier versions only had a number of worker processes
+    worker_processes = int(settings.value('ocr_worker_processes', 0) or 0)
+
+    if worker_processes and not settings.contains('ocr_use_processes'):
+        concurrency.workers = worker_processes
+        concurrency.processes = True
+
+    return concurrency
+
+
+def save_concurrency(settings: QtCore.QSettings, concurrency: Concurrency) -> None:
+    settings.setValue('ocr_workers', concurrency.workers)
+    settings.setValue('ocr_threads_per_worker', concurrency.threads_per_worker)
+    settings.setValue('ocr_use_processes', concurrency.processes)
+    settings.remove('ocr_worker_processes')
+
+
+def apply_thread_limit(threads: int) -> None:
+    '''Limit Tesseract's OpenMP threads, only has an effect on libraries loaded afterwards and on processes started afterwards'''
+    os.environ['OMP_THREAD_LIMIT'] = str(threads)
+
+
+def autotune(image_path: str, ppi: float, language: str, pages: int = 0, candidates: list[Concurrency] | None = None, progress=None) -> list[tuple[Concurrency, float]]:
+    '''Recognize a sample page with several worker and thread combinations, returns the combinations with their seconds per page, fastest first
+
+    Every combination runs in freshly spawned processes since the thread limit can't be changed once Tesseract is loaded.
+    '''
+    from ocr_engine.ocr_process_worker import PageJob, init_worker, process_page
+
+    cpus = os.cpu_count() or 1
+
+    if candidates is None:
+        candidates = []
+        workers = cpus
+
+        while workers >= 1:
+            for threads in {1, max(cpus // workers, 1)}:
+                candidates.append(Concurrency(workers, threads, True))
+            workers //= 2
+
+    job = PageJob(image_path, ppi, language, recognize=True)
+    thread_limit = os.environ.get('OMP_THREAD_LIMIT')
+    results: list[tuple[Concurrency, float]] = []
+
+    try:
+        for concurrency in candidates:
+            apply_thread_limit(concurrency.thread_count())
+
+            # Enough pages to keep every worker busy twice
+            page_count = pages or concurrency.worker_count() * 2
+
+            with ProcessPoolExecutor(concurrency.worker_count(), mp_context=multiprocessing.get_context('spawn'), initializer=init_worker, initargs=(1,)) as executor:
+                # Warm up all workers, loading Tesseract and traineddata isn't part of the measurement
+                list(executor.map(process_page, [PageJob(image_path, ppi, language)] * concurrency.worker_count()))
+
+                start = time.perf_counter()
+                list(executor.map(process_page, [job] * page_count))
+                seconds = (time.perf_counter() - start) / page_count
+
+            results.append((concurrency, seconds))
+
+            if progress:
+                progress(concurrency, seconds)
+    finally:
+        if thread_limit is None:
+            os.environ.pop('OMP_THREAD_LIMIT', None)
+        else:
+            os.environ['OMP_THREAD_LIMIT'] = thread_limit
+
+    return sorted(results, key=lambda result: result[1])
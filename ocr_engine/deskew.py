@@ -0,0 +1,77 @@
+import cv2  # type: ignore
+import numpy
+from PySide6 import QtCore, QtGui
+
+# Pixels used for estimating the skew, more don't make the angle more precise
+MAX_SKEW_SAMPLES = 40000
+
+
+def projection_sharpness(ys: numpy.ndarray, xs: numpy.ndarray, angles: numpy.ndarray) -> numpy.ndarray:
+    '''Sum of squared row counts of the ink pixels rotated by each angle (degrees), highest when rows of text are horizontal'''
+    radians = numpy.radians(angles)[:, numpy.newaxis]
+
+    # Rows of the ink pixels after rotating by each angle, one row of the matrix per angle
+    rows = numpy.rint(ys * numpy.cos(radians) + xs * numpy.sin(radians)).astype(numpy.int64)
+    rows -= rows.min(axis=1, keepdims=True)
+
+    width = int(rows.max()) + 1
+    offsets = numpy.arange(len(angles))[:, numpy.newaxis] * width
+    counts = numpy.bincount((rows + offsets).ravel(), minlength=len(angles) * width).reshape(len(angles), width)
+
+    return (counts.astype(numpy.float64) ** 2).sum(axis=1)
+
+
+def estimate_skew(gray: numpy.ndarray, max_angle: float = 5.0, precision: float = 0.05) -> float:
+    '''Estimate by how many degrees the text lines of a gray page have to be rotated clockwise to become horizontal
+
+    Compares the horizontal projection profiles of the ink rotated by candidate angles, first coarse then around the best one.
+    '''
+    ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1]
+    ys, xs = numpy.nonzero(ink)
+
+    if len(ys) < 2:
+        return 0.0
+
+    if len(ys) > MAX_SKEW_SAMPLES:
+        samples = numpy.random.default_rng(0).choice(len(ys), MAX_SKEW_SAMPLES, replace=False)
+        ys, xs = ys[samples], xs[samples]
+
+    ys = ys.astype(numpy.float64)
+    xs = xs.astype(numpy.float64)
+
+    step = 0.5
+    angles = numpy.arange(-max_angle, max_angle + step / 2, step)
+
+    while True:
+        best = float(angles[numpy.argmax(projection_sharpness(ys, xs, angles))])
+
+        if step <= precision:
+            return best
+
+        angles = numpy.arange(best - step, best + step + step / 20, step / 10)
+        step /= 10
+
+
+def straighten_image(image: QtGui.QImage, rotation: int = 0, skew: float = 0.0) -> QtGui.QImage:
+    '''Rotate clockwise by a multiple of 90 degrees (exact, swapping width and height) and then by skew degrees around the center
+
+    Skew correction keeps the size, corners rotated out of the image are lost and uncovered areas are white.
+    '''
+    if rotation % 360:
+        image = image.transformed(QtGui.QTransform().rotate(rotation % 360))
+
+    if not skew:
+        return image
+
+    straightened = QtGui.QImage(image.size(), QtGui.QImage.Format.Format_RGB32)
+    straightened.fill(QtCore.Qt.GlobalColor.white)
+
+    painter = QtGui.QPainter(straightened)
+    painter.setRenderHint(QtGui.QPainter.RenderHint.SmoothPixmapTransform)
+    painter.translate(image.width() / 2, image.height() / 2)
+    painter.rotate(skew)
+    painter.translate(-image.width() / 2, -image.height() / 2)
+    painter.drawImage(0, 0, image)
+    painter.end()
+
+    return straightened
@@ -0,0 +1,37 @@
+import importlib
+from dataclasses import dataclass
+
+from PySide6 import QtCore
+
+
+@dataclass(frozen=True)
+class EngineEntry():
+    '''Where to find an engine class, modules are only imported once an engine gets created so startup doesn't load Tesseract'''
+    module: str
+    class_name: str
+
+
+ENGINES = {
+    'tesserocr': EngineEntry('ocr_engine.ocr_engine_tesserocr', 'OCREngineTesserocr'),
+    'tesserocr-processes': EngineEntry('ocr_engine.ocr_engine_tesserocr_process', 'OCREngineTesserocrProcess'),
+    'pytesseract': EngineEntry('ocr_engine.ocr_engine_pytesseract', 'OCREnginePytesseract'),
+}
+
+
+def create_engine(name: str, **kwargs):
+    '''Import the engine's module and create the engine with kwargs'''
+    if name not in ENGINES:
+        raise ValueError(f'Unknown engine {name}')
+
+    entry = ENGINES[name]
+
+    return getattr(importlib.import_module(entry.module), entry.class_name)(**kwargs)
+
+
+def load_languages(settings: QtCore.QSettings, name: str) -> list[str]:
+    '''Languages the engine offered last session, empty if unknown'''
+    return settings.value(f'engine_languages/{name}', [], type=list)
+
+
+def save_languages(settings: QtCore.QSettings, name: str, languages: list[str]) -> None:
+    settings.setValue(f'engine_languages/{name}', list(languages))
@@ -0,0 +1,68 @@
+import numpy
+from PySide6 import QtGui
+
+# Pixel format handed to Tesseract, RGB888 is stored byte by byte in RGB order just as Tesseract expects for 3 bytes per pixel
+TESSERACT_FORMAT = QtGui.QImage.Format.Format_RGB888
+TESSERACT_BYTES_PER_PIXEL = 3
+# Gray pages go to Tesseract with a single byte per pixel
+TESSERACT_GRAY_FORMAT = QtGui.QImage.Format.Format_Grayscale8
+GRAY_FORMATS = (QtGui.QImage.Format.Format_Grayscale8, QtGui.QImage.Format.Format_Grayscale16)
+# Formats whose colours are known from their colour table
+INDEXED_FORMATS = (QtGui.QImage.Format.Format_Indexed8, QtGui.QImage.Format.Format_Mono, QtGui.QImage.Format.Format_MonoLSB)
+
+
+def downsample_scale(ppi: float, target_ppi: float) -> float:
+    '''Factor to downsample an image of ppi resolution by to reach target_ppi, images are never upsampled and 0 keeps them as they are'''
+    if target_ppi <= 0 or ppi <= target_ppi:
+        return 1.0
+
+    return target_ppi / ppi
+
+
+def qimage_to_numpy(image: QtGui.QImage) -> numpy.ndarray:
+    '''View QImage pixel data as (height, width, channels) numpy array without copying, image must stay alive while the view is in use'''
+    channels = image.depth() // 8
+    buffer = numpy.frombuffer(image.constBits(), dtype=numpy.uint8, count=image.sizeInBytes())
+
+    # Lines may be padded to 32 bit boundaries, cut off the padding
+    rows = buffer.reshape((image.height(), image.bytesPerLine()))
+
+    return rows[:, :image.width() * channels].reshape((image.height(), image.width(), channels))
+
+
+def pixmap_to_numpy(pixmap: QtGui.QPixmap) -> numpy.ndarray:
+    '''Convert pixmap into a contiguous BGRA array usable by OpenCV'''
+    image = pixmap.toImage().convertToFormat(QtGui.QImage.Format.Format_ARGB32)
+
+    # Copy once here, the view would otherwise point into the temporary image
+    return numpy.ascontiguousarray(qimage_to_numpy(image))
+
+
+def is_gray(image: QtGui.QImage) -> bool:
+    '''Whether image is gray by its format, only the colour table of indexed images is checked and pixels are never scanned'''
+    return image.format() in GRAY_FORMATS or (image.format() in INDEXED_FORMATS and image.allGray())
+
+
+def qimage_to_tesseract_bytes(image: QtGui.QImage) -> tuple[bytes, int, int, int, int]:
+    '''Get raw pixel data and geometry as expected by SetImageBytes (no image encoding involved)
+
+    Gray images, like preprocessed pages whose pixmaps keep their gray format, are handed over with one byte per pixel.
+    '''
+    if is_gray(image):
+        if image.format() != TESSERACT_GRAY_FORMAT:
+            image = image.convertToFormat(TESSERACT_GRAY_FORMAT)
+
+        return (bytes(image.constBits()), image.width(), image.height(), 1, image.bytesPerLine())
+
+    if image.format() != TESSERACT_FORMAT:
+        image = image.convertToFormat(TESSERACT_FORMAT)
+
+    return (bytes(image.constBits()), image.width(), image.height(), TESSERACT_BYTES_PER_PIXEL, image.bytesPerLine())
+
+
+def qimage_to_packed_bytes(image: QtGui.QImage) -> bytes:
+    '''Get RGB888 pixel data without line padding, identical to what PIL's tobytes() returns for RGB images'''
+    if image.format() != TESSERACT_FORMAT:
+        image = image.convertToFormat(TESSERACT_FORMAT)
+
+    return qimage_to_numpy(image).tobytes()
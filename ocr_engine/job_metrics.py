@@ -0,0 +1,103 @@
+import json
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
+
+from PySide6 import QtCore
+
+# Stages of a job in the order they happen, engines only record the ones they have
+STAGES = [
+    # Waiting in the scheduler's queue
+    'queued',
+    # Cropping the page and converting it into the raster handed to Tesseract
+    'convert',
+    # SetImage and SetRectangle
+    'set_image',
+    # Finding lines when recognizing line by line
+    'layout',
+    'recognize',
+    # Walking Tesseract's result iterator into result blocks
+    'extract',
+    # Recognizing weak words again (RefineOptions)
+    'refine',
+    # Recognition in a worker process, including transferring the job and its results
+    'worker',
+    # From the engine emitting the result to the scheduler receiving it in the GUI thread
+    'deliver',
+    # Estimating text colours
+    'colors',
+    # Applying the result to the editor (new_ocr_results)
+    'apply',
+]
+
+
+@dataclass
+class JobMetrics():
+    '''Where the time of a single recognition job went, stages are in seconds'''
+    page_uid: int
+    box_uid: int
+    language: str
+    engine: str = ''
+    # Pixels of the region handed to the engine
+    pixels: int = 0
+    words: int = 0
+    cached: bool = False
+    stages: dict[str, float] = field(default_factory=dict)
+    # Model tier of the result and seconds spent in each tier tried, empty without tiers (TierPolicy)
+    tier: str = ''
+    tiers: dict[str, float] = field(default_factory=dict)
+    # From dispatching the job to its result being applied
+    total: float = 0.0
+    # time.perf_counter() when the job was dispatched and when the engine emitted its result
+    started: float = 0.0
+    emitted: float = 0.0
+
+    @contextmanager
+    def measure(self, stage: str):
+        '''Add the time spent in the with block to stage'''
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.stages[stage] = self.stages.get(stage, 0.0) + time.perf_counter() - start
+
+    def to_json(self) -> str:
+        metrics = asdict(self)
+        del metrics['started']
+        del metrics['emitted']
+
+        return json.dumps(metrics)
+
+
+def measure(metrics: JobMetrics | None, stage: str):
+    '''Measure a stage if the job is instrumented, otherwise do nothing'''
+    return metrics.measure(stage) if metrics else nullcontext()
+
+
+class JobMetricsRecorder(QtCore.QObject):
+    '''Keeps the metrics of the most recent jobs while enabled, recording costs nothing when disabled'''
+    # JobMetrics of a finished job
+    recorded = QtCore.Signal(object)
+
+    def __init__(self, max_records: int = 10000) -> None:
+        super().__init__()
+
+        self.enabled = False
+        self.records: deque[JobMetrics] = deque(maxlen=max_records)
+
+    def add(self, metrics: JobMetrics) -> None:
+        '''Record metrics of a job whose result has just been applied'''
+        metrics.total = time.perf_counter() - metrics.started
+        self.records.append(metrics)
+        self.recorded.emit(metrics)
+
+    def clear(self) -> None:
+        self.records.clear()
+
+    def dump(self, path: str) -> None:
+        '''Write the recorded metrics as JSON lines, one job per line'''
+        with open(path, 'w', encoding='utf-8') as file:
+            for metrics in self.records:
+                file.write(metrics.to_json() + '\n')
@@ -0,0 +1,49 @@
+import numpy
+from PySide6 import QtCore
+
+# How far the previous line finder's dilation (twice with a 1000 x 1 kernel) extended lines to the left and right
+LINE_REACH = (998, 1000)
+
+
+def find_runs(mask: numpy.ndarray) -> numpy.ndarray:
+    '''Get (start, end) of every run of True values, end exclusive'''
+    edges = numpy.diff(numpy.concatenate(([0], mask.astype(numpy.int8), [0])))
+
+    return numpy.stack((numpy.flatnonzero(edges == 1), numpy.flatnonzero(edges == -1)), axis=1)
+
+
+def find_line_rects(ink: numpy.ndarray, skew_tolerance: float = 0.0, reach: tuple[int, int] = LINE_REACH) -> list[QtCore.QRect]:
+    '''Find text lines in a boolean ink mask using its horizontal projection profile, top to bottom
+
+    Lines are separated by rows without ink. On skewed pages neighbouring lines share some rows, with skew_tolerance rows
+    containing less ink than this fraction of the fullest row separate lines too, their ink is added to the nearer line.
+    '''
+    height, width = ink.shape
+    profile = numpy.count_nonzero(ink, axis=1)
+
+    if not profile.any():
+        return []
+
+    cores = find_runs(profile > skew_tolerance * profile.max())
+    has_ink = profile > 0
+
+    rects: list[QtCore.QRect] = []
+
+    for i, (top, bottom) in enumerate(cores):
+        # Grow into rows with little ink up to half way to the neighbouring lines
+        upper_limit = (cores[i - 1][1] + top + 1) // 2 if i > 0 else 0
+        lower_limit = (bottom + cores[i + 1][0]) // 2 if i < len(cores) - 1 else height
+
+        while top > upper_limit and has_ink[top - 1]:
+            top -= 1
+
+        while bottom < lower_limit and has_ink[bottom]:
+            bottom += 1
+
+        columns = numpy.flatnonzero(ink[top:bottom].any(axis=0))
+        left = max(int(columns[0]) - reach[0], 0)
+        right = min(int(columns[-1]) + reach[1], width - 1)
+
+        rects.append(QtCore.QRect(left, int(top), right - left + 1, int(bottom - top)))
+
+    return rects
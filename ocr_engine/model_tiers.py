@@ -0,0 +1,160 @@
+import hashlib
+import time
+from dataclasses import dataclass
+
+from iso639 import Lang  # type: ignore
+from PySide6 import QtCore
+
+from ocr_engine.job_metrics import JobMetrics
+from ocr_engine.ocr_results import OCRResultBlock, OCRResultWord
+
+# Kept free of Tesseract imports, OCR engine modes as in tesserocr.OEM
+OEM_TESSERACT_LSTM_COMBINED = 2
+OEM_DEFAULT = 3
+
+
+@dataclass(frozen=True)
+class ModelTier():
+    name: str
+    # tessdata directory with the tier's models, empty uses Tesseract's default
+    path: str = ''
+    oem: int = OEM_DEFAULT
+
+
+# Recognition without tiers
+DEFAULT_TIER = ModelTier('default')
+
+
+@dataclass(frozen=True)
+class TierPolicy():
+    '''Recognize boxes with fast models first and only escalate to slower, more accurate ones if the result looks weak
+
+    A result is weak if its mean word confidence or the share of words found in the spell checking dictionary is below the minimum (both in percent).
+    Tiers are tried in order, the most confident result of all tiers tried is kept. Results are compared after word refinement, if it is enabled.
+    '''
+    tiers: tuple[ModelTier, ...] = ()
+    min_confidence: float = 80.0
+    # 0 doesn't check words against the dictionary
+    min_dictionary_rate: float = 0.0
+
+    def enabled(self) -> bool:
+        return len(self.tiers) > 1
+
+    def get_tiers(self) -> tuple[ModelTier, ...]:
+        return self.tiers or (DEFAULT_TIER,)
+
+    def cache_suffix(self) -> str:
+        '''Part of result cache keys, results depend on the models and thresholds'''
+        if not self.enabled():
+            return ''
+
+        return '-tiers-' + hashlib.sha1(repr(self).encode('utf-8')).hexdigest()[:12]
+
+
+def load_tier_policy(settings: QtCore.QSettings) -> TierPolicy:
+    '''Tiers are only used with a directory of fast models set, escalating to the best models (or Tesseract's default ones)'''
+    fast_path = settings.value('tier_fast_path', '')
+
+    if not fast_path:
+        return TierPolicy()
+
+    # Legacy models combined with LSTM need traineddata containing both, like those of the tessdata repository
+    best_oem = OEM_TESSERACT_LSTM_COMBINED if settings.value('tier_best_legacy', False, type=bool) else OEM_DEFAULT
+
+    return TierPolicy(
+        (ModelTier('fast', fast_path), ModelTier('best', settings.value('tier_best_path', ''), best_oem)),
+        float(settings.value('tier_min_confidence', 80) or 0),
+        float(settings.value('tier_min_dictionary_rate', 0) or 0),
+    )
+
+
+def save_tier_policy(settings: QtCore.QSettings, fast_path: str, best_path: str, best_legacy: bool, min_confidence: float, min_dictionary_rate: float) -> None:
+    settings.setValue('tier_fast_path', fast_path)
+    settings.setValue('tier_best_path', best_path)
+    settings.setValue('tier_best_legacy', best_legacy)
+    settings.setValue('tier_min_confidence', min_confidence)
+    settings.setValue('tier_min_dictionary_rate', min_dictionary_rate)
+
+
+def result_words(blocks: list[OCRResultBlock]) -> list[OCRResultWord]:
+    return [word for block in blocks for word in block.get_words()]
+
+
+def mean_confidence(words: list[OCRResultWord]) -> float:
+    return sum(word.confidence for word in words) / len(words) if words else 0.0
+
+
+def dictionary_rate(words: list[OCRResultWord], check) -> float:
+    '''Percentage of words check accepts, punctuation around words and words without letters are ignored'''
+    texts = [text for text in (word.text.strip('.,;:!?"\'()[]{}«»„“”‘’-–—') for word in words) if any(c.isalpha() for c in text)]
+
+    if not texts:
+        return 100.0
+
+    return 100.0 * sum(1 for text in texts if check(text)) / len(texts)
+
+
+def word_check(language: Lang):
+    '''Spell check function for the language, None without an installed dictionary'''
+    if not language.pt1:
+        return None
+
+    from document_helper import get_dictionary
+
+    try:
+        return get_dictionary(language.pt1 + '_' + language.pt1.upper()).check
+    except Exception:
+        # enchant or the dictionary isn't installed
+        return None
+
+
+def needs_escalation(blocks: list[OCRResultBlock], policy: TierPolicy, check=None) -> bool:
+    '''Whether a result is weak enough to try the next tier, results without words never are (images, empty boxes)'''
+    words = result_words(blocks)
+
+    if not words:
+        return False
+
+    if mean_confidence(words) < policy.min_confidence:
+        return True
+
+    return bool(check and policy.min_dictionary_rate > 0 and dictionary_rate(words, check) < policy.min_dictionary_rate)
+
+
+def recognize_tiered(policy: TierPolicy, recognize, check=None, metrics: JobMetrics | None = None) -> list[OCRResultBlock]:
+    '''Call recognize with one tier after another until its result doesn't need escalation, returns the most confident result
+
+    Tiers whose models can't be loaded (recognize raising RuntimeError like tesserocr does) are skipped.
+    With metrics given the time of every tier tried and the tier of the result are recorded.
+    '''
+    blocks: list[OCRResultBlock] | None = None
+    confidence = 0.0
+
+    for tier in policy.get_tiers():
+        start = time.perf_counter()
+
+        try:
+            tier_blocks = recognize(tier)
+        except RuntimeError:
+            if not policy.enabled():
+                raise
+
+            # Language not installed in the tier's tessdata directory
+            continue
+
+        if metrics and policy.enabled():
+            metrics.tiers[tier.name] = time.perf_counter() - start
+
+        tier_confidence = mean_confidence(result_words(tier_blocks))
+
+        if blocks is None or tier_confidence >= confidence:
+            blocks = tier_blocks
+            confidence = tier_confidence
+
+            if metrics and policy.enabled():
+                metrics.tier = tier.name
+
+        if not needs_escalation(blocks, policy, check):
+            break
+
+    return blocks or []
@@ -1,4 +1,3 @@
-import io
 from abc import abstractmethod
 from dataclasses import dataclass, field
 from math import sqrt
@@ -10,7 +9,14 @@ from PIL import Image
 from PySide6 import QtCore, QtGui
 
 # from box_editor.box_editor_scene import Box
+from ocr_engine.image_buffer import pixmap_to_numpy, qimage_to_tesseract_bytes
+from ocr_engine.job_metrics import JobMetrics
+from ocr_engine.line_segmentation import find_line_rects
+from ocr_engine.model_tiers import TierPolicy
+from ocr_engine.ocr_job_scheduler import OCRJob, OCRJobScheduler
 from ocr_engine.ocr_results import OCRResultBlock
+from ocr_engine.preprocessing import PreprocessedPages, PreprocessOptions
+from ocr_engine.word_refinement import RefineOptions
 
 
 @dataclass
@@ -18,18 +24,18 @@ class OCREngine():
     name: str = ''
     languages: list[str] = field(default_factory=list)
     threadpool: QtCore.QThreadPool = QtCore.QThreadPool()
+    # Second pass over weak words, engines without one ignore it
+    refine_options: RefineOptions = RefineOptions()
+    # Fast models first and slower ones only for weak results, engines without tiers ignore it
+    tier_policy: TierPolicy = TierPolicy()
 
     def pixmap_to_pil(self, pixmap: QtGui.QPixmap) -> Image.Image:
         '''Convert into PIL image format'''
-        bytes = QtCore.QByteArray()
-        buffer = QtCore.QBuffer(bytes)
-        buffer.open(QtCore.QIODevice.ReadWrite)
-        # pixmap.save(buffer, 'PNG', 100)
-        pixmap.save(buffer, 'BMP')
-        pil_image = Image.open(io.BytesIO(buffer.data()))
-        buffer.close()
+        # Wrap raw pixel data instead of encoding and decoding an intermediate BMP
+        data, width, height, bytes_per_pixel, bytes_per_line = qimage_to_tesseract_bytes(pixmap.toImage())
+        mode = 'L' if bytes_per_pixel == 1 else 'RGB'
 
-        return pil_image
+        return Image.frombuffer(mode, (width, height), data, 'raw', mode, bytes_per_line, 1)
 
     # def recognize_raw(self, image: QtGui.QPixmap, language: Lang = Lang('English')) -> str | None:
     #     return None
@@ -38,13 +44,32 @@ class OCREngine():
     #     return None
 
     @abstractmethod
-    def start_recognize_thread(self, callback, box, image: QtGui.QPixmap, ppi: float, language: Lang = Lang('English'), raw=False):
+    def start_recognize_thread(self, callback, job: OCRJob, image: QtGui.QPixmap, ppi: float, partial_callback=None, metrics: JobMetrics | None = None):
+        '''Recognize job asynchronously, callback receives [blocks, job] and engines able to stream results call partial_callback with [text, job] in between
+
+        Failed jobs have to be reported as well, with [None, job, error message].
+
+        With metrics given engines record the time of the stages they have.
+        '''
         pass
 
+    def set_tier_policy(self, tier_policy: TierPolicy) -> None:
+        '''Takes effect for the next recognition, engines keeping resources per tier adjust them'''
+        self.tier_policy = tier_policy
+
+    def max_jobs(self) -> int:
+        '''Number of jobs that can run in parallel'''
+        return max(self.threadpool.maxThreadCount(), 1)
+
     @abstractmethod
-    def analyse_layout(self, image: QtGui.QPixmap, from_header=0, to_footer=0) -> list[OCRResultBlock] | None:
+    def analyse_layout(self, image: QtGui.QPixmap, from_header=0, to_footer=0, ppi=0.0, layout_ppi=0.0) -> list[OCRResultBlock] | None:
+        '''Find blocks on the page, with layout_ppi set the page may be analysed at that lower resolution'''
         return None
 
+    def shutdown(self) -> None:
+        '''Release resources like worker processes'''
+        pass
+
     # def parse_hocr(self, hocr: str, image_size: QtCore.QSize, ppi: float, language: Lang) -> list[HOCR_OCRResultBlock]:
     #     '''Parse box into result block'''
     #     soup = BeautifulSoup(hocr, 'html.parser')
@@ -65,40 +90,50 @@ class OCREngine():
 
     #     return blocks
 
-    def find_lines(self, image: QtGui.QPixmap) -> list:
-        lines = []
+    def find_lines(self, image: QtGui.QPixmap, skew_tolerance: float = 0.0) -> list[QtCore.QRect]:
+        gray = cv2.cvtColor(pixmap_to_numpy(image), cv2.COLOR_BGR2GRAY)
+        otsu = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV+cv2.THRESH_OTSU)[1]
 
-        image_cv2 = numpy.array(image.toImage().copy().bits()).reshape((image.height(), image.width(), 4))
+        # Row sums instead of dilating with a 1000 px wide kernel and tracing contours
+        return find_line_rects(otsu > 0, skew_tolerance)
 
-        blur = cv2.GaussianBlur(image_cv2, (3, 3), 0)
-        sat = cv2.cvtColor(blur, cv2.COLOR_BGR2HSV)[:, :, 1]
-        thresh = cv2.threshold(sat, 50, 255, cv2.THRESH_BINARY)[1]
 
-        gray = cv2.cvtColor(image_cv2, cv2.COLOR_BGR2GRAY)
-        otsu = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV+cv2.THRESH_OTSU)[1]
+class OCREngineManager():
+    def __init__(self, engines=[], engine_factory=None, languages: list[str] | None = None) -> None:
+        '''Either takes engines or an engine_factory creating the engine on first use, languages are offered until then'''
+        self.engines = list(engines)
 
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1000, 1))
-        dilate = cv2.dilate(otsu, kernel, iterations=2)
+        # TODO: Use last engine in list for now
+        self.current_engine: OCREngine | None = engines[-1] if engines else None
 
-        # dilate = cv2.bitwise_not(dilate)
+        self.engine_factory = engine_factory
+        self.cached_languages = languages or []
 
-        cnts = cv2.findContours(dilate, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        cnts = cnts[0] if len(cnts) == 2 else cnts[1]
+        self.scheduler = OCRJobScheduler(self)
 
-        for c in reversed(cnts):
-            x, y, w, h = cv2.boundingRect(c)
+        self.preprocess_options = PreprocessOptions()
+        self.preprocessed_pages = PreprocessedPages()
 
-            lines.append(QtCore.QRect(x, y, w, h))
+    def get_current_engine(self) -> OCREngine:
+        if self.current_engine is None:
+            self.current_engine = self.engine_factory()
+            self.engines.append(self.current_engine)
 
-        return lines
+        return self.current_engine
 
+    def get_languages(self) -> list[str]:
+        '''Languages of the current engine, without creating it if they are known from the last session'''
+        if self.current_engine is None and self.cached_languages:
+            return self.cached_languages
 
-class OCREngineManager():
-    def __init__(self, engines=[]) -> None:
-        self.engines = engines
+        return self.get_current_engine().languages
 
-        # TODO: Use last engine in list for now
-        self.current_engine = engines[-1]
+    def prepare_image(self, image: QtGui.QPixmap, scale: float = 1.0) -> QtGui.QPixmap:
+        '''Get page image as handed to the engine for layout analysis and recognition, downsampled by scale'''
+        return self.preprocessed_pages.get(image, self.preprocess_options, scale)
 
-    def get_current_engine(self) -> OCREngine:
-        return self.current_engine
+    def shutdown(self) -> None:
+        self.scheduler.cancel_all()
+
+        for engine in self.engines:
+            engine.shutdown()
@@ -1,47 +1,246 @@
-import cv2
-import numpy
+import math
+import os
+import tempfile
+from dataclasses import dataclass
+
 import pytesseract
 from iso639 import Lang
-from hocr_ocr_result_block import (HOCR_OCRResultBlock, OCRResultLine,
-                              HOCR_OCRResultParagraph, HOCR_OCRResultWord)
+from PIL import Image
 from PySide6 import QtCore, QtGui
-from sklearn.cluster import KMeans
 
-from ocr_engine import OCREngine
+from ocr_engine.job_metrics import JobMetrics
+from ocr_engine.ocr_engine import OCREngine
+from ocr_engine.ocr_job_scheduler import OCRJob
+from ocr_engine.ocr_results import (OCRResultBlock, OCRResultLine,
+                                    OCRResultParagraph, OCRResultWord,
+                                    complete_parents)
+from ocr_engine.text_color import estimate_text_color
+
+# Levels of rows in tesseract's TSV output
+TSV_BLOCK = 2
+TSV_PARAGRAPH = 3
+TSV_LINE = 4
+TSV_WORD = 5
+
+
+def write_multipage_tiff(images: list[Image.Image], directory: str) -> str:
+    '''Stack images as pages of a single TIFF, so a single tesseract process recognizes all of them'''
+    path = os.path.join(directory, 'crops.tif')
+    images[0].save(path, save_all=True, append_images=images[1:], compression='tiff_lzw')
+
+    return path
+
+
+def parse_tsv(data: dict, offsets: list[QtCore.QPoint], language: Lang, ppi: float) -> list[list[OCRResultBlock]]:
+    '''Build result blocks for every page of tesseract's TSV output, moved to the position of the page's crop'''
+    pages: list[list[OCRResultBlock]] = [[] for offset in offsets]
+
+    current_block = None
+    current_paragraph = None
+    current_line = None
+
+    for i, level in enumerate(data['level']):
+        page = data['page_num'][i] - 1
+        offset = offsets[page]
+        bbox_rect = QtCore.QRect(data['left'][i] + offset.x(), data['top'][i] + offset.y(), data['width'][i], data['height'][i])
+
+        if level == TSV_BLOCK:
+            current_block = OCRResultBlock(bbox_rect=bbox_rect, language=language)
+            pages[page].append(current_block)
+        elif level == TSV_PARAGRAPH:
+            current_paragraph = OCRResultParagraph(bbox_rect=bbox_rect)
+            if current_block:
+                current_block.paragraphs.append(current_paragraph)
+        elif level == TSV_LINE:
+            current_line = OCRResultLine(bbox_rect=bbox_rect)
+            if current_paragraph:
+                current_paragraph.lines.append(current_line)
+        elif level == TSV_WORD:
+            text = str(data['text'][i]).strip()
+
+            if text and current_line:
+                word = OCRResultWord(bbox_rect=bbox_rect, text=text, confidence=float(data['conf'][i]))
+                word.blanks_before = 1 if current_line.words else 0
+                word.font_size = math.ceil(1 / ppi * current_line.bbox_rect.height() * 72)
+                current_line.words.append(word)
+
+    for blocks in pages:
+        for block in blocks:
+            for paragraph in block.paragraphs:
+                paragraph.lines = [line for line in paragraph.lines if line.words]
+            block.paragraphs = [paragraph for paragraph in block.paragraphs if paragraph.lines]
+            complete_parents(block)
+
+        blocks[:] = [block for block in blocks if block.paragraphs]
+
+    return pages
+
+
+def raw_line_blocks(line_rects: list[QtCore.QRect], texts: list[str], language: Lang) -> list[OCRResultBlock]:
+    '''Block with a line of a single word for every line recognized by recognize_lines_raw, keeping whitespace within the lines'''
+    paragraph = OCRResultParagraph()
+
+    for line_rect, line_str in zip(line_rects, texts):
+        if line_str:
+            word = OCRResultWord(bbox_rect=line_rect, text=line_str, confidence=100.0)
+
+            line = OCRResultLine(bbox_rect=line_rect)
+            line.words.append(word)
+
+            paragraph.lines.append(line)
+
+    if not paragraph.lines:
+        return []
+
+    block = OCRResultBlock(language=language, paragraphs=[paragraph])
+    complete_parents(block)
+
+    return [block]
+
+
+class WorkerSignals(QtCore.QObject):
+    result = QtCore.Signal(object)
+
+
+@dataclass
+class PendingCrop():
+    job: OCRJob
+    rect: QtCore.QRect
+    signals: WorkerSignals
+
+
+class BatchWorker(QtCore.QRunnable):
+    '''Recognize the crops of jobs of a page sharing a language with a single tesseract invocation'''
+
+    def __init__(self, engine, image: QtGui.QPixmap, ppi: float, crops: list[PendingCrop]) -> None:
+        super().__init__()
+
+        self.engine = engine
+        # Crop in the GUI thread, pixmaps must not be used in other threads
+        self.images = [engine.pixmap_to_pil(image.copy(crop.rect)) for crop in crops]
+        self.ppi = ppi
+        self.crops = crops
+
+    def run(self) -> None:
+        offsets = [crop.rect.topLeft() for crop in self.crops]
+        # Failed jobs leave their boxes as they are, the scheduler has to get a result for each of them nonetheless
+        results = [[None, crop.job, 'Recognition aborted'] for crop in self.crops]
 
+        try:
+            pages = self.engine.recognize_images(self.images, offsets, self.ppi, Lang(self.crops[0].job.language))
+            results = [[blocks, crop.job] for crop, blocks in zip(self.crops, pages)]
+        except Exception as e:
+            results = [[None, crop.job, f'{type(e).__name__}: {e}'] for crop in self.crops]
+        finally:
+            for crop, result in zip(self.crops, results):
+                crop.signals.result.emit(result)
 
+
+class RawWorker(QtCore.QRunnable):
+    '''Recognize a raw job line by line keeping whitespace, all lines with a single tesseract invocation'''
+
+    def __init__(self, engine, image: QtGui.QPixmap, crop: PendingCrop) -> None:
+        super().__init__()
+
+        self.engine = engine
+        self.crop = crop
+
+        # Find and crop the lines in the GUI thread, pixmaps must not be used in other threads
+        crop_image = image.copy(crop.rect)
+        lines = engine.find_lines(crop_image)
+
+        self.images = [engine.pixmap_to_pil(crop_image.copy(line)) for line in lines]
+        self.line_rects = [line.translated(crop.rect.topLeft()) for line in lines]
+
+    def run(self) -> None:
+        job = self.crop.job
+        result = [None, job, 'Recognition aborted']
+
+        try:
+            texts = self.engine.recognize_lines_raw(self.images) if self.images else []
+            result = [raw_line_blocks(self.line_rects, texts, Lang(job.language)), job]
+        except Exception as e:
+            result = [None, job, f'{type(e).__name__}: {e}']
+        finally:
+            self.crop.signals.result.emit(result)
+
+
+@dataclass
 class OCREnginePytesseract(OCREngine):
-    def __init__(self) -> None:
-        super().__init__('Pytesseract')
+    '''Engine running the tesseract command line program, all crops of a page are recognized by a single process since process startup costs more than recognition'''
+    name = 'Pytesseract'
+    crop_margin: int = 10
+    # Jobs recognized by one tesseract process at most
+    max_batch_size: int = 64
+
+    def __post_init__(self):
         self.languages = pytesseract.get_languages()
 
-    def recognize_text_color(self, image: QtGui.QPixmap) -> QtGui.QColor:
-        # TODO: This is much to slow to be useful, find a simpler approach
-        image_cv = numpy.array(image.toImage().copy().bits()).reshape((image.height(), image.width(), 4))
+        # Jobs waiting to be batched and their page image, by pixmap cache key
+        self.pending: dict[int, list[PendingCrop]] = {}
+        self.pending_images: dict[int, tuple[QtGui.QPixmap, float]] = {}
+
+    def max_jobs(self) -> int:
+        # Let the scheduler hand over all jobs at once, they are batched here
+        return self.max_batch_size * max(self.threadpool.maxThreadCount(), 1)
+
+    def start_recognize_thread(self, callback, job: OCRJob, image: QtGui.QPixmap, ppi: float, partial_callback=None, metrics: JobMetrics | None = None):
+        # Jobs are recognized in batches, only the scheduler's stages are recorded
+        rect = job.get_rect().adjusted(-self.crop_margin, -self.crop_margin, self.crop_margin, self.crop_margin).intersected(image.rect())
+
+        signals = WorkerSignals()
+        signals.result.connect(callback)
+
+        key = image.cacheKey()
 
-        kernel = numpy.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]])
-        image_cv = cv2.filter2D(image_cv, -1, kernel)
+        if key not in self.pending:
+            self.pending[key] = []
+            self.pending_images[key] = (image, ppi)
 
-        final = cv2.cvtColor(image_cv, cv2.COLOR_BGR2RGB)
+            # Collect the jobs submitted in one go before starting tesseract
+            QtCore.QTimer.singleShot(0, lambda: self.start_batches(key))
 
-        final = final.reshape((final.shape[0] * final.shape[1], 3))
-        kmeans = KMeans(n_clusters=2)
-        kmeans.fit(final)
+        self.pending[key].append(PendingCrop(job, rect, signals))
 
-        r, g, b = kmeans.cluster_centers_[-1]
+    def start_batches(self, key: int) -> None:
+        crops = self.pending.pop(key, [])
+        image, ppi = self.pending_images.pop(key)
 
-        white_r, white_g, white_b = (255, 255, 255)
-        color_diffs = []
-        for color in kmeans.cluster_centers_:
-            cr, cg, cb = color
-            color_diff = sqrt((white_r - cr)**2 + (white_g - cg)**2 + (white_b - cb)**2)
-            color_diffs.append((color_diff, color))
+        # Results are labelled with the batch's language, so only jobs asking for the same one share a batch
+        batches: dict[str, list[PendingCrop]] = {}
 
-        r, g, b, = sorted(color_diffs, key=lambda x: x[0])[-1][1]
+        for crop in crops:
+            if crop.job.raw:
+                # Recognized line by line, they can't be batched with the others
+                self.threadpool.start(RawWorker(self, image, crop))
+            else:
+                batches.setdefault(crop.job.language, []).append(crop)
 
-        return QtGui.QColor(r, g, b)
+        for batch in batches.values():
+            for i in range(0, len(batch), self.max_batch_size):
+                self.threadpool.start(BatchWorker(self, image, ppi, batch[i:i + self.max_batch_size]))
 
-    def recognize(self, image: QtGui.QPixmap, ppi: float, language: Lang = Lang('English'), raw=False, psm_override=3) -> list[HOCR_OCRResultBlock] | None:
+    def recognize_images(self, images: list[Image.Image], offsets: list[QtCore.QPoint], ppi: float, language: Lang, psm=3) -> list[list[OCRResultBlock]]:
+        '''Recognize images with one tesseract process, returns blocks for each image moved by its offset'''
+        with tempfile.TemporaryDirectory() as directory:
+            path = write_multipage_tiff(images, directory)
+            data = pytesseract.image_to_data(path, lang=language.pt2t, config=f'--psm {psm} --dpi {int(ppi)}', output_type=pytesseract.Output.DICT)
+
+        return parse_tsv(data, offsets, language, ppi)
+
+    def recognize_lines_raw(self, images: list[Image.Image]) -> list[str]:
+        '''Recognize single line images with one tesseract process, keeping whitespace'''
+        with tempfile.TemporaryDirectory() as directory:
+            path = write_multipage_tiff(images, directory)
+            text = pytesseract.image_to_string(path, config='-c preserve_interword_spaces=1 --psm 7')
+
+        # Tesseract ends every page with a form feed
+        return [page.strip() for page in text.split('\f')][:len(images)]
+
+    def recognize_text_color(self, image: QtGui.QPixmap) -> QtGui.QColor:
+        return estimate_text_color(image.toImage())
+
+    def recognize(self, image: QtGui.QPixmap, ppi: float, language: Lang = Lang('English'), raw=False, psm_override=3) -> list[OCRResultBlock] | None:
         # TODO: get dpi from boxarea background
         # image.save('/tmp/1.png')
         # estimate: str = pytesseract.image_to_boxes(self.pixmap_to_pil(image))
@@ -84,44 +283,17 @@ class OCREnginePytesseract(OCREngine):
 
         # print(text)
 
-        blocks: list[HOCR_OCRResultBlock] = []
-
-        paragraph = HOCR_OCRResultParagraph()
+        blocks: list[OCRResultBlock] = []
 
         if raw:
             # Preprocess the image to find lines and scan line by line, maintaining whitespace
-
             lines = self.find_lines(image)
 
-            for line in lines:
-                line_str = pytesseract.image_to_string(self.pixmap_to_pil(image.copy(line)), config='-c preserve_interword_spaces=1 --psm 7').strip()
+            if not lines:
+                return blocks
 
-                # ar = w / float(h)
-                # # if ar < 5:
-                # cv2.drawContours(image_cv2, [c], -1, (255, 0, 0), -1)
-
-                # for line_str in lines:
-                if line_str:
-                    word = HOCR_OCRResultWord()
-                    word.text = line_str
-
-                    line = OCRResultLine()
-                    line.words.append(word)
-
-                    paragraph.lines.append(line)
-
-            block = HOCR_OCRResultBlock(image_size=image.size(), ppi=ppi)
-            block.font = QtGui.QFontDatabase().systemFont(QtGui.QFontDatabase().SystemFont.FixedFont)
-            block.paragraphs.append(paragraph)
-
-            blocks = [block]
+            blocks = raw_line_blocks(lines, self.recognize_lines_raw([self.pixmap_to_pil(image.copy(line)) for line in lines]), language)
         else:
-            hocr = pytesseract.image_to_pdf_or_hocr(self.pixmap_to_pil(image), extension='hocr', lang=language.pt2t, config=f'--psm {psm_override}')
-
-            if isinstance(hocr, bytes):
-                blocks = self.parse_hocr(hocr.decode(), image.size(), ppi, language)
-
-                # for block in blocks:
-                #     block.foreground_color = self.recognize_text_color(image.copy(block.bbox))
+            blocks = self.recognize_images([self.pixmap_to_pil(image)], [QtCore.QPoint()], ppi, language, psm=psm_override)[0]
 
-        return blocks
\ No newline at end of file
+        return blocks
@@ -1,113 +1,194 @@
-import math
+import sys
+import time
 from dataclasses import dataclass, field
 
-import debugpy
 import tesserocr as tesserocr
-from box_editor.box_editor_scene import Box
 from iso639 import Lang  # type: ignore
 from PySide6 import QtCore, QtGui
 
+from ocr_engine.image_buffer import (TESSERACT_FORMAT, qimage_to_numpy,
+                                     qimage_to_packed_bytes,
+                                     qimage_to_tesseract_bytes)
+from ocr_engine.job_metrics import JobMetrics, measure
+from ocr_engine.model_tiers import (ModelTier, TierPolicy, recognize_tiered,
+                                    word_check)
 from ocr_engine.ocr_engine import OCREngine
-from ocr_engine.ocr_results import (OCR_RESULT_BLOCK_TYPE, OCRResultBlock,
-                                    OCRResultLine, OCRResultParagraph,
-                                    OCRResultWord)
+from ocr_engine.ocr_job_scheduler import OCRJob
+from ocr_engine.ocr_result_cache import OCRResultCache, make_cache_key
+from ocr_engine.ocr_results import OCRResultBlock
+from ocr_engine.tesserocr_api_pool import TesserocrAPIPool
+from ocr_engine.tesserocr_results import (RESULT_DETAIL, get_layout_blocks,
+                                          get_layout_lines, get_result_blocks,
+                                          layout_scale, recognize_lines,
+                                          refine_words)
 
 
 class WorkerSignals(QtCore.QObject):
     finished = QtCore.Signal()
     result = QtCore.Signal(object)
+    # [text recognized so far, job]
+    partial = QtCore.Signal(object)
 
 
 class OCR_Worker(QtCore.QRunnable):
-    def __init__(self, engine, box: Box, image: QtGui.QPixmap, ppi: float, language: Lang = Lang('English'), raw=False) -> None:
+    def __init__(self, engine, job: OCRJob, image: QtGui.QPixmap, rect: QtCore.QRect, ppi: float, offset: QtCore.QPoint = QtCore.QPoint(), metrics: JobMetrics | None = None) -> None:
         super().__init__()
 
         self.engine = engine
-        self.original_box = box
+        self.job = job
         self.ppi = ppi
-        self.language = language
-        self.raw = raw
+        self.language = Lang(job.language)
         self.image = image
+        # Region to recognize within image and position of image within the page
+        self.rect = rect
+        self.offset = offset
+        # Position of the recognized region within the page, cached results are stored relative to it
+        self.cache_offset = offset + rect.topLeft()
+        self.metrics = metrics
 
         self.signals = WorkerSignals()
 
     def run(self) -> None:
-        debugpy.debug_this_thread()
+        # Only when running under the debugger, importing debugpy otherwise slows down startup
+        debugpy = sys.modules.get('debugpy')
 
-        blocks: list[OCRResultBlock] = []
+        if debugpy:
+            debugpy.debug_this_thread()
+
+        # The scheduler counts the job as running until it gets a result, so there always has to be one
+        result = [None, self.job, 'Recognition aborted']
+
+        try:
+            result = [self.recognize(), self.job]
+        except Exception as e:
+            result = [None, self.job, f'{type(e).__name__}: {e}']
+        finally:
+            if self.metrics:
+                self.metrics.emitted = time.perf_counter()
+
+            self.signals.result.emit(result)
+            self.signals.finished.emit()
+
+    def recognize(self) -> list[OCRResultBlock]:
+        with measure(self.metrics, 'convert'):
+            self.qimage = self.image.toImage()
+
+        cache_key = ''
+
+        if self.engine.result_cache:
+            # Hashing the region and reading the cache stay out of the GUI thread
+            cache_key = self.engine.result_cache_key(self.qimage.copy(self.rect), self.language, self.ppi)
+            blocks = self.engine.result_cache.get(cache_key, self.cache_offset)
+
+            if blocks is not None:
+                if self.metrics:
+                    self.metrics.cached = True
+
+                return blocks
+
+        # Raw pixel data for Tesseract without going through PIL
+        with measure(self.metrics, 'convert'):
+            self.image_bytes = qimage_to_tesseract_bytes(self.qimage)
+
+        policy = self.engine.tier_policy
+        check = word_check(self.language) if policy.enabled() and policy.min_dictionary_rate > 0 else None
+
+        blocks = recognize_tiered(policy, self.recognize_tier, check, self.metrics)
+
+        # Map coordinates of a cropped image back into page space
+        if not self.offset.isNull():
+            for block in blocks:
+                block.translate(self.offset)
+
+        if cache_key and self.engine.result_cache:
+            self.engine.result_cache.put(cache_key, blocks, self.cache_offset)
+
+        return blocks
+
+    def recognize_tier(self, tier: ModelTier) -> list[OCRResultBlock]:
+        '''Recognize the region with the models of tier, block coordinates are those within image'''
+        with self.engine.api_pool.borrow(lang=self.language.pt2t, psm=tesserocr.PSM.AUTO, oem=tier.oem, path=tier.path) as api:
+            with measure(self.metrics, 'set_image'):
+                api.SetImageBytes(*self.image_bytes)
+                api.SetSourceResolution(self.ppi)
+                api.SetRectangle(self.rect.left(), self.rect.top(), self.rect.width(), self.rect.height())
+
+            if self.engine.stream_lines:
+                # Find lines first and recognize them one by one, so text shows up while the rest is still being recognized
+                with measure(self.metrics, 'layout'):
+                    layout_blocks = get_layout_lines(api.AnalyseLayout())
+
+                blocks = recognize_lines(api, layout_blocks, self.rect, self.language, self.ppi, self.line_recognized, self.engine.result_detail, self.metrics)
+            else:
+                with measure(self.metrics, 'recognize'):
+                    api.Recognize()
+
+                with measure(self.metrics, 'extract'):
+                    blocks = get_result_blocks(api, self.language, self.ppi, self.engine.result_detail)
 
-        with tesserocr.PyTessBaseAPI(psm=tesserocr.PSM.AUTO, lang=self.language.pt2t) as api:
-            api.SetImage(self.engine.pixmap_to_pil(self.image))
-            api.SetSourceResolution(self.ppi)
-            api.SetRectangle(self.original_box.rect().left(), self.original_box.rect().top(), self.original_box.rect().width(), self.original_box.rect().height())
-            api.Recognize()
-
-            ri = api.GetIterator()
-
-            current_block = None
-            current_paragraph = None
-            current_line = None
-
-            # for result_word in tesserocr.iterate_level(ri, tesserocr.RIL.SYMBOL):
-            #     pass
-
-            for result_word in tesserocr.iterate_level(ri, tesserocr.RIL.WORD):
-                if result_word.IsAtBeginningOf(tesserocr.RIL.BLOCK):
-                    current_block = OCRResultBlock()
-                    current_block.text = ri.GetUTF8Text(tesserocr.RIL.BLOCK)
-                    current_block.confidence = ri.Confidence(tesserocr.RIL.BLOCK)
-                    current_block.set_bbox(ri.BoundingBox(tesserocr.RIL.BLOCK))
-                    current_block.set_baseline(ri.Baseline(tesserocr.RIL.BLOCK))
-                    current_block.language = self.language
-                    blocks.append(current_block)
-
-                if result_word.IsAtBeginningOf(tesserocr.RIL.PARA):
-                    current_paragraph = OCRResultParagraph()
-                    current_paragraph.text = ri.GetUTF8Text(tesserocr.RIL.PARA)
-                    current_paragraph.confidence = ri.Confidence(tesserocr.RIL.PARA)
-                    current_paragraph.set_bbox(ri.BoundingBox(tesserocr.RIL.PARA))
-                    current_paragraph.set_baseline(ri.Baseline(tesserocr.RIL.PARA))
-                    if current_block:
-                        current_block.paragraphs.append(current_paragraph)
-
-                if result_word.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
-                    current_line = OCRResultLine()
-                    current_line.text = ri.GetUTF8Text(tesserocr.RIL.TEXTLINE)
-                    current_line.confidence = ri.Confidence(tesserocr.RIL.TEXTLINE)
-                    current_line.set_bbox(ri.BoundingBox(tesserocr.RIL.TEXTLINE))
-                    current_line.set_baseline(ri.Baseline(tesserocr.RIL.TEXTLINE))
-                    if current_paragraph:
-                        current_paragraph.lines.append(current_line)
-
-                if not result_word.Empty(tesserocr.RIL.WORD):
-                    current_word = OCRResultWord()
-                    current_word.text = result_word.GetUTF8Text(tesserocr.RIL.WORD)
-                    current_word.confidence = ri.Confidence(tesserocr.RIL.WORD)
-                    current_word.set_bbox(ri.BoundingBox(tesserocr.RIL.WORD))
-                    current_word.set_baseline(ri.Baseline(tesserocr.RIL.WORD))
-                    current_word.blanks_before = result_word.BlanksBeforeWord()
-                    row_attributes = ri.RowAttributes()
-                    # TODO: Not sure this is the right way, also check ascenders
-                    # current_word.font_size = 1 / self.ppi * (row_attributes['row_height'] + row_attributes['descenders']) * 72
-                    current_word.font_size = math.ceil(1 / self.ppi * row_attributes['row_height'] * 72)
-                    if current_line:
-                        current_line.words.append(current_word)
+            if self.engine.refine_options.enabled():
+                refine_words(api, qimage_to_numpy(self.qimage.convertToFormat(TESSERACT_FORMAT)), blocks, self.ppi, self.engine.refine_options, self.metrics)
 
             # TODO: GetTextlines (before recognition)
             # TODO: GetWords (before recognition)
 
-        self.signals.result.emit([blocks, self.raw, self.original_box])
-        self.signals.finished.emit()
+        return blocks
+
+    def line_recognized(self, text: str) -> None:
+        self.signals.partial.emit([text, self.job])
 
 @dataclass
 class OCREngineTesserocr(OCREngine):
     name = 'TesserOCR'
+    # Only hand the box region (plus margin) to Tesseract instead of the whole page
+    crop_to_box: bool = True
+    crop_margin: int = 10
+    # Reuse results for identical image regions across runs
+    use_result_cache: bool = True
+    # Recognize line by line and report text after each line, off by default since recognizing the box as a whole is the reference path
+    stream_lines: bool = False
+    # Values Tesseract has to compute for the result tree, everything else is derived from the words
+    result_detail: RESULT_DETAIL = RESULT_DETAIL.BASELINES
+    # Number of recognition threads, 0 keeps the thread pool's default
+    workers: int = 0
 
     def __post_init__(self):
         self.languages = tesserocr.get_languages()[1]
 
+        if self.workers:
+            self.threadpool.setMaxThreadCount(self.workers)
+
         self.result_blocks: list[OCRResultBlock] = []
 
+        self.api_pool = self.create_api_pool()
+
+        self.result_cache: OCRResultCache | None = OCRResultCache() if self.use_result_cache else None
+
+    def create_api_pool(self) -> TesserocrAPIPool:
+        # Keep initialized APIs around between boxes instead of reloading traineddata for each one, every thread may use one per model tier
+        return TesserocrAPIPool(max(self.threadpool.maxThreadCount(), 1) * len(self.tier_policy.get_tiers()))
+
+    def set_tier_policy(self, tier_policy: TierPolicy) -> None:
+        tier_count = len(self.tier_policy.get_tiers())
+        super().set_tier_policy(tier_policy)
+
+        if len(tier_policy.get_tiers()) != tier_count:
+            # Jobs still running return their APIs to the old pool, which ends them
+            old_pool = self.api_pool
+            self.api_pool = self.create_api_pool()
+            old_pool.close()
+
+    def result_cache_key(self, image: QtGui.QImage, language: Lang, ppi: float, psm: int = tesserocr.PSM.AUTO) -> str:
+        # Line by line recognition may give slightly different results than recognizing the region as a whole
+        engine = 'tesserocr-lines' if self.stream_lines else 'tesserocr'
+
+        if self.result_detail is not RESULT_DETAIL.BASELINES:
+            engine += f'-{self.result_detail.name.lower()}'
+
+        engine += self.refine_options.cache_suffix() + self.tier_policy.cache_suffix()
+
+        return make_cache_key(qimage_to_packed_bytes(image), image.width(), image.height(), ppi, language.pt2t, psm, engine, tesserocr.tesseract_version())
+
     def pixmap_strip_header_footer(self, image: QtGui.QPixmap, from_header=0, to_footer=0) -> QtGui.QPixmap:
         rect = image.rect()
         rect.setTop(from_header)
@@ -115,9 +196,23 @@ class OCREngineTesserocr(OCREngine):
             rect.setBottom(to_footer)
         return image.copy(rect)
 
-    def start_recognize_thread(self, callback, box: Box, image: QtGui.QPixmap, ppi: float, language: Lang = Lang('English'), raw=False):
-        worker = OCR_Worker(self, box, image, ppi, language, raw)
+    def start_recognize_thread(self, callback, job: OCRJob, image: QtGui.QPixmap, ppi: float, partial_callback=None, metrics: JobMetrics | None = None):
+        rect = job.get_rect()
+        offset = QtCore.QPoint()
+
+        with measure(metrics, 'convert'):
+            if self.crop_to_box:
+                crop_rect = rect.adjusted(-self.crop_margin, -self.crop_margin, self.crop_margin, self.crop_margin).intersected(image.rect())
+                image = image.copy(crop_rect)
+                offset = crop_rect.topLeft()
+                rect = image.rect()
+
+        # Cached results are looked up by the worker as well
+        worker = OCR_Worker(self, job, image, rect, ppi, offset, metrics)
         worker.signals.result.connect(callback)
+
+        if partial_callback:
+            worker.signals.partial.connect(partial_callback)
         # worker.signals.finished.connect(self.thread_complete)
 
         self.threadpool.start(worker)
@@ -140,53 +235,25 @@ class OCREngineTesserocr(OCREngine):
 
         return blocks
 
-    def analyse_layout(self, image: QtGui.QPixmap, from_header=0, to_footer=0) -> list[OCRResultBlock] | None:
+    def analyse_layout(self, image: QtGui.QPixmap, from_header=0, to_footer=0, ppi=0.0, layout_ppi=0.0) -> list[OCRResultBlock] | None:
         blocks: list[OCRResultBlock] = []
 
-        with tesserocr.PyTessBaseAPI(psm=tesserocr.PSM.AUTO_ONLY) as api:
-            api.SetImage(self.pixmap_to_pil(self.pixmap_strip_header_footer(image, from_header, to_footer)))
-            api.SetPageSegMode(tesserocr.PSM.AUTO_ONLY)
+        layout_image = self.pixmap_strip_header_footer(image, from_header, to_footer).toImage()
+        scale = layout_scale(ppi, layout_ppi)
+
+        if scale < 1.0:
+            # Layout detection doesn't need full resolution, analyse a smaller copy and scale the blocks back
+            layout_image = layout_image.scaled(round(layout_image.width() * scale), round(layout_image.height() * scale), QtCore.Qt.AspectRatioMode.IgnoreAspectRatio, QtCore.Qt.TransformationMode.SmoothTransformation)
+
+        with self.api_pool.borrow(psm=tesserocr.PSM.AUTO_ONLY) as api:
+            api.SetImageBytes(*qimage_to_tesseract_bytes(layout_image))
+
+            if ppi:
+                api.SetSourceResolution(int(ppi * scale))
+
             page_it = api.AnalyseLayout()
 
             if page_it:
-                for result in tesserocr.iterate_level(page_it, tesserocr.RIL.BLOCK):
-                    block = OCRResultBlock(tesserocr.RIL.BLOCK)
-
-                    left, top, right, bottom = result.BoundingBox(tesserocr.RIL.BLOCK, padding = 5)
-
-                    block.bbox_rect = QtCore.QRect(QtCore.QPoint(left, top + from_header), QtCore.QPoint(right, bottom))
-
-                    match result.BlockType():
-                        case tesserocr.PT.FLOWING_TEXT | tesserocr.PT.PULLOUT_TEXT:
-                            block.type = OCR_RESULT_BLOCK_TYPE.TEXT
-                        case tesserocr.PT.HEADING_TEXT:
-                            block.tag = 'h1'
-                        case tesserocr.PT.CAPTION_TEXT:
-                            block.tag = 'figcaption'
-                        case tesserocr.PT.FLOWING_IMAGE | tesserocr.PT.HEADING_IMAGE | tesserocr.PT.PULLOUT_IMAGE:
-                            block.type = OCR_RESULT_BLOCK_TYPE.IMAGE
-                        case tesserocr.PT.HORZ_LINE:
-                            block.type = OCR_RESULT_BLOCK_TYPE.H_LINE
-                        case tesserocr.PT.VERT_LINE:
-                            block.type = OCR_RESULT_BLOCK_TYPE.V_LINE
-                        case _:
-                            block.type = OCR_RESULT_BLOCK_TYPE.UNKNOWN
-
-                    match result.BlockType():
-                        case tesserocr.PT.FLOWING_TEXT | tesserocr.PT.FLOWING_IMAGE:
-                            block.class_ = 'flowing'
-                        case tesserocr.PT.HEADING_TEXT | tesserocr.PT.HEADING_IMAGE:
-                            block.class_ = 'heading'
-                        case tesserocr.PT.PULLOUT_TEXT | tesserocr.PT.PULLOUT_IMAGE:
-                            block.class_ = 'pullout'
-
-                    # TODO:
-                    #  EQUATION
-                    #  INLINE_EQUATION
-                    #  TABLE
-                    #  VERTICAL_TEXT
-                    #  NOISE
-
-                    blocks.append(block)
+                blocks = get_layout_blocks(page_it, from_header, scale)
 
         return blocks
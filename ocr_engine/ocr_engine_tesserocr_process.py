@@ -0,0 +1,174 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+from iso639 import Lang  # type: ignore
+from PySide6 import QtGui
+
+from ocr_engine.concurrency import apply_thread_limit
+from ocr_engine.image_buffer import qimage_to_tesseract_bytes
+from ocr_engine.job_metrics import JobMetrics, measure
+from ocr_engine.model_tiers import TierPolicy
+from ocr_engine.ocr_engine_tesserocr import OCREngineTesserocr, WorkerSignals
+from ocr_engine.ocr_job_scheduler import OCRJob
+from ocr_engine.ocr_process_worker import RecognizeJob, init_worker, recognize
+from ocr_engine.ocr_results import blocks_from_bytes
+
+
+@dataclass
+class SharedPage():
+    '''Page raster copied once into shared memory and read by all worker processes'''
+    shm: shared_memory.SharedMemory
+    bytes_per_line: int
+    bytes_per_pixel: int
+    pending_jobs: int = 0
+
+
+@dataclass
+class OCREngineTesserocrProcess(OCREngineTesserocr):
+    '''Run recognition in separate worker processes instead of threads, so result extraction isn't serialized by the GIL'''
+    name = 'TesserOCR (Processes)'
+    # Number of worker processes, 0 uses one per CPU
+    processes: int = 0
+    # Workers only report complete results
+    stream_lines: bool = False
+    # Tesseract's OpenMP threads within each worker
+    threads_per_worker: int = 1
+
+    def __post_init__(self):
+        super().__post_init__()
+
+        # More OpenMP threads would only compete with the other workers, this has to be set before the workers load libgomp
+        apply_thread_limit(self.threads_per_worker)
+
+        self.executor = self.create_executor()
+
+        self.shared_pages: dict[int, SharedPage] = {}
+        self.current_page_key = 0
+        self.shared_pages_lock = threading.Lock()
+
+    def create_executor(self) -> ProcessPoolExecutor:
+        # Forking a process running Qt isn't safe, always spawn fresh interpreters
+        # Every worker keeps one API per model tier
+        return ProcessPoolExecutor(self.processes or os.cpu_count(), mp_context=multiprocessing.get_context('spawn'), initializer=init_worker, initargs=(len(self.tier_policy.get_tiers()),))
+
+    def set_tier_policy(self, tier_policy: TierPolicy) -> None:
+        tier_count = len(self.tier_policy.get_tiers())
+        super().set_tier_policy(tier_policy)
+
+        if len(tier_policy.get_tiers()) != tier_count:
+            # Workers size their API pools on startup, running jobs still finish in the old ones
+            self.executor.shutdown(wait=False)
+            self.executor = self.create_executor()
+
+    def share_page(self, image: QtGui.QPixmap) -> SharedPage:
+        '''Get shared memory copy of page raster, creating it on first use'''
+        key = image.cacheKey()
+
+        with self.shared_pages_lock:
+            shared_page = self.shared_pages.get(key)
+
+            if not shared_page:
+                data, _, _, bytes_per_pixel, bytes_per_line = qimage_to_tesseract_bytes(image.toImage())
+
+                shm = shared_memory.SharedMemory(create=True, size=len(data))
+                shm.buf[:len(data)] = data
+
+                shared_page = SharedPage(shm, bytes_per_line, bytes_per_pixel)
+                self.shared_pages[key] = shared_page
+
+            shared_page.pending_jobs += 1
+            self.current_page_key = key
+
+        self.release_unused_pages()
+
+        return shared_page
+
+    def release_unused_pages(self, all_pages=False) -> None:
+        '''Free shared memory of pages that are neither current nor still in use by a worker'''
+        with self.shared_pages_lock:
+            for key, shared_page in list(self.shared_pages.items()):
+                if all_pages or (key != self.current_page_key and shared_page.pending_jobs == 0):
+                    shared_page.shm.close()
+                    shared_page.shm.unlink()
+                    del self.shared_pages[key]
+
+    def max_jobs(self) -> int:
+        return self.processes or os.cpu_count() or 1
+
+    def start_recognize_thread(self, callback, job: OCRJob, image: QtGui.QPixmap, ppi: float, partial_callback=None, metrics: JobMetrics | None = None):
+        rect = job.get_rect()
+        language = Lang(job.language)
+
+        if self.crop_to_box:
+            rect.adjust(-self.crop_margin, -self.crop_margin, self.crop_margin, self.crop_margin)
+
+        rect = rect.intersected(image.rect())
+
+        with measure(metrics, 'convert'):
+            shared_page = self.share_page(image)
+
+        signals = WorkerSignals()
+        signals.result.connect(callback)
+
+        recognize_job = RecognizeJob(shared_page.shm.name, shared_page.bytes_per_line, (rect.left(), rect.top(), rect.width(), rect.height()), ppi, language.name, bytes_per_pixel=shared_page.bytes_per_pixel, refine=self.refine_options, tiers=self.tier_policy, cache_dir=self.result_cache.directory if self.result_cache else '')
+
+        submitted = time.perf_counter()
+
+        try:
+            future = self.executor.submit(recognize, recognize_job)
+        except Exception:
+            # Broken pool, the scheduler reports the error
+            with self.shared_pages_lock:
+                shared_page.pending_jobs -= 1
+
+            raise
+
+        future.add_done_callback(lambda future: self.recognize_finished(future, signals, shared_page, job, metrics, submitted))
+
+    def recognize_finished(self, future: Future, signals: WorkerSignals, shared_page: SharedPage, job: OCRJob, metrics: JobMetrics | None = None, submitted: float = 0.0) -> None:
+        '''Runs in the executor's management thread, the signal delivers results to the GUI thread
+
+        Workers look up and store results in the cache themselves.
+        '''
+        if metrics:
+            metrics.stages['worker'] = time.perf_counter() - submitted
+
+        with self.shared_pages_lock:
+            shared_page.pending_jobs -= 1
+
+        self.release_unused_pages()
+
+        # Failed jobs leave their box as it is instead of delivering an empty result
+        result = [None, job, 'Recognition cancelled']
+
+        try:
+            if not future.cancelled():
+                data, tier, tiers, cached = future.result()
+
+                with measure(metrics, 'extract'):
+                    blocks = blocks_from_bytes(data)
+
+                if metrics:
+                    metrics.tier = tier
+                    metrics.tiers = tiers
+                    metrics.cached = cached
+
+                result = [blocks, job]
+        except Exception as e:
+            # Raised in the worker process or the pool broke because a worker died
+            result = [None, job, f'{type(e).__name__}: {e}']
+        finally:
+            if metrics:
+                metrics.emitted = time.perf_counter()
+
+            signals.result.emit(result)
+            signals.finished.emit()
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(cancel_futures=True)
+        self.release_unused_pages(True)
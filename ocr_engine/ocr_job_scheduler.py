@@ -0,0 +1,251 @@
+import itertools
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+
+from PySide6 import QtCore, QtGui
+
+from ocr_engine.image_buffer import downsample_scale
+from ocr_engine.job_metrics import JobMetrics, JobMetricsRecorder, measure
+from ocr_engine.ocr_results import scale_rect
+from ocr_engine.text_color import estimate_block_colors
+
+# Runtime ids for pages and boxes, so jobs don't have to hold on to objects that may be deleted while they are running
+uid_counter = itertools.count(1)
+
+
+def new_uid() -> int:
+    return next(uid_counter)
+
+
+# Box uid of jobs recognizing a whole page instead of a single box
+PAGE_BOX_UID = 0
+
+
+@dataclass(frozen=True)
+class OCRJob():
+    '''Immutable description of a recognition request'''
+    page_uid: int
+    box_uid: int
+    # Region to recognize as (left, top, width, height) in page coordinates
+    rect: tuple[int, int, int, int]
+    language: str
+    raw: bool = False
+
+    @property
+    def key(self) -> tuple[int, int]:
+        return (self.page_uid, self.box_uid)
+
+    def get_rect(self) -> QtCore.QRect:
+        return QtCore.QRect(*self.rect)
+
+    def scaled(self, factor: float) -> 'OCRJob':
+        '''Same job on a page resampled by factor'''
+        rect = scale_rect(self.get_rect(), factor)
+
+        return replace(self, rect=(rect.left(), rect.top(), rect.width(), rect.height()))
+
+
+@dataclass
+class PendingJob():
+    job: OCRJob
+    image: QtGui.QPixmap
+    ppi: float
+    # Resolution to downsample the page to for recognition, 0 for its full resolution
+    ocr_ppi: float = 0.0
+    submitted: float = field(default_factory=time.perf_counter)
+
+
+class OCRJobScheduler(QtCore.QObject):
+    '''Queue between the editor and the OCR engine
+
+    Jobs of the visible page run before jobs of background pages, repeated requests for the same box are merged and jobs of removed boxes or cleared pages are dropped.
+    Jobs already running can't be interrupted, their results are discarded instead.
+    Engines report failed jobs with blocks None and an error message, the boxes stay as they are.
+    '''
+    # [blocks, job]
+    result = QtCore.Signal(object)
+    # [text recognized so far, job]
+    partial = QtCore.Signal(object)
+    # [error message, job]
+    failed = QtCore.Signal(object)
+    # Number of jobs queued or running
+    queue_changed = QtCore.Signal(int)
+
+    def __init__(self, engine_manager) -> None:
+        super().__init__()
+
+        self.engine_manager = engine_manager
+        self.pending: OrderedDict[tuple[int, int], PendingJob] = OrderedDict()
+        self.running: dict[tuple[int, int], OCRJob] = {}
+        # Page images of running jobs for estimating text colours once results arrive
+        self.running_images: dict[OCRJob, QtGui.QPixmap] = {}
+        # Jobs handed to the engine for downsampled pages with their original job and scale, results are mapped back to page coordinates
+        self.scaled_jobs: dict[OCRJob, tuple[OCRJob, float]] = {}
+        # Timings of running jobs while instrumentation is enabled
+        self.metrics = JobMetricsRecorder()
+        self.running_metrics: dict[OCRJob, JobMetrics] = {}
+        # Most recent job for each box, results of other jobs for the box are outdated
+        self.latest: dict[tuple[int, int], OCRJob] = {}
+        self.visible_page_uid = 0
+        self.dispatching = False
+
+    def queue_depth(self) -> int:
+        return len(self.pending) + len(self.running)
+
+    def submit(self, job: OCRJob, image: QtGui.QPixmap, ppi: float, ocr_ppi: float = 0.0) -> None:
+        if self.running.get(job.key) == job and self.latest.get(job.key) == job and job.key not in self.pending:
+            # Identical job is already running, unless it has been cancelled and its result would be discarded
+            return
+
+        # Replaces a job for the same box that hasn't been started yet
+        self.pending.pop(job.key, None)
+        self.pending[job.key] = PendingJob(job, image, ppi, ocr_ppi)
+        self.latest[job.key] = job
+
+        self.queue_changed.emit(self.queue_depth())
+        self.dispatch()
+
+    def set_visible_page(self, page_uid: int) -> None:
+        self.visible_page_uid = page_uid
+
+    def cancel_box(self, page_uid: int, box_uid: int) -> None:
+        self.cancel(lambda key: key == (page_uid, box_uid))
+
+    def cancel_page(self, page_uid: int) -> None:
+        self.cancel(lambda key: key[0] == page_uid)
+
+    def cancel_all(self) -> None:
+        self.cancel(lambda key: True)
+
+    def cancel(self, matches) -> None:
+        for key in [key for key in self.pending if matches(key)]:
+            del self.pending[key]
+
+        for key in [key for key in self.latest if matches(key)]:
+            del self.latest[key]
+
+        self.queue_changed.emit(self.queue_depth())
+
+    def next_job(self) -> PendingJob:
+        for pending_job in self.pending.values():
+            if pending_job.job.page_uid == self.visible_page_uid:
+                return pending_job
+
+        return next(iter(self.pending.values()))
+
+    def dispatch(self) -> None:
+        # Engines may deliver cached results right away, don't recurse in that case
+        if self.dispatching:
+            return
+
+        self.dispatching = True
+
+        try:
+            engine = self.engine_manager.get_current_engine()
+
+            while self.pending and len(self.running) < engine.max_jobs():
+                pending_job = self.next_job()
+                job = pending_job.job
+
+                if job.key in self.running:
+                    # Wait for the outdated job of this box to finish first, start something else
+                    startable = [p for p in self.pending.values() if p.job.key not in self.running]
+
+                    if not startable:
+                        break
+
+                    pending_job = startable[0]
+                    job = pending_job.job
+
+                del self.pending[job.key]
+                self.running[job.key] = job
+                self.running_images[job] = pending_job.image
+
+                metrics = None
+
+                if self.metrics.enabled:
+                    metrics = JobMetrics(job.page_uid, job.box_uid, job.language, engine.name)
+                    metrics.stages['queued'] = time.perf_counter() - pending_job.submitted
+                    self.running_metrics[job] = metrics
+
+                scale = downsample_scale(pending_job.ppi, pending_job.ocr_ppi)
+                image = self.engine_manager.prepare_image(pending_job.image, scale)
+                engine_job = job
+
+                if scale < 1.0:
+                    # Only one job per box runs at a time, so scaled jobs are unique
+                    engine_job = job.scaled(scale)
+                    self.scaled_jobs[engine_job] = (job, scale)
+
+                if metrics:
+                    metrics.pixels = engine_job.rect[2] * engine_job.rect[3]
+                    # The total counts from here, the queue time is kept apart
+                    metrics.started = time.perf_counter()
+
+                try:
+                    engine.start_recognize_thread(self.job_finished, engine_job, image, pending_job.ppi * scale, self.job_progressed, metrics)
+                except Exception as e:
+                    # Free the slot, the job never reached the engine
+                    self.job_finished([None, engine_job, f'{type(e).__name__}: {e}'])
+        finally:
+            self.dispatching = False
+
+    def job_progressed(self, partial: tuple) -> None:
+        text, job = partial
+        job = self.scaled_jobs.get(job, (job, 1.0))[0]
+
+        if self.latest.get(job.key) == job and job.key not in self.pending:
+            self.partial.emit([text, job])
+
+    def job_finished(self, result: tuple) -> None:
+        # [blocks, job] or [None, job, error message] if recognition failed
+        blocks, job = result[0], result[1]
+        job, scale = self.scaled_jobs.pop(job, (job, 1.0))
+        image = self.running_images.pop(job, None)
+        metrics = self.running_metrics.pop(job, None)
+
+        if metrics and metrics.emitted:
+            metrics.stages['deliver'] = time.perf_counter() - metrics.emitted
+
+        if scale < 1.0 and blocks:
+            for block in blocks:
+                block.scale(1 / scale)
+
+        if self.running.get(job.key) == job:
+            del self.running[job.key]
+
+        error = None
+
+        # A job queued again after being cancelled while running waits for its own result
+        if self.latest.get(job.key) == job and job.key not in self.pending:
+            del self.latest[job.key]
+
+            if blocks is None:
+                error = result[2] if len(result) > 2 else ''
+            else:
+                if metrics:
+                    metrics.words = sum(len(block.get_words()) for block in blocks)
+
+                with measure(metrics, 'colors'):
+                    if image and blocks:
+                        # Cheap enough for the GUI thread, only the job's region is converted
+                        rect = job.get_rect().intersected(image.rect())
+                        estimate_block_colors(blocks, image.copy(rect).toImage(), rect.topLeft())
+
+                # Slots in the GUI thread run right away
+                with measure(metrics, 'apply'):
+                    self.result.emit([blocks, job])
+
+                if metrics:
+                    self.metrics.add(metrics)
+
+        self.queue_changed.emit(self.queue_depth())
+
+        if error is not None:
+            # After the queue update, so the error isn't replaced by the queue depth right away
+            print(f'Recognition of box {job.box_uid} on page {job.page_uid} failed: {error}', file=sys.stderr, flush=True)
+            self.failed.emit([error, job])
+
+        self.dispatch()
@@ -0,0 +1,471 @@
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+
+import numpy
+import tesserocr as tesserocr
+from iso639 import Lang  # type: ignore
+from PIL import Image
+from PySide6 import QtCore
+
+from ocr_engine.deskew import estimate_skew
+from ocr_engine.image_buffer import downsample_scale
+from ocr_engine.job_metrics import JobMetrics
+from ocr_engine.model_tiers import (ModelTier, TierPolicy, mean_confidence,
+                                    needs_escalation, recognize_tiered,
+                                    result_words, word_check)
+from ocr_engine.ocr_result_cache import OCRResultCache, make_cache_key
+from ocr_engine.ocr_results import (OCR_RESULT_BLOCK_TYPE, OCRResultBlock,
+                                    blocks_to_bytes, scale_rect)
+from ocr_engine.preprocessing import PreprocessOptions, preprocess
+from ocr_engine.tesserocr_api_pool import TesserocrAPIPool
+from ocr_engine.tesserocr_results import (get_layout_blocks, get_result_blocks,
+                                          layout_scale, refine_words)
+from ocr_engine.text_color import estimate_block_colors_rgb
+from ocr_engine.word_refinement import RefineOptions
+
+# Code in here runs inside the worker processes of OCREngineTesserocrProcess and must not touch widgets or pixmaps
+
+# Bytes per pixel of color page rasters (RGB888), gray ones have one
+BYTES_PER_PIXEL = 3
+
+# PIL transposes rotating clockwise by the given degrees
+CLOCKWISE_TRANSPOSES = {
+    90: Image.Transpose.ROTATE_270,
+    180: Image.Transpose.ROTATE_180,
+    270: Image.Transpose.ROTATE_90,
+}
+
+api_pool: TesserocrAPIPool | None = None
+result_caches: dict[str, OCRResultCache] = {}
+
+
+@dataclass
+class RecognizeJob():
+    shm_name: str
+    bytes_per_line: int
+    # Region to recognize as (left, top, width, height) in page coordinates
+    rect: tuple[int, int, int, int]
+    ppi: float
+    language: str
+    psm: int = tesserocr.PSM.AUTO
+    bytes_per_pixel: int = BYTES_PER_PIXEL
+    refine: RefineOptions = RefineOptions()
+    tiers: TierPolicy = TierPolicy()
+    # Directory of the result cache, empty disables caching
+    cache_dir: str = ''
+
+
+@dataclass
+class RecognizeBatchJob():
+    '''Regions of a page in shared memory recognized one after another with the page set only once'''
+    shm_name: str
+    width: int
+    height: int
+    bytes_per_line: int
+    # (left, top, width, height) in page coordinates
+    rects: list[tuple[int, int, int, int]]
+    ppi: float
+    language: str
+    psm: int = tesserocr.PSM.AUTO
+    bytes_per_pixel: int = BYTES_PER_PIXEL
+
+
+@dataclass
+class PageJob():
+    image_path: str
+    ppi: float
+    language: str
+    recognize: bool = False
+    # Exclude header and footer area from layout analysis, 0 disables
+    from_header: int = 0
+    to_footer: int = 0
+    # Margin around boxes for recognition
+    margin: int = 10
+    # Directory of the result cache shared with the GUI, empty disables caching
+    cache_dir: str = ''
+    # Resolution to analyse layout at, 0 uses the full page resolution
+    layout_ppi: float = 0.0
+    # Resolution to downsample oversized pages to for recognition, 0 uses the full page resolution
+    ocr_ppi: float = 0.0
+    preprocess: PreprocessOptions = PreprocessOptions()
+    # Straightening of the page, see Page
+    rotation: int = 0
+    skew: float = 0.0
+    refine: RefineOptions = RefineOptions()
+    tiers: TierPolicy = TierPolicy()
+
+
+@dataclass
+class OrientationJob():
+    image_path: str
+    ppi: float
+    # Resolution orientation and skew are estimated at
+    analysis_ppi: float = 100.0
+    detect_orientation: bool = True
+
+
+@dataclass
+class PageResult():
+    # Serialized layout blocks that would become boxes in the editor
+    layout: bytes
+    # Serialized recognition results for each layout block, None for blocks that haven't been recognized
+    recognized: list[bytes | None]
+    # Number of blocks recognized with each model tier, empty without tiers
+    tiers: dict[str, int] = field(default_factory=dict)
+
+
+def init_worker(max_idle_apis: int) -> None:
+    '''Process initializer, every worker keeps its own Tesseract instances'''
+    global api_pool
+    api_pool = TesserocrAPIPool(max_idle_apis)
+
+
+def get_result_cache(cache_dir: str) -> OCRResultCache | None:
+    '''Cache of the directory, created once per process'''
+    if not cache_dir:
+        return None
+
+    if cache_dir not in result_caches:
+        result_caches[cache_dir] = OCRResultCache(cache_dir)
+
+    return result_caches[cache_dir]
+
+
+def crop_cache_key(pixels: numpy.ndarray, ppi: float, language: Lang, psm: int, refine: RefineOptions, tiers: TierPolicy) -> str:
+    '''Result cache key of a crop given as (height, width[, channels]) array, the same the editor's engines use for recognizing whole boxes'''
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, numpy.newaxis]
+
+    if pixels.shape[2] == 1:
+        # Keys are made from RGB888 pixels
+        pixels = numpy.repeat(pixels, 3, axis=2)
+
+    return make_cache_key(numpy.ascontiguousarray(pixels).tobytes(), pixels.shape[1], pixels.shape[0], ppi, language.pt2t, psm, 'tesserocr' + refine.cache_suffix() + tiers.cache_suffix(), tesserocr.tesseract_version())
+
+
+def crop_shared_page(job: RecognizeJob) -> bytes:
+    '''Copy only the rows and columns of the job's region out of the shared page raster'''
+    shm = shared_memory.SharedMemory(name=job.shm_name)
+    left, top, width, height = job.rect
+    row_start = left * job.bytes_per_pixel
+    row_end = row_start + width * job.bytes_per_pixel
+
+    try:
+        crop = b''.join(bytes(shm.buf[y * job.bytes_per_line + row_start:y * job.bytes_per_line + row_end]) for y in range(top, top + height))
+    finally:
+        shm.close()
+
+    return crop
+
+
+def recognize(job: RecognizeJob) -> tuple[bytes, str, dict[str, float], bool]:
+    '''Recognize job region and return the serialized result blocks in page coordinates, the model tier of the result, seconds spent in each tier tried and whether the result came from the cache'''
+    if not api_pool:
+        init_worker(1)
+
+    assert api_pool
+
+    language = Lang(job.language)
+    left, top, width, height = job.rect
+    crop = crop_shared_page(job)
+
+    result_cache = get_result_cache(job.cache_dir)
+    cache_key = ''
+
+    if result_cache:
+        cache_key = crop_cache_key(numpy.frombuffer(crop, dtype=numpy.uint8).reshape((height, width, job.bytes_per_pixel)), job.ppi, language, job.psm, job.refine, job.tiers)
+        blocks = result_cache.get(cache_key, QtCore.QPoint(left, top))
+
+        if blocks is not None:
+            return blocks_to_bytes(blocks), '', {}, True
+
+    def recognize_tier(tier: ModelTier) -> list[OCRResultBlock]:
+        assert api_pool
+
+        with api_pool.borrow(lang=language.pt2t, psm=job.psm, oem=tier.oem, path=tier.path) as api:
+            api.SetImageBytes(crop, width, height, job.bytes_per_pixel, width * job.bytes_per_pixel)
+            api.SetSourceResolution(int(job.ppi))
+            api.Recognize()
+
+            blocks = get_result_blocks(api, language, job.ppi)
+
+            if job.refine.enabled():
+                refine_words(api, numpy.frombuffer(crop, dtype=numpy.uint8).reshape((height, width, job.bytes_per_pixel)), blocks, job.ppi, job.refine)
+
+        return blocks
+
+    check = word_check(language) if job.tiers.enabled() and job.tiers.min_dictionary_rate > 0 else None
+    # Only used for the tier timings, the other stages are timed by the engine
+    metrics = JobMetrics(0, 0, job.language)
+    blocks = recognize_tiered(job.tiers, recognize_tier, check, metrics)
+
+    for block in blocks:
+        block.translate(QtCore.QPoint(left, top))
+
+    if result_cache:
+        result_cache.put(cache_key, blocks, QtCore.QPoint(left, top))
+
+    return blocks_to_bytes(blocks), metrics.tier, metrics.tiers, False
+
+
+def recognize_batch(job: RecognizeBatchJob) -> list[bytes]:
+    '''Recognize all regions of the job and return the serialized result blocks of each in page coordinates'''
+    if not api_pool:
+        init_worker(1)
+
+    assert api_pool
+
+    language = Lang(job.language)
+    results: list[bytes] = []
+
+    with api_pool.borrow(lang=language.pt2t, psm=job.psm) as api:
+        shm = shared_memory.SharedMemory(name=job.shm_name)
+
+        try:
+            # Tesseract copies the raster, the shared memory isn't needed afterwards
+            api.SetImageBytes(bytes(shm.buf[:job.height * job.bytes_per_line]), job.width, job.height, job.bytes_per_pixel, job.bytes_per_line)
+        finally:
+            shm.close()
+
+        api.SetSourceResolution(int(job.ppi))
+
+        for left, top, width, height in job.rects:
+            api.SetRectangle(left, top, width, height)
+            api.Recognize()
+
+            results.append(blocks_to_bytes(get_result_blocks(api, language, job.ppi)))
+
+    return results
+
+
+def open_page_image(image_path: str, rotation: int = 0, skew: float = 0.0) -> Image.Image:
+    '''Load page as RGB, straightened with the same geometry as Page.load_image in the editor'''
+    image = Image.open(image_path).convert('RGB')
+
+    if rotation % 360:
+        image = image.transpose(CLOCKWISE_TRANSPOSES[rotation % 360])
+
+    if skew:
+        # PIL rotates counter-clockwise
+        image = image.rotate(-skew, resample=Image.Resampling.BILINEAR, fillcolor=(255, 255, 255))
+
+    return image
+
+
+def detect_orientation(job: OrientationJob) -> tuple[int, float]:
+    '''Get clockwise rotation (multiple of 90 degrees) and skew in degrees straightening a page, estimated on a downscaled gray copy'''
+    if not api_pool:
+        init_worker(1)
+
+    assert api_pool
+
+    image = Image.open(job.image_path).convert('L')
+    scale = layout_scale(job.ppi, job.analysis_ppi)
+
+    if scale < 1.0:
+        image = image.resize((round(image.width * scale), round(image.height * scale)), Image.Resampling.BILINEAR)
+
+    rotation = 0
+
+    if job.detect_orientation:
+        try:
+            with api_pool.borrow(lang='osd', psm=tesserocr.PSM.OSD_ONLY) as api:
+                api.SetImageBytes(image.tobytes(), image.width, image.height, 1, image.width)
+                api.SetSourceResolution(int(job.ppi * scale))
+                osd = api.DetectOrientationScript()
+        except RuntimeError:
+            # osd.traineddata isn't installed
+            osd = None
+
+        if osd:
+            # Clockwise rotation of the input, rotating clockwise by the rest of a full turn makes it upright
+            rotation = (360 - int(osd['orient_deg'])) % 360
+
+    if rotation:
+        image = image.transpose(CLOCKWISE_TRANSPOSES[rotation])
+
+    return rotation, estimate_skew(numpy.asarray(image))
+
+
+def remove_contained_blocks(blocks: list[OCRResultBlock]) -> list[OCRResultBlock]:
+    '''Drop blocks fully contained by other blocks, same as after layout analysis in the editor'''
+    return [block for block in blocks if not any(other is not block and other.bbox_rect.contains(block.bbox_rect) for other in blocks)]
+
+
+def escalate_page_blocks(results: list[tuple[list[OCRResultBlock] | None, bool, str, QtCore.QRect]], result_tiers: dict[int, ModelTier], image: Image.Image, job: PageJob, language: Lang, ocr_scale: float) -> None:
+    '''Recognize weak new results of process_page again with the next model tiers, replacing them in results if more confident
+
+    result_tiers holds the tier of the result of each new block by index and is updated along. Every further tier sets the page only once for all of its blocks.
+    With word refinement enabled the results of every tier are refined before they are compared, the same as recognize_tiered in the editor.
+    '''
+    assert api_pool
+
+    tiers = job.tiers.get_tiers()
+    check = word_check(language) if job.tiers.min_dictionary_rate > 0 else None
+    pixels = numpy.asarray(image) if job.refine.enabled() else None
+
+    for tier in tiers[1:]:
+        weak = [i for i in result_tiers if needs_escalation(results[i][0] or [], job.tiers, check)]
+
+        if not weak:
+            break
+
+        try:
+            with api_pool.borrow(lang=language.pt2t, psm=tesserocr.PSM.AUTO, oem=tier.oem, path=tier.path) as api:
+                api.SetImageBytes(image.tobytes(), image.width, image.height, len(image.getbands()), image.width * len(image.getbands()))
+                api.SetSourceResolution(int(job.ppi * ocr_scale))
+
+                candidates: dict[int, list[OCRResultBlock]] = {}
+
+                for i in weak:
+                    rect = results[i][3]
+
+                    api.SetRectangle(rect.left(), rect.top(), rect.width(), rect.height())
+                    api.Recognize()
+                    candidates[i] = get_result_blocks(api, language, job.ppi * ocr_scale)
+
+                if pixels is not None:
+                    # Replaces the page image of the API, so only after all weak blocks have been recognized
+                    refine_words(api, pixels, [block for tier_blocks in candidates.values() for block in tier_blocks], job.ppi * ocr_scale, job.refine)
+
+                for i, tier_blocks in candidates.items():
+                    blocks, new, cache_key, rect = results[i]
+
+                    if mean_confidence(result_words(tier_blocks)) >= mean_confidence(result_words(blocks or [])):
+                        results[i] = (tier_blocks, new, cache_key, rect)
+                        result_tiers[i] = tier
+        except RuntimeError:
+            # Language not installed in the tier's tessdata directory
+            continue
+
+
+def process_page(job: PageJob) -> PageResult:
+    '''Analyse layout of a page image and optionally recognize the text blocks found, setting the image only once'''
+    if not api_pool:
+        init_worker(1)
+
+    assert api_pool
+
+    language = Lang(job.language)
+
+    image = open_page_image(job.image_path, job.rotation, job.skew)
+    # Text colours come from the page as it is, not from its preprocessed copy
+    color_pixels = numpy.asarray(image)
+
+    if job.preprocess.enabled():
+        image = Image.fromarray(preprocess(numpy.asarray(image), job.preprocess))
+
+    # 1 for preprocessed (gray) pages
+    bytes_per_pixel = len(image.getbands())
+    page_rect = QtCore.QRect(0, 0, image.width, image.height)
+
+    # Results on the downsampled page are scaled back to page coordinates
+    ocr_scale = downsample_scale(job.ppi, job.ocr_ppi)
+    ocr_image = image
+
+    if ocr_scale < 1.0 and job.recognize:
+        # Box filtering averages all pixels covered, like area interpolation
+        ocr_image = image.resize((round(image.width * ocr_scale), round(image.height * ocr_scale)), Image.Resampling.BOX)
+
+    ocr_page_rect = QtCore.QRect(0, 0, ocr_image.width, ocr_image.height)
+
+    layout_blocks: list[OCRResultBlock] = []
+    recognized: list[bytes | None] = []
+
+    result_cache = get_result_cache(job.cache_dir)
+
+    # Layout analysis and the first recognition pass use the first tier's models
+    first_tier = job.tiers.get_tiers()[0]
+
+    with api_pool.borrow(lang=language.pt2t, psm=tesserocr.PSM.AUTO_ONLY, oem=first_tier.oem, path=first_tier.path) as api:
+        scale = layout_scale(job.ppi, job.layout_ppi)
+        layout_image = image
+
+        if scale < 1.0:
+            layout_image = image.resize((round(image.width * scale), round(image.height * scale)), Image.Resampling.BILINEAR)
+
+        api.SetImageBytes(layout_image.tobytes(), layout_image.width, layout_image.height, bytes_per_pixel, layout_image.width * bytes_per_pixel)
+        api.SetSourceResolution(int(job.ppi * scale))
+
+        layout_rect = QtCore.QRect(0, 0, layout_image.width, layout_image.height)
+        layout_rect.setTop(round(job.from_header * scale))
+
+        if job.to_footer:
+            layout_rect.setBottom(round(job.to_footer * scale))
+
+        api.SetRectangle(layout_rect.left(), layout_rect.top(), layout_rect.width(), layout_rect.height())
+        page_it = api.AnalyseLayout()
+
+        if page_it:
+            layout_blocks = [block for block in get_layout_blocks(page_it, scale=scale) if block.type not in (OCR_RESULT_BLOCK_TYPE.UNKNOWN, OCR_RESULT_BLOCK_TYPE.H_LINE, OCR_RESULT_BLOCK_TYPE.V_LINE)]
+            layout_blocks = remove_contained_blocks(layout_blocks)
+
+        if layout_image is not ocr_image and job.recognize:
+            # Recognition needs the page at its recognition resolution
+            api.SetImageBytes(ocr_image.tobytes(), ocr_image.width, ocr_image.height, bytes_per_pixel, ocr_image.width * bytes_per_pixel)
+            api.SetSourceResolution(int(job.ppi * ocr_scale))
+
+        api.SetPageSegMode(tesserocr.PSM.AUTO)
+
+        # Per layout block: results on the downsampled page (None if not recognized), whether they are new, the cache key and the recognized region
+        results: list[tuple[list[OCRResultBlock] | None, bool, str, QtCore.QRect]] = []
+
+        for block in layout_blocks:
+            if job.recognize and block.type is OCR_RESULT_BLOCK_TYPE.TEXT:
+                rect = block.bbox_rect.adjusted(-job.margin, -job.margin, job.margin, job.margin).intersected(page_rect)
+                rect = scale_rect(rect, ocr_scale).intersected(ocr_page_rect)
+
+                cache_key = ''
+                blocks = None
+
+                if result_cache:
+                    crop = ocr_image.crop((rect.left(), rect.top(), rect.left() + rect.width(), rect.top() + rect.height()))
+                    cache_key = crop_cache_key(numpy.asarray(crop), job.ppi * ocr_scale, language, tesserocr.PSM.AUTO, job.refine, job.tiers)
+                    blocks = result_cache.get(cache_key, rect.topLeft())
+
+                if blocks is None:
+                    api.SetRectangle(rect.left(), rect.top(), rect.width(), rect.height())
+                    api.Recognize()
+
+                    results.append((get_result_blocks(api, language, job.ppi * ocr_scale), True, cache_key, rect))
+                else:
+                    results.append((blocks, False, cache_key, rect))
+            else:
+                results.append((None, False, '', QtCore.QRect()))
+
+        # Tier of the result of each new block by index
+        result_tiers = {i: first_tier for i, (blocks, new, cache_key, rect) in enumerate(results) if new and blocks is not None}
+        tiers: dict[str, int] = {}
+
+        if job.recognize and job.refine.enabled():
+            # Replaces the page image of the API, so only after all blocks have been recognized
+            new_blocks = [result_block for i in result_tiers for result_block in results[i][0] or []]
+
+            if new_blocks:
+                refine_words(api, numpy.asarray(ocr_image), new_blocks, job.ppi * ocr_scale, job.refine)
+
+        if job.recognize and job.tiers.enabled():
+            # Weak words of further tiers are read again with the models that recognized their block
+            escalate_page_blocks(results, result_tiers, ocr_image, job, language, ocr_scale)
+
+            for tier in result_tiers.values():
+                tiers[tier.name] = tiers.get(tier.name, 0) + 1
+
+    for blocks, new, cache_key, rect in results:
+        if blocks is None:
+            recognized.append(None)
+            continue
+
+        if new and result_cache:
+            result_cache.put(cache_key, blocks, rect.topLeft())
+
+        if ocr_scale < 1.0:
+            for result_block in blocks:
+                result_block.scale(1 / ocr_scale)
+
+        # Like the editor's scheduler does for its results, cached results have no colours either
+        estimate_block_colors_rgb(blocks, color_pixels)
+
+        recognized.append(blocks_to_bytes(blocks))
+
+    return PageResult(blocks_to_bytes(layout_blocks), recognized, tiers)
@@ -0,0 +1,140 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+from PySide6 import QtCore
+
+from ocr_engine.ocr_results import (OCRResultBlock, blocks_from_bytes,
+                                    blocks_to_bytes)
+
+
+def make_cache_key(pixels: bytes, width: int, height: int, ppi: float, language: str, psm: int, engine: str, version: str) -> str:
+    '''Hash of packed RGB888 pixels and everything else that influences recognition results
+
+    Gray pixels have to be expanded to RGB888 as well, so the editor and batch processing share entries.
+    '''
+    key = hashlib.sha256()
+    # Tesseract only takes whole pixels per inch
+    key.update(f'{engine}\0{version}\0{language}\0{int(psm)}\0{width}x{height}\0{int(ppi)}\0'.encode())
+    key.update(pixels)
+
+    return key.hexdigest()
+
+
+def default_cache_directory() -> str:
+    return os.path.join(QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.StandardLocation.CacheLocation), 'ocr_results')
+
+
+class OCRResultCache():
+    '''On-disk cache of serialized result blocks, addressed by image content and limited in size by evicting least recently used entries
+
+    Blocks are stored relative to the recognized image, so callers pass the image's position within the page.
+    Safe to share between threads and between processes using the same directory.
+    '''
+
+    def __init__(self, directory: str = '', max_size: int = 512 * 1024 * 1024) -> None:
+        self.directory = directory or default_cache_directory()
+        self.max_size = max_size
+        self.lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.size = sum(size for _, size, _ in self.entries())
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def entries(self) -> list[tuple[str, int, float]]:
+        '''Get (path, size, last access) of all cache entries'''
+        entries: list[tuple[str, int, float]] = []
+
+        for root, dirs, files in os.walk(self.directory):
+            for file in files:
+                path = os.path.join(root, file)
+
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    # Evicted by another process
+                    continue
+
+                entries.append((path, stat.st_size, stat.st_mtime))
+
+        return entries
+
+    def get(self, key: str, offset: QtCore.QPoint = QtCore.QPoint()) -> list[OCRResultBlock] | None:
+        '''Get cached blocks translated by offset or None if key is unknown'''
+        path = self.path(key)
+
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+
+            # Modification time serves as last access time for eviction
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        blocks = blocks_from_bytes(data)
+
+        if not offset.isNull():
+            for block in blocks:
+                block.translate(offset)
+
+        return blocks
+
+    def put(self, key: str, blocks: list[OCRResultBlock], offset: QtCore.QPoint = QtCore.QPoint()) -> None:
+        '''Store blocks located at offset'''
+        if not offset.isNull():
+            for block in blocks:
+                block.translate(QtCore.QPoint(-offset.x(), -offset.y()))
+
+        data = blocks_to_bytes(blocks)
+
+        if not offset.isNull():
+            for block in blocks:
+                block.translate(offset)
+
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to temporary file first so readers never see partial entries
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+
+        os.replace(temp_path, path)
+
+        with self.lock:
+            self.size += len(data)
+
+            if self.size > self.max_size:
+                self.evict()
+
+    def evict(self) -> None:
+        '''Remove least recently used entries until the cache is below 90 % of its maximum size'''
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        self.size = sum(size for _, size, _ in entries)
+
+        for path, size, _ in entries:
+            if self.size <= self.max_size * 0.9:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+            self.size -= size
+
+    def clear(self) -> None:
+        with self.lock:
+            for path, _, _ in self.entries():
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+            self.size = 0
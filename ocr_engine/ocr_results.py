@@ -1,6 +1,7 @@
 from abc import abstractmethod
 from dataclasses import dataclass, field
 from enum import Enum, auto
+from statistics import median_low
 
 from iso639 import Lang
 from PySide6 import QtCore, QtGui
@@ -8,6 +9,25 @@ from PySide6 import QtCore, QtGui
 from document_helper import DocumentHelper
 
 
+def scale_rect(rect: QtCore.QRect, factor: float) -> QtCore.QRect:
+    if rect.isNull():
+        return QtCore.QRect(rect)
+
+    return QtCore.QRect(
+        QtCore.QPoint(round(rect.left() * factor), round(rect.top() * factor)),
+        QtCore.QPoint(round((rect.right() + 1) * factor) - 1, round((rect.bottom() + 1) * factor) - 1),
+    )
+
+
+def scale_line(line: QtCore.QLine, factor: float) -> QtCore.QLine:
+    return QtCore.QLine(
+        round(line.x1() * factor),
+        round(line.y1() * factor),
+        round(line.x2() * factor),
+        round(line.y2() * factor),
+    )
+
+
 @dataclass
 class OCRResult:
     bbox_rect: QtCore.QRect = QtCore.QRect()
@@ -30,6 +50,10 @@ class OCRResult:
     def translate(self, distance: QtCore.QPoint) -> None:
         pass
 
+    @abstractmethod
+    def scale(self, factor: float) -> None:
+        pass
+
     def write(self, file: QtCore.QDataStream):
         file.writeQVariant(self.bbox_rect)
         file.writeString(self.text)
@@ -44,15 +68,45 @@ class OCRResult:
         self.baseline = file.readQVariant()
         self.font_size = file.readFloat()
 
+    def to_dict(self) -> dict:
+        """Plain values for JSON, rect as [left, top, width, height] and baseline as [x1, y1, x2, y2]"""
+
+        return {
+            "bbox": [
+                self.bbox_rect.left(),
+                self.bbox_rect.top(),
+                self.bbox_rect.width(),
+                self.bbox_rect.height(),
+            ],
+            "text": self.text,
+            "confidence": self.confidence,
+            "baseline": [
+                self.baseline.x1(),
+                self.baseline.y1(),
+                self.baseline.x2(),
+                self.baseline.y2(),
+            ],
+            "font_size": self.font_size,
+        }
+
 
 @dataclass
 class OCRResultWord(OCRResult):
     blanks_before: int = 0
+    # Estimated from the page image after recognition, not serialized; invalid if unknown
+    foreground_color: QtGui.QColor = field(default_factory=QtGui.QColor)
 
     def translate(self, distance: QtCore.QPoint):
         """Translate coordinates by a distance"""
 
-        self.bbox = self.bbox_rect.translated(distance)
+        self.bbox_rect = self.bbox_rect.translated(distance)
+        self.baseline = self.baseline.translated(distance)
+
+    def scale(self, factor: float):
+        """Scale coordinates by a factor"""
+
+        self.bbox_rect = scale_rect(self.bbox_rect, factor)
+        self.baseline = scale_line(self.baseline, factor)
 
     def write(self, file: QtCore.QDataStream):
         super().write(file)
@@ -62,6 +116,9 @@ class OCRResultWord(OCRResult):
         super().read(file)
         self.blanks_before = file.readInt16()
 
+    def to_dict(self) -> dict:
+        return super().to_dict() | {"blanks_before": self.blanks_before}
+
 
 @dataclass
 class OCRResultLine(OCRResult):
@@ -70,11 +127,21 @@ class OCRResultLine(OCRResult):
     def translate(self, distance: QtCore.QPoint):
         """Translate coordinates by a distance"""
 
-        self.bbox = self.bbox_rect.translated(distance)
+        self.bbox_rect = self.bbox_rect.translated(distance)
+        self.baseline = self.baseline.translated(distance)
 
         for word in self.words:
             word.translate(distance)
 
+    def scale(self, factor: float):
+        """Scale coordinates by a factor"""
+
+        self.bbox_rect = scale_rect(self.bbox_rect, factor)
+        self.baseline = scale_line(self.baseline, factor)
+
+        for word in self.words:
+            word.scale(factor)
+
     def write(self, file: QtCore.QDataStream):
         super().write(file)
         file.writeInt16(len(self.words))
@@ -91,6 +158,9 @@ class OCRResultLine(OCRResult):
             word.read(file)
             self.words.append(word)
 
+    def to_dict(self) -> dict:
+        return super().to_dict() | {"words": [word.to_dict() for word in self.words]}
+
 
 @dataclass
 class OCRResultParagraph(OCRResult):
@@ -99,11 +169,21 @@ class OCRResultParagraph(OCRResult):
     def translate(self, distance: QtCore.QPoint):
         """Translate coordinates by a distance"""
 
-        self.bbox = self.bbox_rect.translated(distance)
+        self.bbox_rect = self.bbox_rect.translated(distance)
+        self.baseline = self.baseline.translated(distance)
 
         for line in self.lines:
             line.translate(distance)
 
+    def scale(self, factor: float):
+        """Scale coordinates by a factor"""
+
+        self.bbox_rect = scale_rect(self.bbox_rect, factor)
+        self.baseline = scale_line(self.baseline, factor)
+
+        for line in self.lines:
+            line.scale(factor)
+
     def write(self, file: QtCore.QDataStream):
         super().write(file)
         file.writeInt16(len(self.lines))
@@ -120,6 +200,25 @@ class OCRResultParagraph(OCRResult):
             line.read(file)
             self.lines.append(line)
 
+    def to_dict(self) -> dict:
+        return super().to_dict() | {"lines": [line.to_dict() for line in self.lines]}
+
+
+def colors_differ(color: QtGui.QColor, other: QtGui.QColor, tolerance: int = 64) -> bool:
+    """Check if a known colour clearly differs from another one, small differences are estimation noise"""
+    if not color.isValid():
+        return False
+
+    if not other.isValid():
+        return True
+
+    return (
+        abs(color.red() - other.red())
+        + abs(color.green() - other.green())
+        + abs(color.blue() - other.blue())
+        > tolerance
+    )
+
 
 #TODO: Unify this with BOX_DATA_TYPE
 class OCR_RESULT_BLOCK_TYPE(Enum):
@@ -137,6 +236,8 @@ class OCRResultBlock(OCRResult):
     type: OCR_RESULT_BLOCK_TYPE = OCR_RESULT_BLOCK_TYPE.TEXT
     tag: str = ""
     class_: str = ""
+    # Estimated from the page image after recognition, saved by BoxData; invalid if unknown
+    foreground_color: QtGui.QColor = field(default_factory=QtGui.QColor)
 
     def get_document(
         self, diagnostics: bool = False, remove_hyphens=True
@@ -166,7 +267,11 @@ class OCRResultBlock(OCRResult):
                     cursor.setBlockFormat(block_format)
                     # format.setFont(self.font)
                     format.setFontPointSize(round(self.get_font_size()))
-                    # format.setForeground(self.foreground_color)
+
+                    # Plain black text is left to the default
+                    if colors_differ(self.foreground_color, QtGui.QColor(QtCore.Qt.GlobalColor.black)):
+                        format.setForeground(self.foreground_color)
+
                     cursor.setCharFormat(format)
                     # cursor.insertBlock(block_format)
                     # cursor.deletePreviousChar()
@@ -186,7 +291,15 @@ class OCRResultBlock(OCRResult):
                                 cursor.setCharFormat(format)
 
                             cursor.insertText(word.blanks_before * " ")
-                            cursor.insertText(word.text)
+
+                            # Only words standing out from the block (e.g. highlighted) get their own colour
+                            if colors_differ(word.foreground_color, self.foreground_color):
+                                word_format = QtGui.QTextCharFormat(format)
+                                word_format.setForeground(word.foreground_color)
+                                cursor.insertText(word.text, word_format)
+                            else:
+                                cursor.insertText(word.text)
+
                             format.clearBackground()
                             cursor.setCharFormat(format)
                         if l < (len(paragraph.lines) - 1):
@@ -227,6 +340,15 @@ class OCRResultBlock(OCRResult):
         self.tag = file.readString()
         self.class_ = file.readString()
 
+    def to_dict(self) -> dict:
+        return super().to_dict() | {
+            "paragraphs": [paragraph.to_dict() for paragraph in self.paragraphs],
+            "language": self.language.name,
+            "type": self.type.name,
+            "tag": self.tag,
+            "class": self.class_,
+        }
+
     def get_words(self) -> list[OCRResultWord]:
         """Get list of words"""
         words: list[OCRResultWord] = []
@@ -249,12 +371,104 @@ class OCRResultBlock(OCRResult):
         return int(font_sizes_sum / len(words))
 
     def translate(self, distance: QtCore.QPoint) -> None:
-        """Translate coordinates by a distance (ignore block itself)"""
+        """Translate coordinates by a distance"""
 
-        # self.bbox.translated(distance)
+        self.bbox_rect = self.bbox_rect.translated(distance)
+        self.baseline = self.baseline.translated(distance)
 
         for paragraph in self.paragraphs:
             paragraph.translate(distance)
 
+    def scale(self, factor: float) -> None:
+        """Scale coordinates by a factor"""
+
+        self.bbox_rect = scale_rect(self.bbox_rect, factor)
+        self.baseline = scale_line(self.baseline, factor)
+
+        for paragraph in self.paragraphs:
+            paragraph.scale(factor)
+
     def add_margin(self, margin: int) -> None:
         self.bbox_rect.adjust(-margin, -margin, margin, margin)
+
+
+def write_blocks(blocks: list[OCRResultBlock], file: QtCore.QDataStream) -> None:
+    """Write complete block trees including the block's own geometry and confidence (not part of project files)"""
+    file.writeInt16(len(blocks))
+
+    for block in blocks:
+        OCRResult.write(block, file)
+        block.write(file)
+
+
+def read_blocks(file: QtCore.QDataStream) -> list[OCRResultBlock]:
+    blocks: list[OCRResultBlock] = []
+
+    for b in range(file.readInt16()):
+        block = OCRResultBlock()
+        OCRResult.read(block, file)
+        block.read(file)
+        blocks.append(block)
+
+    return blocks
+
+
+def blocks_to_bytes(blocks: list[OCRResultBlock]) -> bytes:
+    """Serialize block trees into a compact byte string"""
+    data = QtCore.QByteArray()
+    stream = QtCore.QDataStream(data, QtCore.QIODevice.OpenModeFlag.WriteOnly)
+    write_blocks(blocks, stream)
+
+    return data.data()
+
+
+def blocks_from_bytes(data: bytes) -> list[OCRResultBlock]:
+    stream = QtCore.QDataStream(QtCore.QByteArray(data))
+
+    return read_blocks(stream)
+
+
+def word_confidence(words: list[OCRResultWord]) -> float:
+    """Mean confidence of words, every word counts the same no matter which line it is on"""
+    return sum(word.confidence for word in words) / len(words)
+
+
+def summarize(result: OCRResult, children: list, words: list[OCRResultWord]) -> None:
+    """Set bounding box of a parent element from its children and its confidence from the words it contains"""
+    if not children:
+        return
+
+    bbox_rect = QtCore.QRect(children[0].bbox_rect)
+
+    for child in children[1:]:
+        bbox_rect = bbox_rect.united(child.bbox_rect)
+
+    result.bbox_rect = bbox_rect
+
+    if words:
+        result.confidence = word_confidence(words)
+
+
+def complete_parents(block: OCRResultBlock) -> None:
+    """Derive text, confidence and bounding box of a block's paragraphs and lines from their words, the same way Tesseract assembles text"""
+    for paragraph in block.paragraphs:
+        for line in paragraph.lines:
+            line.text = "".join(word.blanks_before * " " + word.text for word in line.words).lstrip() + "\n"
+            summarize(line, line.words, line.words)
+
+        paragraph.text = "".join(line.text for line in paragraph.lines)
+        summarize(paragraph, paragraph.lines, [word for line in paragraph.lines for word in line.words])
+        paragraph.baseline = paragraph.lines[-1].baseline if paragraph.lines else paragraph.baseline
+
+    block.text = "\n".join(paragraph.text for paragraph in block.paragraphs)
+    summarize(block, block.paragraphs, block.get_words())
+    block.baseline = block.paragraphs[-1].baseline if block.paragraphs else block.baseline
+
+    colors = [word.foreground_color for word in block.get_words() if word.foreground_color.isValid()]
+
+    if colors:
+        block.foreground_color = QtGui.QColor(
+            median_low(color.red() for color in colors),
+            median_low(color.green() for color in colors),
+            median_low(color.blue() for color in colors),
+        )
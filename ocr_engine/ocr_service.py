@@ -0,0 +1,332 @@
+import base64
+import hashlib
+import io
+import json
+import multiprocessing
+import queue
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import tesserocr as tesserocr
+from iso639 import Lang  # type: ignore
+from iso639.exceptions import InvalidLanguageValue  # type: ignore
+from PIL import Image
+
+from ocr_engine.ocr_process_worker import (BYTES_PER_PIXEL, RecognizeBatchJob,
+                                           init_worker, recognize_batch)
+from ocr_engine.ocr_results import blocks_from_bytes
+
+# Code in here runs without Qt widgets, recognition happens in worker processes that keep their Tesseract instances between requests
+
+
+@dataclass
+class ServicePage():
+    '''Decoded page raster in shared memory, used by all requests for the same image at the same time'''
+    shm: shared_memory.SharedMemory
+    width: int
+    height: int
+    bytes_per_line: int
+    # Requests currently using the page
+    users: int = 0
+
+
+@dataclass
+class BoxRequest():
+    page_key: str
+    rect: tuple[int, int, int, int]
+    ppi: float
+    language: str
+    psm: int
+    future: Future = field(default_factory=Future)
+
+
+class RecognitionBatcher():
+    '''Collects boxes of concurrent requests for a moment and hands boxes of the same page, language and resolution to a worker together
+
+    Small requests then share a single SetImage and a warm Tesseract instance instead of paying for both separately.
+    A worker dying (crash in Tesseract, out of memory) breaks the whole pool, it is replaced by a new one created with create_executor.
+    '''
+
+    def __init__(self, create_executor, max_batch_size: int = 32, max_delay: float = 0.01) -> None:
+        self.create_executor = create_executor
+        self.executor: ProcessPoolExecutor = create_executor()
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        # Number of times the pool had to be replaced, unhealthy once that failed
+        self.restarts = 0
+        self.healthy = True
+
+        self.queue: queue.Queue[BoxRequest | None] = queue.Queue()
+        self.pages: dict[str, ServicePage] = {}
+        self.pages_lock = threading.Lock()
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def open_page(self, image: Image.Image) -> str:
+        '''Share the page with the workers, identical images of concurrent requests are only shared once'''
+        data = image.tobytes()
+        key = hashlib.sha1(data).hexdigest() + f'-{image.width}x{image.height}'
+
+        with self.pages_lock:
+            page = self.pages.get(key)
+
+            if not page:
+                shm = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+                shm.buf[:len(data)] = data
+
+                page = ServicePage(shm, image.width, image.height, image.width * BYTES_PER_PIXEL)
+                self.pages[key] = page
+
+            page.users += 1
+
+        return key
+
+    def close_page(self, key: str) -> None:
+        with self.pages_lock:
+            page = self.pages[key]
+            page.users -= 1
+
+            if page.users == 0:
+                del self.pages[key]
+                page.shm.close()
+                page.shm.unlink()
+
+    def submit(self, page_key: str, rect: tuple[int, int, int, int], ppi: float, language: str, psm: int = tesserocr.PSM.AUTO) -> Future:
+        '''Queue a box of an opened page, the future's result are the serialized result blocks'''
+        request = BoxRequest(page_key, rect, ppi, language, psm)
+        self.queue.put(request)
+
+        return request.future
+
+    def next_requests(self) -> list[BoxRequest] | None:
+        '''Wait for a request and collect the ones arriving shortly after it, None once stopped'''
+        request = self.queue.get()
+
+        if request is None:
+            return None
+
+        requests = [request]
+        deadline = time.monotonic() + self.max_delay
+
+        while len(requests) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+
+            if timeout <= 0:
+                break
+
+            try:
+                request = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+
+            if request is None:
+                # Stop after this batch
+                self.queue.put(None)
+                break
+
+            requests.append(request)
+
+        return requests
+
+    def run(self) -> None:
+        while (requests := self.next_requests()) is not None:
+            batches: dict[tuple[str, str, float, int], list[BoxRequest]] = {}
+
+            for request in requests:
+                batches.setdefault((request.page_key, request.language, request.ppi, request.psm), []).append(request)
+
+            for (page_key, language, ppi, psm), batch in batches.items():
+                # Requests keep their page open until their results arrived
+                with self.pages_lock:
+                    page = self.pages[page_key]
+
+                job = RecognizeBatchJob(page.shm.name, page.width, page.height, page.bytes_per_line, [request.rect for request in batch], ppi, language, psm)
+
+                try:
+                    future = self.submit_batch(job)
+                except Exception as e:
+                    # Otherwise the requests would wait for their results forever
+                    for request in batch:
+                        request.future.set_exception(e)
+
+                    continue
+
+                future.add_done_callback(lambda future, batch=batch: self.batch_finished(future, batch))
+
+    def submit_batch(self, job: RecognizeBatchJob) -> Future:
+        '''Hand a batch to the workers, replacing a broken pool once'''
+        try:
+            return self.executor.submit(recognize_batch, job)
+        except BrokenProcessPool:
+            print('Worker process died, restarting the workers', file=sys.stderr, flush=True)
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+            try:
+                self.executor = self.create_executor()
+            except Exception:
+                self.healthy = False
+                raise
+
+            self.restarts += 1
+
+            return self.executor.submit(recognize_batch, job)
+
+    def batch_finished(self, future: Future, batch: list[BoxRequest]) -> None:
+        exception = future.exception()
+
+        for i, request in enumerate(batch):
+            if exception:
+                request.future.set_exception(exception)
+            else:
+                request.future.set_result(future.result()[i])
+
+    def stop(self) -> None:
+        self.queue.put(None)
+        self.thread.join()
+
+
+class OCRService():
+    '''Recognize page images sent as JSON requests, workers stay warm between requests'''
+
+    def __init__(self, workers: int, max_batch_size: int = 32, max_delay: float = 0.01, image_root: str = '') -> None:
+        self.workers = workers
+        # Directory requests may read images from by path, paths aren't accepted without it
+        self.image_root = Path(image_root).resolve() if image_root else None
+        self.batcher = RecognitionBatcher(self.create_executor, max_batch_size, max_delay)
+        self.languages = tesserocr.get_languages()[1]
+
+    def create_executor(self) -> ProcessPoolExecutor:
+        # Forking after threads have been started isn't safe, always spawn fresh interpreters
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'), initializer=init_worker, initargs=(2,))
+
+    def health(self) -> dict:
+        return {'status': 'ok' if self.batcher.healthy else 'unhealthy', 'restarts': self.batcher.restarts, 'languages': self.languages}
+
+    def image_path(self, path: str) -> Path:
+        '''Path of an image below the image root, clients must not be able to read other files of the server'''
+        if self.image_root is None:
+            raise ValueError('Paths are not accepted, the service has no image root')
+
+        # Resolving follows symlinks and .. out of the image root
+        resolved = (self.image_root / path).resolve()
+
+        if not resolved.is_relative_to(self.image_root):
+            raise ValueError(f'Path {path} lies outside of the image root')
+
+        return resolved
+
+    def recognize(self, request: dict) -> dict:
+        '''Request: {"image": base64 encoded image file or "path": image file below the image root, "ppi": 300, "language": "English", "boxes": [[left, top, width, height], ...]}
+
+        Without boxes the whole page is recognized. The response has the result blocks of every box in page coordinates: {"boxes": [[block, ...], ...]}
+        '''
+        if 'image' in request:
+            image = Image.open(io.BytesIO(base64.b64decode(request['image'])))
+        elif 'path' in request:
+            image = Image.open(self.image_path(request['path']))
+        else:
+            raise ValueError('Request needs an image or a path')
+
+        image = image.convert('RGB')
+        ppi = float(request.get('ppi', 300.0))
+        language = Lang(request.get('language', 'English'))
+        psm = int(request.get('psm', tesserocr.PSM.AUTO))
+
+        if language.pt2t not in self.languages:
+            raise ValueError(f'Language {language.name} is not installed')
+
+        rects: list[tuple[int, int, int, int]] = []
+
+        for box in request.get('boxes') or [[0, 0, image.width, image.height]]:
+            left, top, width, height = (int(value) for value in box)
+
+            # Clip to the page
+            right = min(left + width, image.width)
+            bottom = min(top + height, image.height)
+            left = max(left, 0)
+            top = max(top, 0)
+
+            if right <= left or bottom <= top:
+                raise ValueError(f'Box {box} lies outside of the page')
+
+            rects.append((left, top, right - left, bottom - top))
+
+        page_key = self.batcher.open_page(image)
+
+        try:
+            futures = [self.batcher.submit(page_key, rect, ppi, language.name, psm) for rect in rects]
+            results = [blocks_from_bytes(future.result()) for future in futures]
+        finally:
+            self.batcher.close_page(page_key)
+
+        return {'boxes': [[block.to_dict() for block in blocks] for blocks in results]}
+
+    def shutdown(self) -> None:
+        self.batcher.stop()
+        self.batcher.executor.shutdown(cancel_futures=True)
+
+
+class OCRRequestHandler(BaseHTTPRequestHandler):
+    '''GET /health and POST /recognize, both answering with JSON'''
+
+    def address_string(self) -> str:
+        # Clients of Unix sockets have no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def send_json(self, status: int, response: dict) -> None:
+        body = json.dumps(response).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path == '/health':
+            health = self.server.service.health()
+            self.send_json(200 if health['status'] == 'ok' else 503, health)
+        else:
+            self.send_json(404, {'error': f'Unknown path {self.path}'})
+
+    def do_POST(self) -> None:
+        if self.path != '/recognize':
+            self.send_json(404, {'error': f'Unknown path {self.path}'})
+            return
+
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            response = self.server.service.recognize(request)
+        except (ValueError, InvalidLanguageValue, KeyError, TypeError, OSError) as e:
+            # Malformed requests, unreadable images and unknown languages
+            self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            print(f'Recognition failed: {e}', file=sys.stderr, flush=True)
+            self.send_json(500, {'error': str(e)})
+        else:
+            self.send_json(200, response)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def create_server(service: OCRService, host: str = '127.0.0.1', port: int = 8765, socket_path: str = '') -> socketserver.BaseServer:
+    '''HTTP server on a Unix socket if socket_path is given, otherwise on host and port'''
+    if socket_path:
+        server: socketserver.BaseServer = ThreadingUnixHTTPServer(socket_path, OCRRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), OCRRequestHandler)
+
+    server.service = service  # type: ignore
+
+    return server
@@ -0,0 +1,160 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import cv2  # type: ignore
+import numpy
+from PySide6 import QtCore, QtGui
+
+from ocr_engine.image_buffer import TESSERACT_FORMAT, qimage_to_numpy
+
+
+@dataclass(frozen=True)
+class PreprocessOptions():
+    '''Steps applied to page images before layout analysis and recognition, with all of them off pages are used as they are'''
+    grayscale: bool = False
+    # Local (adaptive) thresholding to black and white
+    binarize: bool = False
+    # Size of the neighbourhood thresholds are computed from in pixels, odd
+    block_size: int = 31
+    # Subtracted from the neighbourhood mean, higher values keep less ink
+    threshold_offset: int = 10
+    # Median filter against salt and pepper noise
+    denoise: bool = False
+    # Whiten dark scanner borders along the page edges
+    remove_border: bool = False
+
+    def enabled(self) -> bool:
+        return self.grayscale or self.binarize or self.denoise or self.remove_border
+
+
+def load_preprocess_options(settings: QtCore.QSettings) -> PreprocessOptions:
+    return PreprocessOptions(
+        grayscale=settings.value('preprocess_grayscale', False, type=bool),
+        binarize=settings.value('preprocess_binarize', False, type=bool),
+        denoise=settings.value('preprocess_denoise', False, type=bool),
+        remove_border=settings.value('preprocess_remove_border', False, type=bool),
+    )
+
+
+def save_preprocess_options(settings: QtCore.QSettings, options: PreprocessOptions) -> None:
+    settings.setValue('preprocess_grayscale', options.grayscale)
+    settings.setValue('preprocess_binarize', options.binarize)
+    settings.setValue('preprocess_denoise', options.denoise)
+    settings.setValue('preprocess_remove_border', options.remove_border)
+
+
+def leading_count(mask: numpy.ndarray) -> int:
+    '''Number of True values before the first False one'''
+    return len(mask) if mask.all() else int(numpy.argmin(mask))
+
+
+def remove_border(gray: numpy.ndarray, dark_fraction: float = 0.5) -> numpy.ndarray:
+    '''Whiten rows and columns at the page edges that are mostly dark, as left by scanning beyond the paper'''
+    dark = gray < 128
+    rows = dark.mean(axis=1) > dark_fraction
+    columns = dark.mean(axis=0) > dark_fraction
+
+    top = leading_count(rows)
+    bottom = leading_count(rows[::-1])
+    left = leading_count(columns)
+    right = leading_count(columns[::-1])
+
+    if not (top or bottom or left or right):
+        return gray
+
+    gray = gray.copy()
+    gray[:top] = 255
+    gray[len(gray) - bottom:] = 255
+    gray[:, :left] = 255
+    gray[:, gray.shape[1] - right:] = 255
+
+    return gray
+
+
+def preprocess(pixels: numpy.ndarray, options: PreprocessOptions) -> numpy.ndarray:
+    '''Turn (height, width, 3) RGB or (height, width) gray pixels into preprocessed gray pixels'''
+    gray = pixels if pixels.ndim == 2 else cv2.cvtColor(numpy.ascontiguousarray(pixels[:, :, :3]), cv2.COLOR_RGB2GRAY)
+
+    if options.remove_border:
+        gray = remove_border(gray)
+
+    if options.denoise:
+        gray = cv2.medianBlur(gray, 3)
+
+    if options.binarize:
+        gray = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, options.block_size | 1, options.threshold_offset)
+
+    return gray
+
+
+def resample(pixels: numpy.ndarray, scale: float) -> numpy.ndarray:
+    '''Downsample with area interpolation, each new pixel is the mean of the pixels it covers'''
+    height, width = pixels.shape[:2]
+
+    return cv2.resize(pixels, (max(round(width * scale), 1), max(round(height * scale), 1)), interpolation=cv2.INTER_AREA)
+
+
+def upscale_binarize(pixels: numpy.ndarray, scale: float) -> numpy.ndarray:
+    '''Enlarge a small crop like a single word with cubic interpolation and threshold it globally (Otsu) to black and white gray pixels'''
+    if pixels.ndim == 3 and pixels.shape[2] == 1:
+        # Gray pixels with a channel axis
+        pixels = pixels[:, :, 0]
+
+    gray = pixels if pixels.ndim == 2 else cv2.cvtColor(numpy.ascontiguousarray(pixels[:, :, :3]), cv2.COLOR_RGB2GRAY)
+
+    if scale > 1.0:
+        height, width = gray.shape
+        gray = cv2.resize(gray, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_CUBIC)
+
+    return numpy.ascontiguousarray(cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1])
+
+
+def preprocess_image(image: QtGui.QImage, options: PreprocessOptions, scale: float = 1.0) -> QtGui.QImage:
+    '''Resample by scale (before the other steps, they are cheaper on less pixels) and preprocess'''
+    if image.format() != TESSERACT_FORMAT:
+        image = image.convertToFormat(TESSERACT_FORMAT)
+
+    pixels = qimage_to_numpy(image)
+
+    if scale < 1.0:
+        pixels = resample(pixels, scale)
+
+    if options.enabled():
+        pixels = preprocess(pixels, options)
+
+    pixels = numpy.ascontiguousarray(pixels)
+    image_format = QtGui.QImage.Format.Format_Grayscale8 if pixels.ndim == 2 else TESSERACT_FORMAT
+
+    # Copy, the QImage would otherwise point into the numpy array
+    return QtGui.QImage(pixels.data, pixels.shape[1], pixels.shape[0], pixels.strides[0], image_format).copy()
+
+
+class PreprocessedPages():
+    '''Preprocessed and resampled copies of the most recently used pages by source pixmap, options and scale
+
+    A pixmap's cache key changes with its content, so copies of changed or reloaded pages are never reused.
+    '''
+
+    def __init__(self, max_pages: int = 4) -> None:
+        self.max_pages = max_pages
+        self.pages: OrderedDict[tuple[int, PreprocessOptions, float], QtGui.QPixmap] = OrderedDict()
+
+    def get(self, image: QtGui.QPixmap, options: PreprocessOptions, scale: float = 1.0) -> QtGui.QPixmap:
+        if not options.enabled() and scale >= 1.0:
+            return image
+
+        key = (image.cacheKey(), options, scale)
+
+        if key in self.pages:
+            self.pages.move_to_end(key)
+        else:
+            # Without conversion gray pages stay gray, so they can go to Tesseract with a byte per pixel without checking their pixels
+            self.pages[key] = QtGui.QPixmap.fromImage(preprocess_image(image.toImage(), options, scale), QtCore.Qt.ImageConversionFlag.NoFormatConversion)
+
+            while len(self.pages) > self.max_pages:
+                self.pages.popitem(last=False)
+
+        return self.pages[key]
+
+    def clear(self) -> None:
+        self.pages.clear()
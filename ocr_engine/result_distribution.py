@@ -0,0 +1,82 @@
+from PySide6 import QtCore
+
+from ocr_engine.ocr_results import (OCRResultBlock, OCRResultLine,
+                                    OCRResultParagraph, complete_parents)
+
+
+class RectIndex():
+    '''Uniform grid over rectangles to find the ones containing a point without testing all of them'''
+
+    def __init__(self, rects: list[QtCore.QRect], cell_size: int = 256) -> None:
+        self.rects = rects
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], list[int]] = {}
+
+        for i, rect in enumerate(rects):
+            for x in range(rect.left() // cell_size, rect.right() // cell_size + 1):
+                for y in range(rect.top() // cell_size, rect.bottom() // cell_size + 1):
+                    self.cells.setdefault((x, y), []).append(i)
+
+    def find(self, point: QtCore.QPoint) -> int:
+        '''Get index of the smallest rectangle containing point (the innermost of nested ones) or -1'''
+        found = -1
+        found_area = 0
+
+        for i in self.cells.get((point.x() // self.cell_size, point.y() // self.cell_size), []):
+            rect = self.rects[i]
+
+            if rect.contains(point):
+                area = rect.width() * rect.height()
+
+                if found < 0 or area < found_area:
+                    found = i
+                    found_area = area
+
+        return found
+
+
+def distribute_blocks(blocks: list[OCRResultBlock], rects: list[QtCore.QRect]) -> list[OCRResultBlock | None]:
+    '''Split results of a page wide recognition into one block per rectangle
+
+    Every word goes to the rectangle containing its center, paragraphs and lines are kept wherever their words end up.
+    Returns None for rectangles without words.
+    '''
+    index = RectIndex(rects)
+
+    distributed: list[OCRResultBlock | None] = [None] * len(rects)
+
+    for block in blocks:
+        for paragraph in block.paragraphs:
+            # Parts of this paragraph that have been added to each rectangle's block
+            paragraphs: dict[int, OCRResultParagraph] = {}
+
+            for line in paragraph.lines:
+                lines: dict[int, OCRResultLine] = {}
+
+                for word in line.words:
+                    i = index.find(word.bbox_rect.center())
+
+                    if i < 0:
+                        continue
+
+                    if i not in lines:
+                        if i not in paragraphs:
+                            target_block = distributed[i]
+
+                            if target_block is None:
+                                target_block = OCRResultBlock(language=block.language)
+                                distributed[i] = target_block
+
+                            paragraphs[i] = OCRResultParagraph()
+                            target_block.paragraphs.append(paragraphs[i])
+
+                        lines[i] = OCRResultLine(baseline=line.baseline)
+                        paragraphs[i].lines.append(lines[i])
+
+                    lines[i].words.append(word)
+
+    for target_block in distributed:
+        if target_block:
+            complete_parents(target_block)
+
+    return distributed
@@ -0,0 +1,105 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator
+
+import tesserocr as tesserocr
+
+APIKey = tuple[str, int, int, tuple[tuple[str, str], ...], str]
+
+
+class TesserocrAPIPool():
+    '''Bounded LRU cache of idle PyTessBaseAPI instances shared by OCR workers
+
+    Initializing an API loads the traineddata for its language and sets up the LSTM state, which costs more than recognizing most boxes.
+    Workers borrow an instance matching (language, PSM, OEM, variables, tessdata path) and return it afterwards, idle instances beyond max_idle are ended oldest first.
+    '''
+
+    def __init__(self, max_idle: int = 4) -> None:
+        self.max_idle = max_idle
+        self.idle: OrderedDict[APIKey, list[tesserocr.PyTessBaseAPI]] = OrderedDict()
+        self.idle_count = 0
+        # Closed pools end instances returned to them, for pools replaced while jobs still use their instances
+        self.closed = False
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(lang: str, psm: int, oem: int, variables: dict[str, str] | None = None, path: str = '') -> APIKey:
+        return (lang, int(psm), int(oem), tuple(sorted((variables or {}).items())), path)
+
+    def acquire(self, key: APIKey) -> tesserocr.PyTessBaseAPI:
+        '''Take an idle API for key out of the pool or initialize a new one'''
+        with self.lock:
+            apis = self.idle.get(key)
+
+            if apis:
+                api = apis.pop()
+                self.idle_count -= 1
+
+                if not apis:
+                    del self.idle[key]
+
+                return api
+
+        lang, psm, oem, variables, path = key
+
+        if path:
+            # Models from another tessdata directory, like tessdata_fast or tessdata_best
+            return tesserocr.PyTessBaseAPI(path=path, lang=lang, psm=psm, oem=oem, variables=dict(variables))
+
+        return tesserocr.PyTessBaseAPI(lang=lang, psm=psm, oem=oem, variables=dict(variables))
+
+    def release(self, key: APIKey, api: tesserocr.PyTessBaseAPI) -> None:
+        '''Return API to the pool, ending least recently used instances if the pool is full'''
+        # Drop image and results of the last job but keep the loaded model
+        api.Clear()
+        api.SetPageSegMode(key[1])
+
+        evicted: list[tesserocr.PyTessBaseAPI] = []
+
+        with self.lock:
+            if self.closed:
+                evicted.append(api)
+            else:
+                self.idle.setdefault(key, []).append(api)
+                self.idle.move_to_end(key)
+                self.idle_count += 1
+
+            while self.idle_count > self.max_idle:
+                oldest_key = next(iter(self.idle))
+                apis = self.idle[oldest_key]
+                evicted.append(apis.pop(0))
+                self.idle_count -= 1
+
+                if not apis:
+                    del self.idle[oldest_key]
+
+        for api in evicted:
+            api.End()
+
+    @contextmanager
+    def borrow(self, lang: str = 'eng', psm: int = tesserocr.PSM.AUTO, oem: int = tesserocr.OEM.DEFAULT, variables: dict[str, str] | None = None, path: str = '') -> Iterator[tesserocr.PyTessBaseAPI]:
+        key = self.make_key(lang, psm, oem, variables, path)
+        api = self.acquire(key)
+
+        try:
+            yield api
+        finally:
+            self.release(key, api)
+
+    def clear(self) -> None:
+        '''End all idle instances'''
+        with self.lock:
+            apis = [api for key_apis in self.idle.values() for api in key_apis]
+            self.idle.clear()
+            self.idle_count = 0
+
+        for api in apis:
+            api.End()
+
+    def close(self) -> None:
+        '''End all idle instances and the ones still borrowed once they are returned'''
+        with self.lock:
+            self.closed = True
+
+        self.clear()
@@ -0,0 +1,374 @@
+import math
+from enum import Enum, auto
+
+import numpy
+import tesserocr as tesserocr
+from iso639 import Lang  # type: ignore
+from PySide6 import QtCore
+
+from ocr_engine.image_buffer import downsample_scale
+from ocr_engine.job_metrics import JobMetrics, measure
+from ocr_engine.ocr_results import (OCR_RESULT_BLOCK_TYPE, OCRResult,
+                                    OCRResultBlock, OCRResultLine,
+                                    OCRResultParagraph, OCRResultWord,
+                                    complete_parents)
+from ocr_engine.preprocessing import upscale_binarize
+from ocr_engine.word_refinement import (RefineOptions, splice_word,
+                                        update_texts, upscale_factor,
+                                        weak_words, word_crop_rect)
+
+
+class RESULT_DETAIL(Enum):
+    # Only word text, confidence and bounding box, parent elements are derived from their words
+    WORDS = auto()
+    # Also baselines of words and lines
+    BASELINES = auto()
+    # Let Tesseract compute text, confidence, bounding box and baseline of every element
+    FULL = auto()
+
+
+def get_result_blocks(api: tesserocr.PyTessBaseAPI, language: Lang, ppi: float, detail: RESULT_DETAIL = RESULT_DETAIL.BASELINES) -> list[OCRResultBlock]:
+    '''Build result block tree from a recognized API (kept free of Qt widgets so worker processes can use it)
+
+    Except for full detail every word is visited once, asking Tesseract for the text of a block, paragraph or line makes it assemble the text of all words again.
+    '''
+    if detail is RESULT_DETAIL.FULL:
+        return get_full_result_blocks(api, language, ppi)
+
+    blocks: list[OCRResultBlock] = []
+
+    ri = api.GetIterator()
+
+    current_block = None
+    current_paragraph = None
+    current_line = None
+    font_size = 0
+
+    for result_word in tesserocr.iterate_level(ri, tesserocr.RIL.WORD):
+        if result_word.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+            current_block = OCRResultBlock()
+            current_block.language = language
+            blocks.append(current_block)
+
+        if result_word.IsAtBeginningOf(tesserocr.RIL.PARA):
+            current_paragraph = OCRResultParagraph()
+            if current_block:
+                current_block.paragraphs.append(current_paragraph)
+
+        if result_word.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+            current_line = OCRResultLine()
+            # Row attributes are the same for all words of a line
+            font_size = math.ceil(1 / ppi * result_word.RowAttributes()['row_height'] * 72)
+            if detail is RESULT_DETAIL.BASELINES:
+                set_baseline(current_line, result_word.Baseline(tesserocr.RIL.TEXTLINE))
+            if current_paragraph:
+                current_paragraph.lines.append(current_line)
+
+        if not result_word.Empty(tesserocr.RIL.WORD):
+            current_word = OCRResultWord()
+            current_word.text = result_word.GetUTF8Text(tesserocr.RIL.WORD)
+            current_word.confidence = result_word.Confidence(tesserocr.RIL.WORD)
+            current_word.set_bbox(result_word.BoundingBox(tesserocr.RIL.WORD))
+            if detail is RESULT_DETAIL.BASELINES:
+                set_baseline(current_word, result_word.Baseline(tesserocr.RIL.WORD))
+            current_word.blanks_before = result_word.BlanksBeforeWord()
+            current_word.font_size = font_size
+            if current_line:
+                current_line.words.append(current_word)
+
+    for block in blocks:
+        complete_parents(block)
+
+    return blocks
+
+
+def set_baseline(result: OCRResult, baseline) -> None:
+    # Tesseract doesn't return a baseline for elements without text
+    if baseline:
+        result.set_baseline(baseline)
+
+
+def get_full_result_blocks(api: tesserocr.PyTessBaseAPI, language: Lang, ppi: float) -> list[OCRResultBlock]:
+    '''Build result block tree with all values of parent elements computed by Tesseract'''
+    blocks: list[OCRResultBlock] = []
+
+    ri = api.GetIterator()
+
+    current_block = None
+    current_paragraph = None
+    current_line = None
+
+    # for result_word in tesserocr.iterate_level(ri, tesserocr.RIL.SYMBOL):
+    #     pass
+
+    for result_word in tesserocr.iterate_level(ri, tesserocr.RIL.WORD):
+        if result_word.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+            current_block = OCRResultBlock()
+            current_block.text = ri.GetUTF8Text(tesserocr.RIL.BLOCK)
+            current_block.confidence = ri.Confidence(tesserocr.RIL.BLOCK)
+            current_block.set_bbox(ri.BoundingBox(tesserocr.RIL.BLOCK))
+            current_block.set_baseline(ri.Baseline(tesserocr.RIL.BLOCK))
+            current_block.language = language
+            blocks.append(current_block)
+
+        if result_word.IsAtBeginningOf(tesserocr.RIL.PARA):
+            current_paragraph = OCRResultParagraph()
+            current_paragraph.text = ri.GetUTF8Text(tesserocr.RIL.PARA)
+            current_paragraph.confidence = ri.Confidence(tesserocr.RIL.PARA)
+            current_paragraph.set_bbox(ri.BoundingBox(tesserocr.RIL.PARA))
+            current_paragraph.set_baseline(ri.Baseline(tesserocr.RIL.PARA))
+            if current_block:
+                current_block.paragraphs.append(current_paragraph)
+
+        if result_word.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+            current_line = OCRResultLine()
+            current_line.text = ri.GetUTF8Text(tesserocr.RIL.TEXTLINE)
+            current_line.confidence = ri.Confidence(tesserocr.RIL.TEXTLINE)
+            current_line.set_bbox(ri.BoundingBox(tesserocr.RIL.TEXTLINE))
+            current_line.set_baseline(ri.Baseline(tesserocr.RIL.TEXTLINE))
+            if current_paragraph:
+                current_paragraph.lines.append(current_line)
+
+        if not result_word.Empty(tesserocr.RIL.WORD):
+            current_word = OCRResultWord()
+            current_word.text = result_word.GetUTF8Text(tesserocr.RIL.WORD)
+            current_word.confidence = ri.Confidence(tesserocr.RIL.WORD)
+            current_word.set_bbox(ri.BoundingBox(tesserocr.RIL.WORD))
+            current_word.set_baseline(ri.Baseline(tesserocr.RIL.WORD))
+            current_word.blanks_before = result_word.BlanksBeforeWord()
+            row_attributes = ri.RowAttributes()
+            # TODO: Not sure this is the right way, also check ascenders
+            # current_word.font_size = 1 / ppi * (row_attributes['row_height'] + row_attributes['descenders']) * 72
+            current_word.font_size = math.ceil(1 / ppi * row_attributes['row_height'] * 72)
+            if current_line:
+                current_line.words.append(current_word)
+
+    return blocks
+
+
+def layout_scale(ppi: float, layout_ppi: float) -> float:
+    '''Factor to downsample a page by for layout analysis at layout_ppi, pages are never upsampled'''
+    return downsample_scale(ppi, layout_ppi)
+
+
+def get_layout_blocks(page_it: tesserocr.PyPageIterator, offset_y: int = 0, scale: float = 1.0) -> list[OCRResultBlock]:
+    '''Convert blocks found by layout analysis into result blocks with type, tag and class set
+
+    Pass the factor the analysed image has been scaled by to get coordinates of the original image.
+    '''
+    blocks: list[OCRResultBlock] = []
+
+    for result in tesserocr.iterate_level(page_it, tesserocr.RIL.BLOCK):
+        block = OCRResultBlock(tesserocr.RIL.BLOCK)
+
+        left, top, right, bottom = (round(value / scale) for value in result.BoundingBox(tesserocr.RIL.BLOCK, padding = 5))
+
+        block.bbox_rect = QtCore.QRect(QtCore.QPoint(left, top + offset_y), QtCore.QPoint(right, bottom))
+
+        match result.BlockType():
+            case tesserocr.PT.FLOWING_TEXT | tesserocr.PT.PULLOUT_TEXT:
+                block.type = OCR_RESULT_BLOCK_TYPE.TEXT
+            case tesserocr.PT.HEADING_TEXT:
+                block.tag = 'h1'
+            case tesserocr.PT.CAPTION_TEXT:
+                block.tag = 'figcaption'
+            case tesserocr.PT.FLOWING_IMAGE | tesserocr.PT.HEADING_IMAGE | tesserocr.PT.PULLOUT_IMAGE:
+                block.type = OCR_RESULT_BLOCK_TYPE.IMAGE
+            case tesserocr.PT.HORZ_LINE:
+                block.type = OCR_RESULT_BLOCK_TYPE.H_LINE
+            case tesserocr.PT.VERT_LINE:
+                block.type = OCR_RESULT_BLOCK_TYPE.V_LINE
+            case _:
+                block.type = OCR_RESULT_BLOCK_TYPE.UNKNOWN
+
+        match result.BlockType():
+            case tesserocr.PT.FLOWING_TEXT | tesserocr.PT.FLOWING_IMAGE:
+                block.class_ = 'flowing'
+            case tesserocr.PT.HEADING_TEXT | tesserocr.PT.HEADING_IMAGE:
+                block.class_ = 'heading'
+            case tesserocr.PT.PULLOUT_TEXT | tesserocr.PT.PULLOUT_IMAGE:
+                block.class_ = 'pullout'
+
+        # TODO:
+        #  EQUATION
+        #  INLINE_EQUATION
+        #  TABLE
+        #  VERTICAL_TEXT
+        #  NOISE
+
+        blocks.append(block)
+
+    return blocks
+
+
+# Layout block types whose lines are recognized when streaming
+TEXT_BLOCK_TYPES = {
+    tesserocr.PT.FLOWING_TEXT,
+    tesserocr.PT.HEADING_TEXT,
+    tesserocr.PT.PULLOUT_TEXT,
+    tesserocr.PT.CAPTION_TEXT,
+    tesserocr.PT.VERTICAL_TEXT,
+    tesserocr.PT.TABLE,
+    tesserocr.PT.EQUATION,
+    tesserocr.PT.INLINE_EQUATION,
+}
+
+
+def get_layout_lines(page_it: tesserocr.PyPageIterator, padding: int = 2) -> list[OCRResultBlock]:
+    '''Get block, paragraph and line geometry of the text blocks found by layout analysis, lines don't contain words yet'''
+    blocks: list[OCRResultBlock] = []
+
+    current_block = None
+    current_paragraph = None
+
+    for result in tesserocr.iterate_level(page_it, tesserocr.RIL.TEXTLINE):
+        if result.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+            current_block = None
+
+            if result.BlockType() in TEXT_BLOCK_TYPES:
+                current_block = OCRResultBlock()
+                current_block.set_bbox(result.BoundingBox(tesserocr.RIL.BLOCK))
+                blocks.append(current_block)
+
+        if not current_block:
+            continue
+
+        if result.IsAtBeginningOf(tesserocr.RIL.PARA):
+            current_paragraph = OCRResultParagraph()
+            current_paragraph.set_bbox(result.BoundingBox(tesserocr.RIL.PARA))
+            current_block.paragraphs.append(current_paragraph)
+
+        bbox = result.BoundingBox(tesserocr.RIL.TEXTLINE, padding=padding)
+
+        if bbox and current_paragraph:
+            line = OCRResultLine()
+            line.set_bbox(bbox)
+            current_paragraph.lines.append(line)
+
+    return blocks
+
+
+def mean_word_confidence(lines: list[OCRResultLine]) -> float:
+    confidences = [word.confidence for line in lines for word in line.words]
+
+    return sum(confidences) / len(confidences) if confidences else 0.0
+
+
+def recognize_lines(api: tesserocr.PyTessBaseAPI, layout_blocks: list[OCRResultBlock], clip: QtCore.QRect, language: Lang, ppi: float, line_recognized=None, detail: RESULT_DETAIL = RESULT_DETAIL.BASELINES, metrics: JobMetrics | None = None) -> list[OCRResultBlock]:
+    '''Recognize the lines of a layout one by one and assemble the same block tree a single Recognize() would give
+
+    line_recognized is called with the text recognized so far after every line, so results can be shown while recognition is still running.
+    '''
+    blocks: list[OCRResultBlock] = []
+    texts: list[str] = []
+
+    api.SetPageSegMode(tesserocr.PSM.SINGLE_LINE)
+
+    for layout_block in layout_blocks:
+        block = OCRResultBlock(bbox_rect=layout_block.bbox_rect, language=language)
+
+        for layout_paragraph in layout_block.paragraphs:
+            paragraph = OCRResultParagraph(bbox_rect=layout_paragraph.bbox_rect)
+
+            for layout_line in layout_paragraph.lines:
+                rect = layout_line.bbox_rect.intersected(clip)
+
+                if rect.isEmpty():
+                    continue
+
+                api.SetRectangle(rect.left(), rect.top(), rect.width(), rect.height())
+
+                with measure(metrics, 'recognize'):
+                    recognized = api.Recognize()
+
+                if not recognized:
+                    continue
+
+                with measure(metrics, 'extract'):
+                    line_blocks = get_result_blocks(api, language, ppi, detail)
+
+                for line_block in line_blocks:
+                    for line_paragraph in line_block.paragraphs:
+                        for line in line_paragraph.lines:
+                            if line.words:
+                                paragraph.lines.append(line)
+                                texts.append(' '.join(word.text for word in line.words))
+
+                if line_recognized:
+                    line_recognized('\n'.join(texts))
+
+            if paragraph.lines:
+                paragraph.text = ''.join(line.text for line in paragraph.lines)
+                paragraph.confidence = mean_word_confidence(paragraph.lines)
+                paragraph.baseline = paragraph.lines[-1].baseline
+                block.paragraphs.append(paragraph)
+
+        if block.paragraphs:
+            block.text = '\n'.join(paragraph.text for paragraph in block.paragraphs)
+            block.confidence = mean_word_confidence([line for paragraph in block.paragraphs for line in paragraph.lines])
+            block.baseline = block.paragraphs[-1].baseline
+            blocks.append(block)
+
+    return blocks
+
+
+def read_single_word(api: tesserocr.PyTessBaseAPI) -> tuple[str, float] | None:
+    '''Recognize the image set and get text and confidence if exactly one word was found'''
+    if not api.Recognize():
+        return None
+
+    ri = api.GetIterator()
+
+    if not ri:
+        return None
+
+    words = [(result.GetUTF8Text(tesserocr.RIL.WORD), result.Confidence(tesserocr.RIL.WORD)) for result in tesserocr.iterate_level(ri, tesserocr.RIL.WORD) if not result.Empty(tesserocr.RIL.WORD)]
+
+    return words[0] if len(words) == 1 else None
+
+
+def refine_words(api: tesserocr.PyTessBaseAPI, pixels: numpy.ndarray, blocks: list[OCRResultBlock], ppi: float, options: RefineOptions, metrics: JobMetrics | None = None) -> int:
+    '''Recognize words below the options' confidence again from enlarged black and white crops and splice better readings into blocks
+
+    pixels is the raster the blocks' coordinates refer to. Every word is tried as a single word (PSM 8) and, if that finds nothing, as a single line (PSM 7).
+    Replaces image and page segmentation mode of api, returns the number of words replaced.
+    '''
+    words = weak_words(blocks, options.confidence)
+
+    if not words:
+        return 0
+
+    bounds = QtCore.QRect(0, 0, pixels.shape[1], pixels.shape[0])
+    # By id, result dataclasses compare by value
+    changed: dict[int, OCRResultBlock] = {}
+    replaced = 0
+
+    with measure(metrics, 'refine'):
+        for block, word in words:
+            rect = word_crop_rect(word, bounds, options.margin)
+
+            if rect.isEmpty():
+                continue
+
+            scale = upscale_factor(word.bbox_rect.height(), options)
+            crop = upscale_binarize(pixels[rect.top():rect.bottom() + 1, rect.left():rect.right() + 1], scale)
+
+            api.SetImageBytes(crop.tobytes(), crop.shape[1], crop.shape[0], 1, crop.shape[1])
+            api.SetSourceResolution(int(ppi * scale))
+
+            reading = None
+
+            for psm in (tesserocr.PSM.SINGLE_WORD, tesserocr.PSM.SINGLE_LINE):
+                api.SetPageSegMode(psm)
+
+                if (reading := read_single_word(api)):
+                    break
+
+            if reading and splice_word(word, *reading):
+                changed[id(block)] = block
+                replaced += 1
+
+        for block in changed.values():
+            update_texts(block)
+
+    return replaced
@@ -0,0 +1,106 @@
+import numpy
+from PySide6 import QtCore, QtGui
+
+from ocr_engine.image_buffer import TESSERACT_FORMAT, qimage_to_numpy
+from ocr_engine.ocr_results import OCRResultBlock
+
+# Pixels looked at per word, larger words are sampled with a stride
+MAX_WORD_SAMPLES = 2048
+
+
+def otsu_threshold(luminance: numpy.ndarray) -> int:
+    '''Threshold separating the two classes of a luminance histogram with the largest between-class variance'''
+    histogram = numpy.bincount(luminance, minlength=256).astype(numpy.float64)
+    levels = numpy.arange(256)
+
+    weight_low = numpy.cumsum(histogram)
+    weight_high = weight_low[-1] - weight_low
+    sum_low = numpy.cumsum(histogram * levels)
+    sum_high = sum_low[-1] - sum_low
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        variance = weight_low * weight_high * (sum_low / weight_low - sum_high / weight_high) ** 2
+
+    return int(numpy.argmax(numpy.nan_to_num(variance)))
+
+
+def ink_pixels(pixels: numpy.ndarray, max_samples: int = MAX_WORD_SAMPLES) -> numpy.ndarray:
+    '''Get RGB values of the pixels forming the glyphs within a word's (height, width, 3) pixels
+
+    Glyphs cover less of a word's bounding box than the background, so the smaller side of the threshold is ink,
+    which also works for light text on dark background. Only the half of the ink farthest from the threshold is kept,
+    anti-aliased glyph edges are mixed with the background colour.
+    '''
+    samples = pixels.reshape(-1, pixels.shape[-1])[:, :3]
+
+    if len(samples) > max_samples:
+        samples = samples[::len(samples) // max_samples + 1]
+
+    if len(samples) == 0:
+        return samples
+
+    # Integer approximation of Rec. 601 luma
+    channels = samples.astype(numpy.uint32)
+    luminance = (channels[:, 0] * 299 + channels[:, 1] * 587 + channels[:, 2] * 114) // 1000
+    threshold = otsu_threshold(luminance)
+
+    dark = luminance <= threshold
+    ink_is_dark = numpy.count_nonzero(dark) <= len(samples) // 2
+    ink = dark if ink_is_dark else ~dark
+
+    if not ink.any() or ink.all():
+        return samples[:0]
+
+    # Keep the core of the strokes
+    distance = numpy.abs(luminance[ink].astype(numpy.int32) - threshold)
+
+    return samples[ink][distance >= numpy.median(distance)]
+
+
+def median_color(samples: numpy.ndarray) -> QtGui.QColor:
+    if len(samples) == 0:
+        return QtGui.QColor()
+
+    r, g, b = numpy.median(samples, axis=0)
+
+    return QtGui.QColor(int(r), int(g), int(b))
+
+
+def estimate_text_color(image: QtGui.QImage) -> QtGui.QColor:
+    '''Estimate foreground colour of text in image, invalid if there is no text to be found'''
+    if image.format() != TESSERACT_FORMAT:
+        image = image.convertToFormat(TESSERACT_FORMAT)
+
+    return median_color(ink_pixels(qimage_to_numpy(image)))
+
+
+def estimate_block_colors(blocks: list[OCRResultBlock], image: QtGui.QImage, offset: QtCore.QPoint = QtCore.QPoint()) -> None:
+    '''Set foreground colours of all words and blocks from the pixels under the words
+
+    offset is the position of image within the page, word coordinates are page coordinates.
+    '''
+    if image.format() != TESSERACT_FORMAT:
+        image = image.convertToFormat(TESSERACT_FORMAT)
+
+    estimate_block_colors_rgb(blocks, qimage_to_numpy(image), offset)
+
+
+def estimate_block_colors_rgb(blocks: list[OCRResultBlock], pixels: numpy.ndarray, offset: QtCore.QPoint = QtCore.QPoint()) -> None:
+    '''Same as estimate_block_colors for (height, width, 3) RGB pixels, like those of PIL images in worker processes'''
+    image_rect = QtCore.QRect(0, 0, pixels.shape[1], pixels.shape[0])
+
+    for block in blocks:
+        block_samples: list[numpy.ndarray] = []
+
+        for word in block.get_words():
+            rect = word.bbox_rect.translated(-offset).intersected(image_rect)
+
+            if rect.isEmpty():
+                continue
+
+            samples = ink_pixels(pixels[rect.top():rect.bottom() + 1, rect.left():rect.right() + 1])
+            word.foreground_color = median_color(samples)
+            block_samples.append(samples)
+
+        if block_samples:
+            block.foreground_color = median_color(numpy.concatenate(block_samples))
@@ -0,0 +1,90 @@
+from dataclasses import dataclass
+
+from PySide6 import QtCore
+
+from ocr_engine.ocr_results import OCRResultBlock, OCRResultWord, word_confidence
+
+# Recognizing the weak words again is Tesseract specific, see refine_words in tesserocr_results
+
+
+@dataclass(frozen=True)
+class RefineOptions():
+    '''Second recognition pass over single words Tesseract wasn't sure about, cheaper than recognizing whole boxes with heavier settings'''
+    # Words below this confidence are recognized again, 0 disables the second pass
+    confidence: float = 0.0
+    # Context around the word in pixels
+    margin: int = 4
+    # Words are enlarged to about this height in pixels, but never by more than max_scale
+    target_height: int = 48
+    max_scale: float = 4.0
+
+    def enabled(self) -> bool:
+        return self.confidence > 0
+
+    def cache_suffix(self) -> str:
+        '''Part of result cache keys, results with a second pass differ from those without'''
+        return f'-refine{self.confidence:g}' if self.enabled() else ''
+
+
+def load_refine_options(settings: QtCore.QSettings) -> RefineOptions:
+    return RefineOptions(confidence=float(settings.value('refine_confidence', 0) or 0))
+
+
+def save_refine_options(settings: QtCore.QSettings, options: RefineOptions) -> None:
+    settings.setValue('refine_confidence', options.confidence)
+
+
+def weak_words(blocks: list[OCRResultBlock], confidence: float) -> list[tuple[OCRResultBlock, OCRResultWord]]:
+    '''Words below confidence with the block they belong to'''
+    return [(block, word) for block in blocks for word in block.get_words() if word.confidence < confidence and not word.bbox_rect.isEmpty()]
+
+
+def word_crop_rect(word: OCRResultWord, bounds: QtCore.QRect, margin: int) -> QtCore.QRect:
+    '''Region of a word with some context around it, within bounds'''
+    return word.bbox_rect.adjusted(-margin, -margin, margin, margin).intersected(bounds)
+
+
+def upscale_factor(height: int, options: RefineOptions) -> float:
+    '''Factor to enlarge a word of height pixels by, words are never shrunk'''
+    return min(max(options.target_height / max(height, 1), 1.0), options.max_scale)
+
+
+def splice_word(word: OCRResultWord, text: str, confidence: float) -> bool:
+    '''Replace text and confidence of word by a new reading if it is more confident, geometry stays
+
+    Readings with spaces are rejected, they would have to be split into several words.
+    '''
+    text = text.strip()
+
+    if not text or ' ' in text or confidence <= word.confidence:
+        return False
+
+    word.text = text
+    word.confidence = confidence
+
+    return True
+
+
+def update_texts(block: OCRResultBlock) -> None:
+    '''Reassemble text and confidence of lines, paragraphs and the block after words changed, like complete_parents but keeping geometry'''
+    for paragraph in block.paragraphs:
+        for line in paragraph.lines:
+            if line.words:
+                line.text = ''.join(word.blanks_before * ' ' + word.text for word in line.words).lstrip() + '\n'
+                line.confidence = word_confidence(line.words)
+
+        paragraph_words = [word for line in paragraph.lines for word in line.words]
+
+        if paragraph.lines:
+            paragraph.text = ''.join(line.text for line in paragraph.lines)
+
+        if paragraph_words:
+            paragraph.confidence = word_confidence(paragraph_words)
+
+    if block.paragraphs:
+        block.text = '\n'.join(paragraph.text for paragraph in block.paragraphs)
+
+    words = block.get_words()
+
+    if words:
+        block.confidence = word_confidence(words)
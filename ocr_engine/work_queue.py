@@ -0,0 +1,280 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from multiprocessing.connection import Client, Connection, Listener
+from pathlib import Path
+
+# Kept free of Tesseract imports like concurrency, the coordinator only hands out jobs and collects results
+
+# Messages are tuples starting with one of these, the rest depends on the message:
+# worker -> coordinator: (GET, worker_name), (RESULT, job_id, result), (FAILED, job_id, error)
+# coordinator -> worker: (JOB, job_id, job, image_data), (WAIT, seconds), (DONE,), (ACK,)
+GET = 'get'
+RESULT = 'result'
+FAILED = 'failed'
+JOB = 'job'
+WAIT = 'wait'
+DONE = 'done'
+ACK = 'ack'
+
+
+@dataclass
+class WorkItem():
+    job_id: int
+    # PageJob, anything picklable with an image_path works
+    job: object
+    attempts: int = 0
+    # Worker holding the job and when its lease runs out
+    worker: str = ''
+    deadline: float = 0.0
+
+
+class WorkQueue():
+    '''Jobs waiting, handed out to workers and finished, used by the coordinator's connection threads
+
+    Jobs of workers that fail, disconnect or exceed the lease timeout go back into the queue until they have been tried max_attempts times.
+    Only the first result of a job counts, results of jobs that have been handed out again meanwhile are dropped, so merging them is idempotent.
+    '''
+
+    def __init__(self, jobs: list, max_attempts: int = 3, lease_timeout: float = 600.0) -> None:
+        self.max_attempts = max_attempts
+        self.lease_timeout = lease_timeout
+
+        self.items = {job_id: WorkItem(job_id, job) for job_id, job in enumerate(jobs)}
+        self.waiting: deque[int] = deque(self.items)
+        self.leased: dict[int, WorkItem] = {}
+        self.results: dict[int, object] = {}
+        self.errors: dict[int, str] = {}
+
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+    def lease(self, worker: str) -> WorkItem | None:
+        '''Hand the next job to worker, None if there is nothing to do right now'''
+        with self.lock:
+            self.requeue_expired()
+
+            if not self.waiting:
+                return None
+
+            item = self.items[self.waiting.popleft()]
+            item.attempts += 1
+            item.worker = worker
+            item.deadline = time.monotonic() + self.lease_timeout
+            self.leased[item.job_id] = item
+
+            return item
+
+    def complete(self, job_id: int, worker: str, result: object) -> bool:
+        '''Store the result of a job, False if it has already been finished by someone else'''
+        with self.lock:
+            if job_id in self.results or job_id in self.errors:
+                return False
+
+            self.results[job_id] = result
+            self.leased.pop(job_id, None)
+
+            # Another worker may have it or it may be waiting again after a lease timeout
+            if job_id in self.waiting:
+                self.waiting.remove(job_id)
+
+            self.changed.notify_all()
+
+            return True
+
+    def fail(self, job_id: int, worker: str, error: str) -> None:
+        with self.lock:
+            item = self.leased.get(job_id)
+
+            if item and item.worker == worker:
+                self.retry(item, error)
+
+    def release_worker(self, worker: str) -> None:
+        '''Put the jobs of a disconnected worker back'''
+        with self.lock:
+            for item in [item for item in self.leased.values() if item.worker == worker]:
+                self.retry(item, f'Worker {worker} disconnected')
+
+    def requeue_expired(self) -> None:
+        '''Call with the lock held'''
+        now = time.monotonic()
+
+        for item in [item for item in self.leased.values() if item.deadline < now]:
+            self.retry(item, f'Worker {item.worker} timed out')
+
+    def retry(self, item: WorkItem, error: str) -> None:
+        '''Call with the lock held'''
+        del self.leased[item.job_id]
+        item.worker = ''
+
+        if item.attempts < self.max_attempts:
+            self.waiting.append(item.job_id)
+        else:
+            self.errors[item.job_id] = error
+
+        self.changed.notify_all()
+
+    def finished(self) -> bool:
+        with self.lock:
+            return len(self.results) + len(self.errors) == len(self.items)
+
+    def wait(self, timeout: float) -> None:
+        '''Wait for a job to finish or fail'''
+        with self.lock:
+            self.changed.wait(timeout)
+
+
+class Coordinator():
+    '''Hands out the jobs of a work queue to workers connecting over TCP and collects their results
+
+    Page images are sent along with the jobs, workers don't need access to the coordinator's files.
+    '''
+
+    def __init__(self, work_queue: WorkQueue, address: tuple[str, int], authkey: bytes, progress=None) -> None:
+        self.work_queue = work_queue
+        self.listener = Listener(address, authkey=authkey)
+        # Called with job id, result (None if failed) and error
+        self.progress = progress
+        self.worker_count = 0
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self.listener.address
+
+    def run(self) -> None:
+        '''Serve workers until all jobs are finished'''
+        threading.Thread(target=self.accept, daemon=True).start()
+
+        while not self.work_queue.finished():
+            self.work_queue.wait(1.0)
+
+            # Leases of workers that hang without disconnecting run out even when no other worker asks for a job
+            with self.work_queue.lock:
+                self.work_queue.requeue_expired()
+
+        self.listener.close()
+
+    def accept(self) -> None:
+        while True:
+            try:
+                connection = self.listener.accept()
+            except OSError:
+                # Listener closed
+                return
+            except Exception:
+                # Failed authentication, keep serving the others
+                continue
+
+            self.worker_count += 1
+            worker = f'worker {self.worker_count}'
+            threading.Thread(target=self.serve_worker, args=(connection, worker), daemon=True).start()
+
+    def serve_worker(self, connection: Connection, worker: str) -> None:
+        try:
+            while True:
+                message = connection.recv()
+
+                if message[0] == GET:
+                    item = self.work_queue.lease(worker)
+
+                    if item:
+                        connection.send((JOB, item.job_id, item.job, Path(item.job.image_path).read_bytes()))
+                    elif self.work_queue.finished():
+                        connection.send((DONE,))
+                        return
+                    else:
+                        # Everything is handed out, but other workers may still fail
+                        connection.send((WAIT, 1.0))
+                elif message[0] == RESULT:
+                    _, job_id, result = message
+
+                    if self.work_queue.complete(job_id, worker, result) and self.progress:
+                        self.progress(job_id, result, '')
+
+                    connection.send((ACK,))
+                elif message[0] == FAILED:
+                    _, job_id, error = message
+                    self.work_queue.fail(job_id, worker, error)
+
+                    if job_id in self.work_queue.errors and self.progress:
+                        self.progress(job_id, None, error)
+
+                    connection.send((ACK,))
+        except (EOFError, OSError):
+            pass
+        finally:
+            connection.close()
+            self.work_queue.release_worker(worker)
+
+
+def connect(address: tuple[str, int], authkey: bytes, timeout: float) -> Connection:
+    '''Workers may be started before the coordinator, keep trying for a while'''
+    deadline = time.monotonic() + timeout
+
+    while True:
+        try:
+            return Client(address, authkey=authkey)
+        except ConnectionRefusedError:
+            if time.monotonic() > deadline:
+                raise
+
+            time.sleep(1.0)
+
+
+def run_worker(address: tuple[str, int], authkey: bytes, cache_dir: str = '', process=None, connect_timeout: float = 60.0) -> int:
+    '''Pull jobs from a coordinator until it is done, returns the number of jobs processed
+
+    process runs a job and defaults to process_page, the page image is stored in a temporary file for it.
+    '''
+    if process is None:
+        from ocr_engine.ocr_process_worker import init_worker, process_page
+
+        # Room for the APIs of a fast and a best model tier
+        init_worker(2)
+        process = process_page
+
+    connection = connect(address, authkey, connect_timeout)
+    worker_name = socket.gethostname()
+    processed = 0
+
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            while True:
+                connection.send((GET, worker_name))
+                message = connection.recv()
+
+                if message[0] == DONE:
+                    break
+                elif message[0] == WAIT:
+                    time.sleep(message[1])
+                    continue
+
+                _, job_id, job, image_data = message
+
+                image_path = os.path.join(directory, f'{job_id}{Path(job.image_path).suffix}')
+
+                with open(image_path, 'wb') as file:
+                    file.write(image_data)
+
+                try:
+                    result = process(replace(job, image_path=image_path, cache_dir=cache_dir))
+                except Exception as e:
+                    connection.send((FAILED, job_id, f'{type(e).__name__}: {e}'))
+                else:
+                    connection.send((RESULT, job_id, result))
+                    processed += 1
+                finally:
+                    os.remove(image_path)
+
+                connection.recv()
+        except (EOFError, ConnectionError):
+            # Coordinator finished or died and closed the connection, sending fails with BrokenPipeError then
+            pass
+        finally:
+            connection.close()
+
+    return processed
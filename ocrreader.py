@@ -4,3 +4,11 @@ from PySide6 import QtWidgets
 class ocrreader(QtWidgets.QApplication):
     def __init__(self, argv) -> None:
         super().__init__(argv)
+
+
+if __name__ == '__main__':
+    import sys
+
+    from batch import main
+
+    sys.exit(main(sys.argv[1:]))
@@ -6,6 +6,8 @@ from papersize import SIZES, parse_length
 from PySide6 import QtCore, QtGui
 
 from box_editor.box_data import BoxData
+from ocr_engine.deskew import straighten_image
+from ocr_engine.ocr_job_scheduler import new_uid
 
 
 @dataclass
@@ -15,6 +17,11 @@ class Page():
     #self.blocks = []
     box_datas: list[BoxData] = field(default_factory=list)
     paper_size: str = ''
+    # Straightening applied to the image everywhere: clockwise rotation in multiples of 90 degrees, then skew in degrees
+    rotation: int = 0
+    skew: float = 0.0
+    # Identifies the page while the project is open, not saved
+    uid: int = field(default_factory=new_uid, compare=False)
 
     def __post_init__(self):
         self.set_paper_size(self.paper_size)
@@ -30,31 +37,53 @@ class Page():
     def calc_density(self, paper_size: str) -> float:
         # TODO: Let's assume 1:1 pixel ratio for now, so ignore width
         height_in = int(parse_length(paper_size.split(' x ')[1], 'in'))
+        size = QtGui.QImage(self.image_path).size()
 
-        return QtGui.QImage(self.image_path).size().height() / height_in
+        # Rotating by 90 degrees swaps width and height
+        return (size.width() if self.rotation % 180 else size.height()) / height_in
+
+    def set_straightening(self, rotation: int, skew: float) -> None:
+        self.rotation = rotation
+        self.skew = skew
+
+        # The page height may have changed
+        self.set_paper_size(self.paper_size)
+
+    def load_image(self) -> QtGui.QPixmap:
+        '''Get the straightened page raster all box coordinates refer to'''
+        if not self.rotation and not self.skew:
+            return QtGui.QPixmap(self.image_path)
+
+        return QtGui.QPixmap.fromImage(straighten_image(QtGui.QImage(self.image_path), self.rotation, self.skew))
 
     def write(self, file: QtCore.QDataStream):
         file.writeString(self.image_path)
         file.writeString(self.name)
         file.writeString(self.paper_size)
         file.writeFloat(self.ppi)
+        file.writeInt16(self.rotation)
+        file.writeFloat(self.skew)
 
         file.writeInt16(len(self.box_datas))
 
         for box_datas in self.box_datas:
             box_datas.write(file)
 
-    def read(self, file: QtCore.QDataStream):
+    def read(self, file: QtCore.QDataStream, format_revision: int = 11):
         self.image_path = file.readString()
         self.name = file.readString()
         self.paper_size = file.readString()
         self.ppi = file.readFloat()
 
+        if format_revision >= 10:
+            self.rotation = file.readInt16()
+            self.skew = file.readFloat()
+
         box_datas_count = file.readInt16()
 
         for b in range(box_datas_count):
             box_data = BoxData()
-            box_data.read(file)
+            box_data.read(file, format_revision)
             self.box_datas.append(box_data)
 
     def clear(self):
@@ -71,9 +100,13 @@ class Project():
     header_y: float = 0.0
     footer_y: float = 0.0
     remove_hyphens = False
+    # Resolution to analyse layout at, 0 uses the full page resolution
+    layout_ppi: float = 0.0
+    # Resolution oversized pages are downsampled to for recognition, 0 uses the full page resolution
+    ocr_ppi: float = 0.0
 
     # Save format revision for loading
-    format_revision = 7
+    format_revision = 11
 
     # def add_page(self, image_path: str, paper_size: str = SIZES['a4']) -> None:
     #     self.pages.append(Page(image_path, ntpath.basename(image_path), paper_size))
@@ -93,6 +126,8 @@ class Project():
         file.writeFloat(self.header_y)
         file.writeFloat(self.footer_y)
         file.writeBool(self.remove_hyphens)
+        file.writeFloat(self.layout_ppi)
+        file.writeFloat(self.ocr_ppi)
 
         file.writeInt16(len(self.pages))
         for page in self.pages:
@@ -101,7 +136,8 @@ class Project():
     def read(self, file: QtCore.QDataStream):
         format_revision = file.readInt16()
 
-        if format_revision != self.format_revision:
+        # Revision 7 lacks the layout resolution, 7 and 8 lack text colours, 7 to 9 page straightening, 7 to 10 the OCR resolution
+        if format_revision not in (7, 8, 9, 10, self.format_revision):
             raise ValueError(f'Revision of project file is {format_revision} is incompatible with {self.format_revision}. Project file cannot be loaded')
 
         self.name = file.readString()
@@ -112,8 +148,14 @@ class Project():
         self.footer_y = file.readFloat()
         self.remove_hyphens = file.readBool()
 
+        if format_revision >= 8:
+            self.layout_ppi = file.readFloat()
+
+        if format_revision >= 11:
+            self.ocr_ppi = file.readFloat()
+
         page_count = file.readInt16()
         for p in range(page_count):
             page = Page()
-            page.read(file)
+            page.read(file, format_revision)
             self.add_page(page)
@@ -1,7 +1,6 @@
 import re
 from string import punctuation
 
-import enchant  # type: ignore
 from iso639 import Lang
 from papersize import SIZES
 from PySide6 import QtCore, QtGui, QtWidgets
@@ -80,6 +79,54 @@ class ProjectPage(QtWidgets.QWidget):
 
         layout.addWidget(self.remove_hyphens_checkbox, 3, 1)
 
+        layout.addWidget(
+            QtWidgets.QLabel(
+                QtCore.QCoreApplication.translate(
+                    "layout_resolution", "Layout resolution"
+                )
+            ),
+            4,
+            0,
+        )
+
+        self.layout_ppi_combo = QtWidgets.QComboBox(self)
+        self.layout_ppi_combo.addItem(
+            QtCore.QCoreApplication.translate("layout_resolution_full", "Full"), 0.0
+        )
+
+        for layout_ppi in (300.0, 200.0, 150.0, 100.0):
+            self.layout_ppi_combo.addItem(f"{layout_ppi:.0f} ppi", layout_ppi)
+
+        self.layout_ppi_combo.setCurrentIndex(
+            max(self.layout_ppi_combo.findData(self.project.layout_ppi), 0)
+        )
+        self.layout_ppi_combo.currentIndexChanged.connect(self.layout_ppi_changed)
+
+        layout.addWidget(self.layout_ppi_combo, 4, 1)
+
+        layout.addWidget(
+            QtWidgets.QLabel(
+                QtCore.QCoreApplication.translate("ocr_resolution", "OCR resolution")
+            ),
+            5,
+            0,
+        )
+
+        self.ocr_ppi_combo = QtWidgets.QComboBox(self)
+        self.ocr_ppi_combo.addItem(
+            QtCore.QCoreApplication.translate("ocr_resolution_full", "Full"), 0.0
+        )
+
+        for ocr_ppi in (400.0, 300.0):
+            self.ocr_ppi_combo.addItem(f"{ocr_ppi:.0f} ppi", ocr_ppi)
+
+        self.ocr_ppi_combo.setCurrentIndex(
+            max(self.ocr_ppi_combo.findData(self.project.ocr_ppi), 0)
+        )
+        self.ocr_ppi_combo.currentIndexChanged.connect(self.ocr_ppi_changed)
+
+        layout.addWidget(self.ocr_ppi_combo, 5, 1)
+
     def name_changed(self):
         self.project.name = self.name_edit.text()
 
@@ -96,6 +143,12 @@ class ProjectPage(QtWidgets.QWidget):
     def remove_hyphens_changed(self, state: int):
         self.project.remove_hyphens = state != 0
 
+    def layout_ppi_changed(self, layout_ppi_index: int):
+        self.project.layout_ppi = self.layout_ppi_combo.itemData(layout_ppi_index)
+
+    def ocr_ppi_changed(self, ocr_ppi_index: int):
+        self.project.ocr_ppi = self.ocr_ppi_combo.itemData(ocr_ppi_index)
+
 
 class PagePage(QtWidgets.QWidget):
     def __init__(self, parent, project: Project) -> None:
@@ -229,7 +282,7 @@ class PropertyEditor(QtWidgets.QToolBox):
 
         self.project = project
 
-        languages = engine_manager.get_current_engine().languages
+        languages = engine_manager.get_languages()
 
         # Project
         self.project_widget = ProjectPage(self, self.project)
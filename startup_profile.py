@@ -0,0 +1,62 @@
+import builtins
+import time
+from collections import defaultdict
+
+
+class ImportProfiler():
+    '''Measure the time imports take by top level package, excluding the time spent importing other packages from within them'''
+
+    def __init__(self) -> None:
+        self.original_import = builtins.__import__
+        self.start = time.perf_counter()
+        # Own time of each top level package in seconds
+        self.times: dict[str, float] = defaultdict(float)
+        # [package, start, time spent in nested imports of other packages] of imports in progress
+        self.stack: list[list] = []
+        self.phases: list[tuple[str, float]] = []
+
+    def install(self) -> None:
+        builtins.__import__ = self.profiled_import
+
+    def uninstall(self) -> None:
+        builtins.__import__ = self.original_import
+
+    def profiled_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        package = name.partition('.')[0]
+
+        # Relative imports and imports within the same package count towards the package importing them
+        if level or (self.stack and self.stack[-1][0] == package):
+            return self.original_import(name, globals, locals, fromlist, level)
+
+        frame = [package, time.perf_counter(), 0.0]
+        self.stack.append(frame)
+
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            self.stack.pop()
+            elapsed = time.perf_counter() - frame[1]
+            self.times[package] += elapsed - frame[2]
+
+            if self.stack:
+                self.stack[-1][2] += elapsed
+
+    def mark(self, phase: str) -> None:
+        '''Note the end of a startup phase'''
+        self.phases.append((phase, time.perf_counter()))
+
+    def report(self, limit: int = 20) -> str:
+        lines = ['Startup phases:']
+        previous = self.start
+
+        for phase, end in self.phases:
+            lines.append(f'  {phase:<30}{(end - previous) * 1000:8.0f} ms')
+            previous = end
+
+        lines.append(f'  {"Total":<30}{(previous - self.start) * 1000:8.0f} ms')
+        lines.append(f'Imports by package (without nested packages), {sum(self.times.values()) * 1000:.0f} ms in total:')
+
+        for package, seconds in sorted(self.times.items(), key=lambda item: item[1], reverse=True)[:limit]:
+            lines.append(f'  {package:<30}{seconds * 1000:8.0f} ms')
+
+        return '\n'.join(lines)
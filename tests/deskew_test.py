@@ -0,0 +1,30 @@
+import unittest
+
+import cv2
+import numpy
+
+from ocr_engine.deskew import estimate_skew
+
+
+def create_page(angle: float) -> numpy.ndarray:
+    '''Gray page with lines of "words" rotated counter-clockwise by angle degrees'''
+    gray = numpy.full((600, 800), 255, dtype=numpy.uint8)
+
+    for top in range(60, 540, 30):
+        for left in range(80, 700, 70):
+            gray[top:top + 12, left:left + 55] = 0
+
+    matrix = cv2.getRotationMatrix2D((400, 300), angle, 1.0)
+
+    return cv2.warpAffine(gray, matrix, (800, 600), borderValue=255)
+
+
+class DeskewTest(unittest.TestCase):
+    def test_estimate_skew(self):
+        for angle in (-3.0, -0.4, 0.0, 1.25, 4.0):
+            # Rotating clockwise by the estimate undoes the counter-clockwise rotation
+            self.assertAlmostEqual(estimate_skew(create_page(angle)), angle, delta=0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
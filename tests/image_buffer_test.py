@@ -0,0 +1,29 @@
+import unittest
+
+from PySide6 import QtGui
+
+from ocr_engine.image_buffer import TESSERACT_BYTES_PER_PIXEL, qimage_to_tesseract_bytes
+
+
+class TesseractBytesTest(unittest.TestCase):
+    def test_gray_by_format(self):
+        gray = QtGui.QImage(10, 10, QtGui.QImage.Format.Format_Grayscale8)
+        gray.fill(128)
+        self.assertEqual(qimage_to_tesseract_bytes(gray)[3], 1)
+
+        # Gray content of 32 bit images isn't looked for
+        rgb = gray.convertToFormat(QtGui.QImage.Format.Format_RGB32)
+        self.assertEqual(qimage_to_tesseract_bytes(rgb)[3], TESSERACT_BYTES_PER_PIXEL)
+
+    def test_gray_colour_table(self):
+        indexed = QtGui.QImage(10, 10, QtGui.QImage.Format.Format_Indexed8)
+        indexed.setColorTable([QtGui.qRgb(i, i, i) for i in range(256)])
+        indexed.fill(0)
+        self.assertEqual(qimage_to_tesseract_bytes(indexed)[3], 1)
+
+        indexed.setColorTable([QtGui.qRgb(i, 0, 0) for i in range(256)])
+        self.assertEqual(qimage_to_tesseract_bytes(indexed)[3], TESSERACT_BYTES_PER_PIXEL)
+
+
+if __name__ == '__main__':
+    unittest.main()
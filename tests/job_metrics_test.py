@@ -0,0 +1,48 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from ocr_engine.job_metrics import JobMetrics, JobMetricsRecorder, measure
+
+
+class JobMetricsTest(unittest.TestCase):
+    def test_measure_adds_up(self):
+        metrics = JobMetrics(1, 2, 'English')
+
+        for i in range(2):
+            with measure(metrics, 'recognize'):
+                time.sleep(0.01)
+
+        self.assertGreaterEqual(metrics.stages['recognize'], 0.02)
+
+        # Without metrics nothing is recorded
+        with measure(None, 'recognize'):
+            pass
+
+    def test_dump_json_lines(self):
+        recorder = JobMetricsRecorder(max_records=2)
+
+        for box_uid in range(3):
+            metrics = JobMetrics(1, box_uid, 'German', pixels=100, words=3)
+            metrics.stages['queued'] = 0.5
+            metrics.started = time.perf_counter()
+            recorder.add(metrics)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'jobs.jsonl')
+            recorder.dump(path)
+
+            with open(path, encoding='utf-8') as file:
+                lines = [json.loads(line) for line in file]
+
+        # Only the most recent jobs are kept
+        self.assertEqual([line['box_uid'] for line in lines], [1, 2])
+        self.assertEqual(lines[0]['stages'], {'queued': 0.5})
+        self.assertEqual(lines[0]['language'], 'German')
+        self.assertNotIn('started', lines[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+import cv2
+import numpy
+from PySide6 import QtCore
+
+from ocr_engine.line_segmentation import find_line_rects
+
+
+def find_lines_dilation(ink: numpy.ndarray) -> list[QtCore.QRect]:
+    '''Previous implementation of OCREngine.find_lines, kept as reference'''
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1000, 1))
+    dilate = cv2.dilate(ink.astype(numpy.uint8) * 255, kernel, iterations=2)
+
+    cnts = cv2.findContours(dilate, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    cnts = cnts[0] if len(cnts) == 2 else cnts[1]
+
+    return [QtCore.QRect(*cv2.boundingRect(c)) for c in reversed(cnts)]
+
+
+def create_page(width: int, height: int, lines: list[tuple[int, int, int, int]]) -> numpy.ndarray:
+    '''Ink mask with a block of "words" for each line given as (left, top, right, bottom)'''
+    ink = numpy.zeros((height, width), dtype=bool)
+
+    for left, top, right, bottom in lines:
+        for x in range(left, right, 60):
+            ink[top:bottom, x:min(x + 45, right)] = True
+
+    return ink
+
+
+class LineSegmentationTest(unittest.TestCase):
+    def test_matches_dilation(self):
+        for width, lines in ((800, [(20, 10, 700, 40), (40, 60, 500, 85), (20, 100, 790, 140)]),
+                             (3000, [(200, 10, 1200, 40), (1500, 60, 2800, 90), (2500, 120, 2600, 150)])):
+            ink = create_page(width, 200, lines)
+
+            self.assertEqual(find_line_rects(ink), sorted(find_lines_dilation(ink), key=lambda rect: rect.top()))
+
+    def test_skew(self):
+        ink = create_page(800, 200, [(20, 10, 700, 40), (20, 50, 700, 80)])
+        # Slanted stroke connecting both lines, as neighbouring lines of a skewed page do
+        for x in range(300):
+            ink[30 + x // 10, 200 + x] = True
+
+        self.assertEqual(len(find_line_rects(ink)), 1)
+
+        rects = find_line_rects(ink, 0.1)
+
+        self.assertEqual(len(rects), 2)
+        self.assertEqual((rects[0].top(), rects[0].bottom()), (10, 44))
+        self.assertEqual((rects[1].top(), rects[1].bottom()), (45, 79))
+
+    def test_empty(self):
+        self.assertEqual(find_line_rects(numpy.zeros((100, 100), dtype=bool)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+
+from ocr_engine.job_metrics import JobMetrics
+from ocr_engine.model_tiers import (ModelTier, TierPolicy, dictionary_rate,
+                                    needs_escalation, recognize_tiered)
+from ocr_engine.ocr_results import (OCRResultBlock, OCRResultLine,
+                                    OCRResultParagraph, OCRResultWord)
+
+POLICY = TierPolicy((ModelTier('fast', '/tessdata_fast'), ModelTier('best', '/tessdata_best')), min_confidence=80.0)
+
+
+def make_blocks(*words: tuple[str, float]) -> list[OCRResultBlock]:
+    line = OCRResultLine(words=[OCRResultWord(text=text, confidence=confidence) for text, confidence in words])
+
+    return [OCRResultBlock(paragraphs=[OCRResultParagraph(lines=[line])])]
+
+
+class ModelTiersTest(unittest.TestCase):
+    def test_needs_escalation(self):
+        self.assertFalse(needs_escalation(make_blocks(('clean', 95.0), ('text', 90.0)), POLICY))
+        self.assertTrue(needs_escalation(make_blocks(('w3ak', 40.0), ('text', 90.0)), POLICY))
+        # Nothing to improve on images and empty boxes
+        self.assertFalse(needs_escalation([], POLICY))
+
+    def test_dictionary_rate(self):
+        words = make_blocks(('Hello,', 95.0), ('wrld', 95.0), ('1984', 95.0))[0].get_words()
+        known = {'Hello'}
+
+        # Numbers are ignored, punctuation stripped
+        self.assertEqual(dictionary_rate(words, known.__contains__), 50.0)
+
+        policy = TierPolicy(POLICY.tiers, min_confidence=80.0, min_dictionary_rate=75.0)
+        self.assertTrue(needs_escalation(make_blocks(('Hello,', 95.0), ('wrld', 95.0)), policy, known.__contains__))
+        # Without a dictionary only confidence counts
+        self.assertFalse(needs_escalation(make_blocks(('Hello,', 95.0), ('wrld', 95.0)), policy, None))
+
+    def test_escalate_only_weak_results(self):
+        tried = []
+
+        def recognize(tier: ModelTier) -> list[OCRResultBlock]:
+            tried.append(tier.name)
+            return make_blocks(('text', 95.0))
+
+        metrics = JobMetrics(1, 2, 'English')
+        recognize_tiered(POLICY, recognize, metrics=metrics)
+
+        self.assertEqual(tried, ['fast'])
+        self.assertEqual(metrics.tier, 'fast')
+        self.assertEqual(list(metrics.tiers), ['fast'])
+
+    def test_keep_most_confident_result(self):
+        results = {'fast': make_blocks(('w3ak', 50.0)), 'best': make_blocks(('weak', 45.0))}
+        metrics = JobMetrics(1, 2, 'English')
+
+        blocks = recognize_tiered(POLICY, lambda tier: results[tier.name], metrics=metrics)
+
+        self.assertIs(blocks, results['fast'])
+        self.assertEqual(metrics.tier, 'fast')
+        self.assertEqual(list(metrics.tiers), ['fast', 'best'])
+
+    def test_skip_missing_models(self):
+        def recognize(tier: ModelTier) -> list[OCRResultBlock]:
+            if tier.name == 'fast':
+                raise RuntimeError('Failed to init API, possibly an invalid tessdata path')
+
+            return make_blocks(('text', 90.0))
+
+        self.assertEqual(recognize_tiered(POLICY, recognize)[0].get_words()[0].text, 'text')
+
+        # Without tiers errors aren't hidden
+        with self.assertRaises(RuntimeError):
+            recognize_tiered(TierPolicy(), lambda tier: recognize(ModelTier('fast')))
+
+    def test_cache_suffix(self):
+        self.assertEqual(TierPolicy().cache_suffix(), '')
+        self.assertNotEqual(POLICY.cache_suffix(), TierPolicy(POLICY.tiers, min_confidence=70.0).cache_suffix())
+
+
+if __name__ == '__main__':
+    unittest.main()
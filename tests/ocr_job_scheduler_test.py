@@ -0,0 +1,120 @@
+import unittest
+
+from PySide6 import QtGui
+
+from ocr_engine.ocr_job_scheduler import OCRJob, OCRJobScheduler
+
+
+class FakeEngine():
+    '''Keeps the jobs it is handed, tests finish them by calling the callbacks'''
+    name = 'Fake'
+
+    def __init__(self, jobs: int = 1, error: Exception | None = None) -> None:
+        self.jobs = jobs
+        self.error = error
+        self.started: list[tuple] = []
+
+    def max_jobs(self) -> int:
+        return self.jobs
+
+    def start_recognize_thread(self, callback, job, image, ppi, partial_callback=None, metrics=None):
+        if self.error:
+            raise self.error
+
+        self.started.append((callback, job))
+
+
+class FakeEngineManager():
+    def __init__(self, engine: FakeEngine) -> None:
+        self.engine = engine
+
+    def get_current_engine(self) -> FakeEngine:
+        return self.engine
+
+    def prepare_image(self, image, scale: float = 1.0):
+        return image
+
+
+class OCRJobSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.engine = FakeEngine()
+        self.scheduler = OCRJobScheduler(FakeEngineManager(self.engine))
+        self.image = QtGui.QImage(100, 100, QtGui.QImage.Format.Format_RGB888)
+
+        self.results = []
+        self.failures = []
+        self.scheduler.result.connect(self.results.append)
+        self.scheduler.failed.connect(self.failures.append)
+
+    def test_failed_job_frees_slot(self):
+        job = OCRJob(1, 1, (0, 0, 10, 10), 'English')
+        other_job = OCRJob(1, 2, (0, 0, 10, 10), 'English')
+
+        self.scheduler.submit(job, self.image, 300)
+        self.scheduler.submit(other_job, self.image, 300)
+        self.assertEqual([job for callback, job in self.engine.started], [job])
+
+        callback = self.engine.started[0][0]
+        callback([None, job, 'RuntimeError: Tesseract crashed'])
+
+        self.assertEqual(self.failures, [['RuntimeError: Tesseract crashed', job]])
+        self.assertEqual(self.results, [])
+        # The waiting job got the slot
+        self.assertEqual(self.scheduler.running, {other_job.key: other_job})
+        self.assertEqual(self.engine.started[-1][1], other_job)
+
+    def test_resubmit_after_failure(self):
+        job = OCRJob(1, 1, (0, 0, 10, 10), 'English')
+
+        self.scheduler.submit(job, self.image, 300)
+        self.engine.started[0][0]([None, job, 'error'])
+
+        # Identical jobs aren't dropped as already running any more
+        self.scheduler.submit(job, self.image, 300)
+        self.assertEqual(len(self.engine.started), 2)
+
+        self.engine.started[1][0]([[], job])
+        self.assertEqual(self.results, [[[], job]])
+        self.assertEqual(self.scheduler.queue_depth(), 0)
+
+    def test_engine_raising(self):
+        self.engine.error = ValueError('Unknown language')
+        job = OCRJob(1, 1, (0, 0, 10, 10), 'Klingon')
+
+        self.scheduler.submit(job, self.image, 300)
+
+        self.assertEqual(self.failures, [['ValueError: Unknown language', job]])
+        self.assertEqual(self.scheduler.queue_depth(), 0)
+
+    def test_resubmit_after_cancel(self):
+        job = OCRJob(1, 1, (0, 0, 10, 10), 'English')
+
+        self.scheduler.submit(job, self.image, 300)
+        self.scheduler.cancel_box(1, 1)
+        # Still running, but its result would be discarded
+        self.scheduler.submit(job, self.image, 300)
+
+        self.engine.started[0][0]([[], job])
+        self.assertEqual(self.results, [])
+
+        # The resubmitted job runs once the cancelled one finished
+        self.assertEqual(len(self.engine.started), 2)
+        self.engine.started[1][0]([[], job])
+        self.assertEqual(self.results, [[[], job]])
+        self.assertEqual(self.scheduler.queue_depth(), 0)
+
+    def test_outdated_failure_is_dropped(self):
+        job = OCRJob(1, 1, (0, 0, 10, 10), 'English')
+        newer_job = OCRJob(1, 1, (0, 0, 20, 20), 'English')
+
+        self.scheduler.submit(job, self.image, 300)
+        self.scheduler.submit(newer_job, self.image, 300)
+        self.engine.started[0][0]([None, job, 'error'])
+
+        # Only the newer job counts for the box
+        self.assertEqual(self.failures, [])
+        self.assertEqual(self.engine.started[-1][1], newer_job)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import time
+import unittest
+
+from PySide6 import QtCore
+
+from ocr_engine.ocr_result_cache import OCRResultCache, make_cache_key
+from ocr_engine.ocr_results import (OCRResultBlock, OCRResultLine,
+                                    OCRResultParagraph, OCRResultWord)
+
+
+def create_block(x: int, y: int) -> OCRResultBlock:
+    word = OCRResultWord(text='Amiga', confidence=95.0)
+    word.set_bbox((x + 10, y + 10, x + 60, y + 30))
+
+    line = OCRResultLine(words=[word])
+    line.set_bbox((x + 10, y + 10, x + 60, y + 30))
+
+    block = OCRResultBlock(paragraphs=[OCRResultParagraph(lines=[line])], confidence=95.0)
+    block.set_bbox((x, y, x + 100, y + 40))
+
+    return block
+
+
+class OCRResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_key(self):
+        key = make_cache_key(b'\xff' * 12, 2, 2, 300, 'eng', 3, 'tesserocr', '5.3.0')
+
+        self.assertEqual(key, make_cache_key(b'\xff' * 12, 2, 2, 300.4, 'eng', 3, 'tesserocr', '5.3.0'))
+        self.assertNotEqual(key, make_cache_key(b'\xff' * 12, 2, 2, 300, 'deu', 3, 'tesserocr', '5.3.0'))
+        self.assertNotEqual(key, make_cache_key(b'\xff' * 12, 2, 2, 300, 'eng', 3, 'tesserocr', '5.3.1'))
+        self.assertNotEqual(key, make_cache_key(b'\xfe' + b'\xff' * 11, 2, 2, 300, 'eng', 3, 'tesserocr', '5.3.0'))
+        # Font sizes depend on the resolution
+        self.assertNotEqual(key, make_cache_key(b'\xff' * 12, 2, 2, 150, 'eng', 3, 'tesserocr', '5.3.0'))
+
+    def test_offset(self):
+        cache = OCRResultCache(self.directory.name)
+
+        self.assertIsNone(cache.get('0123'))
+
+        block = create_block(200, 300)
+        cache.put('0123', [block], QtCore.QPoint(200, 300))
+
+        # Stored blocks must not be modified
+        self.assertEqual(block.bbox_rect, QtCore.QRect(QtCore.QPoint(200, 300), QtCore.QPoint(300, 340)))
+
+        blocks = cache.get('0123', QtCore.QPoint(50, 60))
+
+        self.assertIsNotNone(blocks)
+        assert blocks
+        self.assertEqual(blocks[0].bbox_rect, QtCore.QRect(QtCore.QPoint(50, 60), QtCore.QPoint(150, 100)))
+        self.assertEqual(blocks[0].confidence, 95.0)
+        self.assertEqual(blocks[0].get_words()[0].text, 'Amiga')
+        self.assertEqual(blocks[0].get_words()[0].bbox_rect.topLeft(), QtCore.QPoint(60, 70))
+
+    def test_eviction(self):
+        cache = OCRResultCache(self.directory.name)
+        cache.put('aa00', [create_block(0, 0)])
+        entry_size = cache.size
+
+        cache.max_size = entry_size * 2
+        cache.put('bb00', [create_block(0, 0)])
+
+        # Make sure the newest entry is the most recently used one
+        os.utime(cache.path('aa00'), (time.time() - 100, time.time() - 100))
+        os.utime(cache.path('bb00'), (time.time() - 50, time.time() - 50))
+
+        cache.put('cc00', [create_block(0, 0)])
+
+        self.assertIsNone(cache.get('aa00'))
+        self.assertIsNotNone(cache.get('cc00'))
+        self.assertLessEqual(cache.size, cache.max_size)
+
+
+if __name__ == '__main__':
+    unittest.main()
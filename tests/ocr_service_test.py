@@ -0,0 +1,164 @@
+import base64
+import io
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+from ocr_engine.ocr_service import OCRService, RecognitionBatcher
+
+
+def encode_image(image: Image.Image) -> str:
+    data = io.BytesIO()
+    image.save(data, 'PNG')
+
+    return base64.b64encode(data.getvalue()).decode('ascii')
+
+
+class FakeExecutor():
+    '''Answers every batch right away with the rects it was given, fails the first broken submits'''
+
+    def __init__(self, broken: int = 0) -> None:
+        self.broken = broken
+        self.jobs: list = []
+        self.lock = threading.Lock()
+
+    def submit(self, fn, job) -> Future:
+        if self.broken:
+            self.broken -= 1
+            raise BrokenProcessPool('A worker died')
+
+        with self.lock:
+            self.jobs.append(job)
+
+        future: Future = Future()
+        future.set_result(list(job.rects))
+
+        return future
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        pass
+
+
+class RecognitionBatcherTest(unittest.TestCase):
+    def create_batcher(self, executors: list, max_batch_size: int = 32) -> RecognitionBatcher:
+        def create_executor():
+            executor = executors.pop(0)
+
+            if isinstance(executor, Exception):
+                raise executor
+
+            self.executors.append(executor)
+
+            return executor
+
+        self.executors: list[FakeExecutor] = []
+        batcher = RecognitionBatcher(create_executor, max_batch_size, max_delay=1.0)
+        self.addCleanup(batcher.stop)
+
+        return batcher
+
+    def open_page(self, batcher: RecognitionBatcher, color: str) -> str:
+        page_key = batcher.open_page(Image.new('RGB', (100, 100), color))
+        self.addCleanup(batcher.close_page, page_key)
+
+        return page_key
+
+    def test_grouping(self):
+        batcher = self.create_batcher([FakeExecutor()], max_batch_size=6)
+        white_page = self.open_page(batcher, 'white')
+        black_page = self.open_page(batcher, 'black')
+
+        # Six requests fill the batch before the delay runs out
+        requests = [
+            (white_page, (0, 0, 10, 10), 300.0, 'English', 3),
+            (white_page, (10, 0, 10, 10), 300.0, 'English', 3),
+            (black_page, (0, 0, 10, 10), 300.0, 'English', 3),
+            (white_page, (20, 0, 10, 10), 300.0, 'German', 3),
+            (white_page, (30, 0, 10, 10), 150.0, 'English', 3),
+            (white_page, (40, 0, 10, 10), 300.0, 'English', 7),
+        ]
+        futures = [batcher.submit(*request) for request in requests]
+
+        # Every box gets the result of its own rect
+        self.assertEqual([future.result(5) for future in futures], [request[1] for request in requests])
+
+        jobs = self.executors[0].jobs
+        self.assertEqual([job.rects for job in jobs], [[(0, 0, 10, 10), (10, 0, 10, 10)], [(0, 0, 10, 10)], [(20, 0, 10, 10)], [(30, 0, 10, 10)], [(40, 0, 10, 10)]])
+        self.assertEqual([(job.language, job.ppi, job.psm) for job in jobs], [('English', 300.0, 3), ('English', 300.0, 3), ('German', 300.0, 3), ('English', 150.0, 3), ('English', 300.0, 7)])
+        # Identical pages are shared once
+        self.assertEqual(self.open_page(batcher, 'white'), white_page)
+
+    def test_restart_after_broken_pool(self):
+        batcher = self.create_batcher([FakeExecutor(broken=1), FakeExecutor()], max_batch_size=1)
+        page_key = self.open_page(batcher, 'white')
+
+        self.assertEqual(batcher.submit(page_key, (0, 0, 10, 10), 300.0, 'English').result(5), (0, 0, 10, 10))
+        self.assertEqual(batcher.restarts, 1)
+        self.assertTrue(batcher.healthy)
+        self.assertEqual(len(self.executors[1].jobs), 1)
+
+    def test_restart_only_once(self):
+        batcher = self.create_batcher([FakeExecutor(broken=1), FakeExecutor(broken=1)], max_batch_size=1)
+        page_key = self.open_page(batcher, 'white')
+
+        # The new pool breaking as well fails the request instead of restarting again
+        with self.assertRaises(BrokenProcessPool):
+            batcher.submit(page_key, (0, 0, 10, 10), 300.0, 'English').result(5)
+
+        self.assertEqual(batcher.restarts, 1)
+
+        # The batching thread keeps going
+        self.assertEqual(batcher.submit(page_key, (0, 0, 10, 10), 300.0, 'English').result(5), (0, 0, 10, 10))
+
+    def test_failed_restart(self):
+        batcher = self.create_batcher([FakeExecutor(broken=1), OSError('Too many open files')], max_batch_size=1)
+        page_key = self.open_page(batcher, 'white')
+
+        with self.assertRaises(OSError):
+            batcher.submit(page_key, (0, 0, 10, 10), 300.0, 'English').result(5)
+
+        self.assertFalse(batcher.healthy)
+
+
+class OCRServiceTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+        self.image_root = os.path.join(self.directory.name, 'scans')
+        os.mkdir(self.image_root)
+
+        # No recognition reaches the workers, so they are never started
+        self.service = OCRService(1, image_root=self.image_root)
+        self.addCleanup(self.service.shutdown)
+
+    def test_unknown_language(self):
+        with self.assertRaisesRegex(ValueError, 'not installed'):
+            self.service.recognize({'image': encode_image(Image.new('RGB', (10, 10))), 'language': 'Klingon'})
+
+    def test_paths_below_image_root(self):
+        self.assertEqual(self.service.image_path('page.png'), self.service.image_root / 'page.png')
+
+        outside = os.path.join(self.directory.name, 'secret.png')
+        Image.new('RGB', (10, 10)).save(outside)
+        os.symlink(outside, os.path.join(self.image_root, 'link.png'))
+
+        for path in ('../secret.png', outside, 'link.png'):
+            with self.assertRaisesRegex(ValueError, 'outside of the image root'):
+                self.service.recognize({'path': path})
+
+    def test_paths_without_image_root(self):
+        service = OCRService(1)
+        self.addCleanup(service.shutdown)
+
+        with self.assertRaisesRegex(ValueError, 'no image root'):
+            service.recognize({'path': 'page.png'})
+
+
+if __name__ == '__main__':
+    unittest.main()
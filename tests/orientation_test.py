@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+
+import tesserocr
+from PIL import Image, ImageDraw, ImageFont
+
+from ocr_engine.ocr_process_worker import OrientationJob, detect_orientation
+
+TEXT = 'The quick brown fox jumps over the lazy dog'
+
+
+def create_page() -> Image.Image:
+    '''Upright page with a few lines of text at 150 ppi'''
+    image = Image.new('L', (1240, 1754), 255)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=36)
+
+    for top in range(150, 1500, 60):
+        draw.text((100, top), TEXT, fill=0, font=font)
+
+    return image
+
+
+@unittest.skipUnless('osd' in tesserocr.get_languages()[1], 'osd.traineddata is not installed')
+class DetectOrientationTest(unittest.TestCase):
+    def test_rotated_pages(self):
+        page = create_page()
+
+        with tempfile.TemporaryDirectory() as directory:
+            for clockwise in (0, 90, 180, 270):
+                path = os.path.join(directory, f'{clockwise}.png')
+                # PIL rotates counter-clockwise
+                page.rotate(-clockwise, expand=True).save(path)
+
+                rotation, skew = detect_orientation(OrientationJob(path, 150.0))
+
+                # Rotating clockwise by the result undoes the rotation of the page
+                self.assertEqual((clockwise + rotation) % 360, 0, f'page rotated by {clockwise} degrees')
+                self.assertAlmostEqual(skew, 0.0, delta=0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
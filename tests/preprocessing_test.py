@@ -0,0 +1,43 @@
+import unittest
+
+import numpy
+
+from ocr_engine.preprocessing import PreprocessOptions, preprocess
+
+
+def create_scan() -> numpy.ndarray:
+    '''Gray page with uneven lighting, black scanner borders at the top and left and a dark "word"'''
+    pixels = numpy.full((200, 300, 3), 220, dtype=numpy.uint8)
+
+    # Lighting falls off to the right
+    pixels[:, :, :] -= numpy.linspace(0, 80, 300, dtype=numpy.uint8)[numpy.newaxis, :, numpy.newaxis]
+
+    pixels[:12] = 10
+    pixels[:, :8] = 10
+    pixels[100:110, 200:260] = 30
+
+    return pixels
+
+
+class PreprocessingTest(unittest.TestCase):
+    def test_binarize_and_remove_border(self):
+        gray = preprocess(create_scan(), PreprocessOptions(binarize=True, remove_border=True))
+
+        self.assertEqual(gray.shape, (200, 300))
+        self.assertEqual(set(numpy.unique(gray)), {0, 255})
+
+        # Border gone, the word kept, the darker right side of the paper doesn't turn black
+        self.assertTrue((gray[:12] == 255).all())
+        self.assertTrue((gray[:, :8] == 255).all())
+        self.assertTrue((gray[102:108, 202:258] == 0).any())
+        self.assertTrue((gray[150:190, 250:290] == 255).all())
+
+    def test_grayscale_only(self):
+        gray = preprocess(create_scan(), PreprocessOptions(grayscale=True))
+
+        self.assertEqual(gray.shape, (200, 300))
+        self.assertEqual(gray[0, 0], 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+
+from iso639 import Lang
+from PySide6 import QtCore
+
+from ocr_engine.ocr_engine_pytesseract import (TSV_BLOCK, TSV_LINE,
+                                               TSV_PARAGRAPH, TSV_WORD,
+                                               parse_tsv, raw_line_blocks)
+
+
+def tsv_data(rows: list[tuple]) -> dict:
+    '''Columns of pytesseract's DICT output from rows of (page, level, left, top, width, height, conf, text)'''
+    keys = ['page_num', 'level', 'left', 'top', 'width', 'height', 'conf', 'text']
+
+    return {key: [row[i] for row in rows] for i, key in enumerate(keys)}
+
+
+class ParseTSVTest(unittest.TestCase):
+    def setUp(self):
+        self.language = Lang('English')
+        self.data = tsv_data([
+            (1, 1, 0, 0, 200, 100, -1, ''),
+            (1, TSV_BLOCK, 10, 10, 100, 20, -1, ''),
+            (1, TSV_PARAGRAPH, 10, 10, 100, 20, -1, ''),
+            (1, TSV_LINE, 10, 10, 100, 20, -1, ''),
+            (1, TSV_WORD, 10, 10, 40, 20, 96, 'Hello'),
+            (1, TSV_WORD, 60, 10, 50, 20, 90, 'world'),
+            (2, 1, 0, 0, 200, 100, -1, ''),
+            (2, TSV_BLOCK, 5, 5, 50, 20, -1, ''),
+            (2, TSV_PARAGRAPH, 5, 5, 50, 20, -1, ''),
+            (2, TSV_LINE, 5, 5, 50, 20, -1, ''),
+            (2, TSV_WORD, 5, 5, 50, 20, 95, ' '),
+            (3, 1, 0, 0, 200, 100, -1, ''),
+            (3, TSV_BLOCK, 0, 0, 30, 20, -1, ''),
+            (3, TSV_PARAGRAPH, 0, 0, 30, 20, -1, ''),
+            (3, TSV_LINE, 0, 0, 30, 20, -1, ''),
+            (3, TSV_WORD, 0, 0, 30, 20, 80, 'Hi'),
+        ])
+
+    def test_pages(self):
+        pages = parse_tsv(self.data, [QtCore.QPoint(), QtCore.QPoint(0, 500), QtCore.QPoint(100, 1000)], self.language, 300)
+
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(pages[0][0].text, 'Hello world\n')
+        self.assertAlmostEqual(pages[0][0].confidence, 93.0)
+        self.assertIs(pages[0][0].language, self.language)
+
+        # Blocks without words are dropped
+        self.assertEqual(pages[1], [])
+
+        self.assertEqual(pages[2][0].text, 'Hi\n')
+
+    def test_offsets(self):
+        pages = parse_tsv(self.data, [QtCore.QPoint(), QtCore.QPoint(0, 500), QtCore.QPoint(100, 1000)], self.language, 300)
+
+        self.assertEqual(pages[0][0].get_words()[1].bbox_rect, QtCore.QRect(60, 10, 50, 20))
+        self.assertEqual(pages[2][0].get_words()[0].bbox_rect, QtCore.QRect(100, 1000, 30, 20))
+
+    def test_raw_line_blocks(self):
+        line_rects = [QtCore.QRect(0, 0, 100, 20), QtCore.QRect(0, 20, 100, 20), QtCore.QRect(0, 40, 100, 20)]
+        blocks = raw_line_blocks(line_rects, ['a   b', '', 'c'], self.language)
+
+        # Whitespace within lines is kept, empty lines are left out
+        self.assertEqual(blocks[0].text, 'a   b\nc\n')
+        self.assertEqual(raw_line_blocks(line_rects, ['', '', ''], self.language), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import json
+import unittest
+
+from ocr_engine.ocr_results import (OCRResultBlock, OCRResultLine,
+                                    OCRResultParagraph, OCRResultWord)
+
+
+class ResultDictTest(unittest.TestCase):
+    def test_to_dict(self):
+        word = OCRResultWord(text='Word', confidence=91.5, blanks_before=1)
+        word.set_bbox((10, 20, 49, 39))
+        word.set_baseline(((10, 35), (49, 36)))
+        block = OCRResultBlock(paragraphs=[OCRResultParagraph(lines=[OCRResultLine(words=[word])])])
+
+        # Goes through JSON as it is
+        result = json.loads(json.dumps(block.to_dict()))
+        word_dict = result['paragraphs'][0]['lines'][0]['words'][0]
+
+        self.assertEqual(word_dict['bbox'], [10, 20, 40, 20])
+        self.assertEqual(word_dict['baseline'], [10, 35, 49, 36])
+        self.assertEqual(word_dict['text'], 'Word')
+        self.assertEqual(word_dict['blanks_before'], 1)
+        self.assertEqual(result['type'], 'TEXT')
+        self.assertEqual(result['language'], 'English')
+
+
+if __name__ == '__main__':
+    unittest.main()
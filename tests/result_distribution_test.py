@@ -0,0 +1,39 @@
+import unittest
+
+from PySide6 import QtCore
+
+from ocr_engine.ocr_results import (OCRResultBlock, OCRResultLine,
+                                    OCRResultParagraph, OCRResultWord)
+from ocr_engine.result_distribution import distribute_blocks
+
+
+def create_word(text: str, x: int, y: int) -> OCRResultWord:
+    word = OCRResultWord(text=text, confidence=90.0, blanks_before=1)
+    word.set_bbox((x, y, x + 40, y + 20))
+
+    return word
+
+
+class ResultDistributionTest(unittest.TestCase):
+    def test_distribution(self):
+        line_1 = OCRResultLine(words=[create_word('Left', 10, 10), create_word('Right', 510, 10)])
+        line_2 = OCRResultLine(words=[create_word('Nested', 110, 60), create_word('Outside', 900, 900)])
+        page = OCRResultBlock(paragraphs=[OCRResultParagraph(lines=[line_1, line_2])])
+
+        rects = [QtCore.QRect(0, 0, 400, 200), QtCore.QRect(500, 0, 200, 100), QtCore.QRect(100, 50, 100, 50), QtCore.QRect(0, 300, 100, 100)]
+
+        left, right, nested, empty = distribute_blocks([page], rects)
+
+        self.assertEqual([word.text for word in left.get_words()], ['Left'])
+        self.assertEqual([word.text for word in right.get_words()], ['Right'])
+        # Words go to the innermost box
+        self.assertEqual([word.text for word in nested.get_words()], ['Nested'])
+        self.assertIsNone(empty)
+
+        self.assertEqual(left.text, 'Left\n')
+        self.assertEqual(left.bbox_rect, QtCore.QRect(QtCore.QPoint(10, 10), QtCore.QPoint(50, 30)))
+        self.assertEqual(left.confidence, 90.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
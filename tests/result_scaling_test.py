@@ -0,0 +1,39 @@
+import unittest
+
+from PySide6 import QtCore
+
+from ocr_engine.image_buffer import downsample_scale
+from ocr_engine.ocr_results import (OCRResultBlock, OCRResultLine,
+                                    OCRResultParagraph, OCRResultWord,
+                                    scale_rect)
+
+
+class ResultScalingTest(unittest.TestCase):
+    def test_downsample_scale(self):
+        self.assertEqual(downsample_scale(600.0, 300.0), 0.5)
+        # Never upsampled, 0 keeps the full resolution
+        self.assertEqual(downsample_scale(200.0, 300.0), 1.0)
+        self.assertEqual(downsample_scale(600.0, 0.0), 1.0)
+
+    def test_scale_rect(self):
+        rect = QtCore.QRect(10, 20, 100, 50)
+
+        self.assertEqual(scale_rect(rect, 0.5), QtCore.QRect(5, 10, 50, 25))
+        self.assertEqual(scale_rect(scale_rect(rect, 0.5), 2.0), rect)
+        self.assertTrue(scale_rect(QtCore.QRect(), 2.0).isNull())
+
+    def test_block_back_to_page_coordinates(self):
+        word = OCRResultWord(text='Word')
+        word.set_bbox((100, 50, 200, 80))
+        block = OCRResultBlock(paragraphs=[OCRResultParagraph(lines=[OCRResultLine(words=[word])])])
+        block.bbox_rect = QtCore.QRect(QtCore.QPoint(100, 50), QtCore.QPoint(200, 80))
+
+        # Recognized on a page downsampled from 600 to 300 ppi
+        block.scale(1 / downsample_scale(600.0, 300.0))
+
+        self.assertEqual(block.bbox_rect, QtCore.QRect(QtCore.QPoint(200, 100), QtCore.QPoint(401, 161)))
+        self.assertEqual(block.get_words()[0].bbox_rect, block.bbox_rect)
+
+
+if __name__ == '__main__':
+    unittest.main()
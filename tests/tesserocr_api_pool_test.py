@@ -0,0 +1,79 @@
+import unittest
+
+import tesserocr
+
+from ocr_engine.tesserocr_api_pool import TesserocrAPIPool
+
+
+class TesserocrAPIPoolTest(unittest.TestCase):
+    def test_reuse(self):
+        pool = TesserocrAPIPool(2)
+
+        with pool.borrow('eng') as api:
+            pass
+
+        self.assertEqual(pool.idle_count, 1)
+
+        with pool.borrow('eng') as reused_api:
+            self.assertIs(reused_api, api)
+            # Borrowed instances aren't idle
+            self.assertEqual(pool.idle_count, 0)
+
+        # Other settings need another instance
+        with pool.borrow('eng', psm=tesserocr.PSM.SINGLE_BLOCK) as other_api:
+            self.assertIsNot(other_api, api)
+
+        pool.clear()
+
+    def test_psm_reset_on_release(self):
+        pool = TesserocrAPIPool(1)
+
+        with pool.borrow('eng', psm=tesserocr.PSM.AUTO) as api:
+            # Like refining words does
+            api.SetPageSegMode(tesserocr.PSM.SINGLE_WORD)
+
+        with pool.borrow('eng', psm=tesserocr.PSM.AUTO) as api:
+            self.assertEqual(api.GetPageSegMode(), tesserocr.PSM.AUTO)
+
+        pool.clear()
+
+    def test_eviction_beyond_max_idle(self):
+        pool = TesserocrAPIPool(1)
+
+        # More instances than max_idle in use at once, the pool never blocks
+        with pool.borrow('eng') as first_api:
+            with pool.borrow('eng') as second_api:
+                self.assertIsNot(second_api, first_api)
+
+        # The instance returned first has been ended
+        self.assertEqual(pool.idle_count, 1)
+        self.assertEqual([api for apis in pool.idle.values() for api in apis], [first_api])
+
+        # Least recently returned keys go first
+        with pool.borrow('eng', psm=tesserocr.PSM.SINGLE_BLOCK):
+            pass
+
+        self.assertEqual(list(pool.idle), [TesserocrAPIPool.make_key('eng', tesserocr.PSM.SINGLE_BLOCK, tesserocr.OEM.DEFAULT)])
+        self.assertEqual(pool.idle_count, 1)
+
+        pool.clear()
+        self.assertEqual(pool.idle_count, 0)
+
+    def test_release_after_close(self):
+        pool = TesserocrAPIPool(2)
+
+        with pool.borrow('eng'):
+            pass
+
+        with pool.borrow('eng', psm=tesserocr.PSM.SINGLE_BLOCK):
+            # Replaced while a job still uses one of its instances
+            pool.close()
+            self.assertEqual(pool.idle_count, 0)
+
+        # The returned instance has been ended instead of kept
+        self.assertEqual(pool.idle_count, 0)
+        self.assertEqual(pool.idle, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+import numpy
+from PySide6 import QtCore, QtGui
+
+from ocr_engine.image_buffer import TESSERACT_FORMAT
+from ocr_engine.ocr_results import (OCRResultBlock, OCRResultLine,
+                                    OCRResultParagraph, OCRResultWord)
+from ocr_engine.text_color import (estimate_block_colors,
+                                   estimate_block_colors_rgb)
+
+
+def create_word(x: int, y: int) -> OCRResultWord:
+    word = OCRResultWord(text='Word', confidence=90.0)
+    word.set_bbox((x, y, x + 59, y + 19))
+
+    return word
+
+
+def paint_word(pixels: numpy.ndarray, x: int, y: int, color: tuple[int, int, int], edge: tuple[int, int, int]) -> None:
+    '''Vertical strokes with anti-aliased edges in a 60 x 20 word box'''
+    for stroke in range(x + 5, x + 55, 10):
+        pixels[y + 3:y + 17, stroke:stroke + 4] = edge
+        pixels[y + 3:y + 17, stroke + 1:stroke + 3] = color
+
+
+def create_image(pixels: numpy.ndarray) -> QtGui.QImage:
+    height, width, _ = pixels.shape
+
+    return QtGui.QImage(pixels.tobytes(), width, height, width * 3, TESSERACT_FORMAT).copy()
+
+
+class TextColorTest(unittest.TestCase):
+    def test_block_colors(self):
+        pixels = numpy.full((100, 300, 3), (250, 245, 235), dtype=numpy.uint8)
+
+        words = [create_word(110, 40), create_word(180, 40), create_word(250, 40)]
+        paint_word(pixels, 10, 20, (40, 40, 120), (150, 150, 180))
+        paint_word(pixels, 80, 20, (40, 40, 120), (150, 150, 180))
+        paint_word(pixels, 150, 20, (200, 20, 20), (230, 140, 130))
+
+        image = create_image(pixels)
+        block = OCRResultBlock(paragraphs=[OCRResultParagraph(lines=[OCRResultLine(words=words)])])
+
+        # Image covers the page from (100, 20)
+        estimate_block_colors([block], image, QtCore.QPoint(100, 20))
+
+        self.assertEqual(words[0].foreground_color, QtGui.QColor(40, 40, 120))
+        self.assertEqual(words[2].foreground_color, QtGui.QColor(200, 20, 20))
+        self.assertEqual(block.foreground_color, QtGui.QColor(40, 40, 120))
+
+    def test_light_on_dark(self):
+        pixels = numpy.full((20, 60, 3), 10, dtype=numpy.uint8)
+        paint_word(pixels, 0, 0, (255, 255, 255), (120, 120, 120))
+        image = create_image(pixels)
+
+        word = create_word(0, 0)
+        block = OCRResultBlock(paragraphs=[OCRResultParagraph(lines=[OCRResultLine(words=[word])])])
+
+        estimate_block_colors([block], image)
+
+        self.assertEqual(word.foreground_color, QtGui.QColor(255, 255, 255))
+
+    def test_rgb_pixels(self):
+        # Pages of batch processing are numpy arrays of PIL images
+        pixels = numpy.full((20, 60, 3), 255, dtype=numpy.uint8)
+        paint_word(pixels, 0, 0, (20, 100, 20), (140, 200, 140))
+
+        word = create_word(0, 0)
+        block = OCRResultBlock(paragraphs=[OCRResultParagraph(lines=[OCRResultLine(words=[word])])])
+
+        estimate_block_colors_rgb([block], pixels)
+
+        self.assertEqual(block.foreground_color, QtGui.QColor(20, 100, 20))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+from PySide6 import QtCore
+
+from ocr_engine.ocr_results import (OCRResultBlock, OCRResultLine,
+                                    OCRResultParagraph, OCRResultWord,
+                                    complete_parents)
+from ocr_engine.word_refinement import (RefineOptions, splice_word,
+                                        update_texts, upscale_factor,
+                                        weak_words, word_crop_rect)
+
+
+def make_word(text: str, confidence: float, left: int, blanks_before: int = 1) -> OCRResultWord:
+    word = OCRResultWord(text=text, confidence=confidence, blanks_before=blanks_before)
+    word.set_bbox((left, 10, left + 40, 30))
+
+    return word
+
+
+class WordRefinementTest(unittest.TestCase):
+    def setUp(self):
+        self.words = [make_word('The', 95.0, 0, 0), make_word('qu1ck', 20.0, 50), make_word('fox', 90.0, 100)]
+        self.block = OCRResultBlock(paragraphs=[OCRResultParagraph(lines=[OCRResultLine(words=self.words)])])
+        complete_parents(self.block)
+
+    def test_weak_words(self):
+        self.assertEqual([word.text for block, word in weak_words([self.block], 60.0)], ['qu1ck'])
+        self.assertEqual(weak_words([self.block], 0.0), [])
+
+    def test_splice_keeps_geometry(self):
+        bbox_rect = QtCore.QRect(self.block.bbox_rect)
+
+        self.assertTrue(splice_word(self.words[1], 'quick', 85.0))
+        update_texts(self.block)
+
+        self.assertEqual(self.block.text, 'The quick fox\n')
+        self.assertAlmostEqual(self.block.confidence, 90.0)
+        self.assertEqual(self.block.bbox_rect, bbox_rect)
+
+    def test_confidence_weighted_by_words(self):
+        short_line = OCRResultLine(words=[make_word('1', 10.0, 0, 0)])
+        block = OCRResultBlock(paragraphs=[OCRResultParagraph(lines=[short_line]), OCRResultParagraph(lines=[OCRResultLine(words=self.words)])])
+        complete_parents(block)
+
+        # A line with a single word counts as much as one of its words, not as much as the other line
+        self.assertAlmostEqual(block.confidence, (10.0 + 95.0 + 20.0 + 90.0) / 4)
+
+        splice_word(self.words[1], 'quick', 85.0)
+        update_texts(block)
+
+        self.assertAlmostEqual(block.confidence, (10.0 + 95.0 + 85.0 + 90.0) / 4)
+        self.assertAlmostEqual(block.paragraphs[1].confidence, 90.0)
+
+    def test_splice_rejects_worse_readings(self):
+        self.assertFalse(splice_word(self.words[1], 'quiek', 10.0))
+        # Would have to be split into several words
+        self.assertFalse(splice_word(self.words[1], 'qu ick', 90.0))
+        self.assertFalse(splice_word(self.words[1], ' ', 90.0))
+        self.assertEqual(self.words[1].text, 'qu1ck')
+
+    def test_crop_and_scale(self):
+        options = RefineOptions(confidence=60.0, margin=4, target_height=48, max_scale=4.0)
+
+        self.assertEqual(word_crop_rect(self.words[0], QtCore.QRect(0, 0, 200, 200), options.margin), QtCore.QRect(QtCore.QPoint(0, 6), QtCore.QPoint(44, 34)))
+        self.assertEqual(upscale_factor(24, options), 2.0)
+        self.assertEqual(upscale_factor(4, options), 4.0)
+        # Never shrunk
+        self.assertEqual(upscale_factor(100, options), 1.0)
+
+    def test_cache_suffix(self):
+        self.assertEqual(RefineOptions().cache_suffix(), '')
+        self.assertEqual(RefineOptions(confidence=60.0).cache_suffix(), '-refine60')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import unittest
+from dataclasses import dataclass
+
+from ocr_engine.work_queue import Coordinator, WorkQueue, run_worker
+
+AUTHKEY = b'test'
+
+
+@dataclass(frozen=True)
+class FakeJob():
+    image_path: str
+    cache_dir: str = ''
+
+
+class FlakyProcess():
+    '''Fails the first attempt of every job whose image starts with "fail"'''
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.failed: set[bytes] = set()
+
+    def __call__(self, job: FakeJob) -> bytes:
+        with open(job.image_path, 'rb') as file:
+            data = file.read()
+
+        with self.lock:
+            if data.startswith(b'fail') and data not in self.failed:
+                self.failed.add(data)
+                raise RuntimeError('Tesseract crashed')
+
+        return data.upper()
+
+
+def run_coordinator(connection, image_path: str = '') -> None:
+    '''Coordinator of a single job, without image_path the job is held by a worker that never finishes it and other workers are told to wait'''
+    work_queue = WorkQueue([FakeJob(image_path)])
+
+    if not image_path:
+        work_queue.lease('hanging worker')
+
+    coordinator = Coordinator(work_queue, ('127.0.0.1', 0), AUTHKEY)
+
+    connection.send(coordinator.address)
+    coordinator.run()
+
+
+def slow_process(job: FakeJob) -> bytes:
+    '''Outlasts the coordinator, the result is large enough to be sent in several writes'''
+    time.sleep(1.0)
+
+    return b'x' * 100000
+
+
+def run_worker_process(address: tuple[str, int]) -> None:
+    run_worker(address, AUTHKEY, process=slow_process)
+
+
+class WorkQueueTest(unittest.TestCase):
+    def test_retry_until_max_attempts(self):
+        work_queue = WorkQueue(['a', 'b'], max_attempts=2)
+
+        item = work_queue.lease('w1')
+        work_queue.fail(item.job_id, 'w1', 'error')
+        self.assertEqual(work_queue.lease('w2').job_id, 1)
+        self.assertEqual(work_queue.lease('w2').job_id, 0)
+
+        # Only the worker holding the job can fail it
+        work_queue.fail(0, 'w1', 'error')
+        self.assertIn(0, work_queue.leased)
+
+        work_queue.fail(0, 'w2', 'second error')
+        self.assertEqual(work_queue.errors, {0: 'second error'})
+        self.assertIsNone(work_queue.lease('w1'))
+        self.assertFalse(work_queue.finished())
+
+        work_queue.complete(1, 'w2', 'B')
+        self.assertTrue(work_queue.finished())
+
+    def test_first_result_wins(self):
+        work_queue = WorkQueue(['a'], lease_timeout=-1)
+
+        work_queue.lease('w1')
+        # Lease expired, the job goes to another worker
+        self.assertEqual(work_queue.lease('w2').worker, 'w2')
+
+        self.assertTrue(work_queue.complete(0, 'w2', 'A2'))
+        self.assertFalse(work_queue.complete(0, 'w1', 'A1'))
+        self.assertEqual(work_queue.results, {0: 'A2'})
+
+    def test_release_worker(self):
+        work_queue = WorkQueue(['a', 'b'])
+
+        work_queue.lease('w1')
+        work_queue.lease('w2')
+        work_queue.release_worker('w1')
+
+        self.assertEqual(work_queue.lease('w3').job_id, 0)
+
+
+class CoordinatorTest(unittest.TestCase):
+    def test_expired_lease_without_workers(self):
+        work_queue = WorkQueue(['a'], max_attempts=1, lease_timeout=-1)
+        work_queue.lease('hanging worker')
+
+        # Finishes without anyone asking for the job again
+        Coordinator(work_queue, ('127.0.0.1', 0), AUTHKEY).run()
+
+        self.assertEqual(work_queue.errors, {0: 'Worker hanging worker timed out'})
+
+    def test_local_workers(self):
+        with tempfile.TemporaryDirectory() as directory:
+            jobs = []
+
+            for i, content in enumerate([b'page 0', b'fail 1', b'page 2', b'fail 3', b'page 4']):
+                path = os.path.join(directory, f'{i}.png')
+
+                with open(path, 'wb') as file:
+                    file.write(content)
+
+                jobs.append(FakeJob(path))
+
+            work_queue = WorkQueue(jobs)
+            finished = []
+            coordinator = Coordinator(work_queue, ('127.0.0.1', 0), AUTHKEY, lambda job_id, result, error: finished.append(job_id))
+
+            process = FlakyProcess()
+            processed = []
+            workers = [threading.Thread(target=lambda: processed.append(run_worker(coordinator.address, AUTHKEY, process=process))) for i in range(3)]
+
+            for worker in workers:
+                worker.start()
+
+            coordinator.run()
+
+            for worker in workers:
+                worker.join(10)
+
+        self.assertEqual(work_queue.results, {0: b'PAGE 0', 1: b'FAIL 1', 2: b'PAGE 2', 3: b'FAIL 3', 4: b'PAGE 4'})
+        self.assertEqual(work_queue.errors, {})
+        self.assertEqual(sorted(finished), [0, 1, 2, 3, 4])
+        self.assertEqual(sum(processed), 5)
+
+    def exit_coordinator(self, image_path: str = '') -> int:
+        '''Exit code of a worker process whose coordinator is killed half a second after the worker connected'''
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        coordinator = multiprocessing.Process(target=run_coordinator, args=(sender, image_path))
+        coordinator.start()
+        address = receiver.recv()
+
+        worker = multiprocessing.Process(target=run_worker_process, args=(address,))
+        worker.start()
+
+        # No goodbye from the coordinator
+        time.sleep(0.5)
+        coordinator.terminate()
+        coordinator.join(10)
+
+        worker.join(10)
+
+        return worker.exitcode
+
+    def test_coordinator_exits_while_worker_waits(self):
+        self.assertEqual(self.exit_coordinator(), 0)
+
+    def test_coordinator_exits_while_worker_processes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            image_path = os.path.join(directory, 'page.png')
+
+            with open(image_path, 'wb') as file:
+                file.write(b'page')
+
+            # Sending the result after the connection was reset raises BrokenPipeError
+            self.assertEqual(self.exit_coordinator(image_path), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()